@@ -1,40 +1,18 @@
 # app/agents/ibm_client.py
 from __future__ import annotations
-import os, json, re, time, requests
 from typing import Dict, Any, List
 
-from app.core.config import WATSONX_BASE_URL, WATSONX_PROJECT, IBM_CLAIM_MODEL_ID
-from app.core.auth import get_ibm_iam_token
+from app.core import watsonx
+from app.core.config import WATSONX_PROJECT, IBM_CLAIM_MODEL_ID
 from app.schemas.claim import Claim
 from app.core.parse_json import parse_json_anywhere
 
-GEN_URL = f"{WATSONX_BASE_URL.rstrip('/')}/ml/v1/text/generation?version=2023-05-29"
-
-def _gen_post(payload: Dict[str, Any], retries: int = 4, timeout: int = 90) -> str:
+def _gen_post(payload: Dict[str, Any], timeout: int = 90) -> str:
     """
-    POST to watsonx text/generation with basic retries for 429/5xx.
-    Returns the text (generated_text/output_text) or raises.
+    POST to watsonx text/generation (rate limiting and 429/5xx retries are
+    handled by app.core.watsonx). Returns the generated text or raises.
     """
-    headers = {
-        "Accept": "application/json",
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {get_ibm_iam_token()}",
-    }
-    backoff = 1.5
-    for attempt in range(retries):
-        r = requests.post(GEN_URL, headers=headers, json=payload, timeout=timeout)
-        if r.status_code in (429, 500, 502, 503, 504):
-            time.sleep(backoff * (2 ** attempt))
-            continue
-        r.raise_for_status()
-        data = r.json()
-        results = data.get("results") or []
-        if results and isinstance(results, list):
-            return (results[0].get("generated_text") or results[0].get("output_text") or "").strip()
-        return (data.get("generated_text") or "").strip()
-    # final raise
-    r.raise_for_status()
-    return ""  # unreachable, keeps linters happy
+    return watsonx.generated_text(watsonx.post("generation", payload, timeout=timeout))
 
 
 # =========================
@@ -130,9 +108,11 @@ def run_claim_extractor(transcript: str) -> Dict[str, Any]:
 # Public: extract_claims (used by orchestrator)
 # =========================
 
-def extract_claims(segments: List[Dict]) -> List[Claim]:
+def extract_claims(segments: List[Dict], id_prefix: str = "c") -> List[Claim]:
     """
     Aggregates segment texts -> calls run_claim_extractor -> returns List[Claim]
+    Claim ids are `{id_prefix}{i}`; callers extracting several chunks of one call
+    pass distinct prefixes so ids stay unique.
     """
     transcript = " ".join(s.get("text", "") for s in segments).strip()
     if not transcript:
@@ -147,7 +127,7 @@ def extract_claims(segments: List[Dict]) -> List[Claim]:
         if not text:
             continue
         out.append(Claim(
-            id=f"c{i}",
+            id=f"{id_prefix}{i}",
             text=text,
             speaker=c.get("speaker"),
             segment_idx=0,  # TODO: map to true segment via start/end if available
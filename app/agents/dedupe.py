@@ -0,0 +1,178 @@
+# app/agents/dedupe.py
+from __future__ import annotations
+import re, threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.schemas.claim import Claim
+from app.schemas.evidence import Evidence
+from app.schemas.verdict import Verdict
+from app.agents.retriever import embed_queries
+from app.core.config import CLAIM_DEDUPE_THRESHOLD
+
+_NUM_RE = re.compile(r"\d+(?:[.,]\d+)*")
+_WORD_NUMS = {
+    "zero": 0, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7,
+    "eight": 8, "nine": 9, "ten": 10, "eleven": 11, "twelve": 12, "thirteen": 13, "fourteen": 14,
+    "fifteen": 15, "sixteen": 16, "seventeen": 17, "eighteen": 18, "nineteen": 19,
+    "twenty": 20, "thirty": 30, "forty": 40, "fifty": 50, "sixty": 60, "seventy": 70,
+    "eighty": 80, "ninety": 90, "hundred": 100, "thousand": 1000, "million": 1000000,
+}
+_WORD = "(?:" + "|".join(sorted(_WORD_NUMS, key=len, reverse=True)) + ")"
+# "forty-two", "one hundred and five": number words joined by spaces, hyphens or "and"
+_WORD_RUN_RE = re.compile(rf"\b{_WORD}(?:(?:[\s-]+|\s+and\s+){_WORD})*\b")
+_FRACTIONS = {"half": 1 / 2, "halves": 1 / 2, "third": 1 / 3, "thirds": 1 / 3, "quarter": 1 / 4, "quarters": 1 / 4}
+_FRACTION_COUNTS = {"a": 1, "an": 1, "one": 1, "two": 2, "three": 3}
+# "three and a half", "12 and three quarters"
+_MIXED_RE = re.compile(
+    rf"(?P<whole>\b\d+(?:\.\d+)?|\b{_WORD}(?:(?:[\s-]+|\s+and\s+){_WORD})*)"
+    rf"\s+and\s+(?P<count>an?|one|two|three)\s+(?P<frac>{'|'.join(_FRACTIONS)})\b"
+)
+_FRACTION_RE = re.compile(rf"\b(?:{'|'.join(_FRACTIONS)})\b")
+
+
+def _fmt(x: float) -> str:
+    return f"{x:.6f}".rstrip("0").rstrip(".")
+
+
+def _word_numbers(run: str) -> List[int]:
+    """Values of one run of number words; "forty-two" -> [42], "two three" -> [2, 3]."""
+    out, total, cur, last = [], 0, 0, None
+    for w in re.findall(r"[a-z]+", run):
+        if w == "and":
+            continue
+        v = _WORD_NUMS[w]
+        if v == 100:
+            cur, last = (cur or 1) * 100, "hundred"
+        elif v >= 1000:
+            total, cur, last = total + (cur or 1) * v, 0, "scale"
+        elif last == "unit" or (last == "tens" and v >= 10):
+            # "two three", "twenty twelve": a new number starts
+            out.append(total + cur)
+            total, cur, last = 0, v, "tens" if v >= 20 else "unit"
+        else:
+            cur, last = cur + v, "tens" if v >= 20 else "unit"
+    out.append(total + cur)
+    return out
+
+
+def _mixed(m: "re.Match") -> str:
+    whole = m.group("whole")
+    vals = [float(whole)] if whole[0].isdigit() else [float(v) for v in _word_numbers(whole)]
+    vals[-1] += _FRACTION_COUNTS[m.group("count")] * _FRACTIONS[m.group("frac")]
+    return " ".join(_fmt(v) for v in vals)
+
+
+def claim_numbers(text: str) -> frozenset:
+    """
+    Normalized numbers of a claim: '12.0%', '12 percent' and 'twelve' all
+    become '12'; compound number words are combined ('forty-two' -> '42'),
+    and so are mixed fractions ('three and a half' -> '3.5'). Any other
+    fraction word ('half a percent') adds a '~half' marker, so the set never
+    equals that of a claim without it.
+    """
+    t = _MIXED_RE.sub(_mixed, (text or "").lower())
+    nums = {f"~{w.rstrip('s').replace('halve', 'half')}" for w in _FRACTION_RE.findall(t)}
+    for m in _NUM_RE.findall(t):
+        try:
+            nums.add(_fmt(float(m.replace(",", ""))))
+        except ValueError:
+            continue
+    for run in _WORD_RUN_RE.findall(t):
+        nums.update(_fmt(v) for v in _word_numbers(run))
+    return frozenset(nums)
+
+
+def _norm_text(text: str) -> str:
+    return re.sub(r"[^a-z0-9%.]+", " ", (text or "").lower()).strip()
+
+
+class ClaimDeduper:
+    """
+    Incremental near-duplicate clustering of one call's claims.
+
+    Claims arrive chunk by chunk (see orchestrator); each one either joins the
+    first cluster whose representative has cosine >= threshold *and* the same
+    normalized numbers, or founds a new cluster. Only representatives go on to
+    retrieval/verification; members get `duplicate_of` set to their rep's id.
+    Without embeddings (lexical mode / backend down) only identical normalized
+    text is collapsed.
+    """
+
+    def __init__(self, threshold: float = CLAIM_DEDUPE_THRESHOLD, kb=None):
+        self.threshold = threshold
+        self.kb = kb                                      # pinned KB snapshot (embedding space)
+        self._lock = threading.Lock()
+        self._reps: List[Claim] = []
+        self._rep_numbers: List[frozenset] = []
+        self._rep_texts: Dict[str, str] = {}
+        self._rep_vecs: Optional[np.ndarray] = None     # one row per rep that has an embedding
+        self._vec_reps: List[int] = []                    # row -> index into self._reps
+        self.vectors: Dict[str, np.ndarray] = {}          # claim id -> embedding (reps only)
+        self.members: Dict[str, List[str]] = {}           # rep id -> member claim ids
+
+    def add(self, claims: List[Claim]) -> List[Claim]:
+        """Cluster `claims` into the existing set; returns the new representatives."""
+        if not claims:
+            return []
+        vecs = embed_queries([c.text for c in claims], kb=self.kb)
+        new_reps: List[Claim] = []
+        with self._lock:
+            for i, c in enumerate(claims):
+                nums = claim_numbers(c.text)
+                vec = vecs[i] if vecs is not None else None
+                rep = self._match(c, nums, vec)
+                if rep is not None:
+                    c.duplicate_of = rep.id
+                    self.members.setdefault(rep.id, []).append(c.id)
+                    continue
+                self._reps.append(c)
+                self._rep_numbers.append(nums)
+                self._rep_texts[_norm_text(c.text)] = c.id
+                if vec is not None:
+                    self.vectors[c.id] = vec
+                    self._vec_reps.append(len(self._reps) - 1)
+                    row = vec.reshape(1, -1)
+                    self._rep_vecs = row if self._rep_vecs is None else np.vstack([self._rep_vecs, row])
+                new_reps.append(c)
+        if len(new_reps) < len(claims):
+            print(f"[dedupe] {len(claims) - len(new_reps)} of {len(claims)} claims collapsed into existing clusters")
+        return new_reps
+
+    def _match(self, claim: Claim, nums: frozenset, vec: Optional[np.ndarray]) -> Optional[Claim]:
+        same_text = self._rep_texts.get(_norm_text(claim.text))
+        if same_text is not None:
+            return next(r for r in self._reps if r.id == same_text)
+        if vec is None or self._rep_vecs is None:
+            return None
+        sims = self._rep_vecs @ vec
+        for row in np.argsort(-sims):
+            if sims[row] < self.threshold:
+                break
+            j = self._vec_reps[row]
+            if self._rep_numbers[j] == nums:
+                return self._reps[j]
+        return None
+
+
+def expand_duplicates(
+    claims: List[Claim],
+    evidence_by_claim: Dict[str, List[Evidence]],
+    verdicts: List[Verdict],
+) -> Tuple[Dict[str, List[Evidence]], List[Verdict]]:
+    """Copy each representative's evidence and verdict onto its cluster members."""
+    evmap = dict(evidence_by_claim)
+    by_id = {v.claim_id: v for v in verdicts}
+    known = {c.id for c in claims}
+    out: List[Verdict] = []
+    for c in claims:
+        src = c.duplicate_of or c.id
+        if c.duplicate_of:
+            evmap[c.id] = list(evidence_by_claim.get(src, []))
+        v = by_id.get(src)
+        if v is not None:
+            out.append(v if not c.duplicate_of else v.model_copy(update={"claim_id": c.id}))
+    # keep verdicts the verifier returned for ids we don't know (as before)
+    out.extend(v for v in verdicts if v.claim_id not in known)
+    return evmap, out
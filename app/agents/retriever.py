@@ -1,69 +1,33 @@
 # app/agents/retriever.py
 from typing import List, Tuple, Dict
-import os, json, re, numpy as np, faiss, requests
+import re, hashlib, threading, numpy as np, faiss, requests
 
 from app.schemas.claim import Claim
 from app.schemas.evidence import Evidence
 from app.core.config import (
-    WATSONX_BASE_URL as BASE,
     WATSONX_PROJECT as PROJECT_ID,
-    WATSONX_API_KEY as API_KEY,
-    IBM_EMBEDDINGS_MODEL_ID as EMB_MODEL_ID,
     IBM_RERANK_MODEL_ID as RERANK_MODEL_ID,
-    IBM_API_VERSION as VERSION,
+    RETRIEVER_METADATA_FILTERS as METADATA_FILTERS,
+    RETRIEVER_MODE,
+    RETRIEVER_RRF_K,
+    RERANK_SKIP_MARGIN,
+    RERANK_SKIP_SCORE,
+    RERANK_CACHE_SIZE,
+    RERANK_CACHE_TTL_S,
+    MICROBATCH,
+    KB_RESCORE_FACTOR,
 )
-from app.core.auth import get_ibm_iam_token
-
-BASE_URL = (BASE or "").rstrip("/")
-IDX_DIR   = "kb/index"
-IDX_PATH  = f"{IDX_DIR}/kb.index"
-META_PATH = f"{IDX_DIR}/kb_meta.json"
-SNIPPETS  = "kb/snippets.jsonl"
-BASE_URL = BASE_URL.rstrip("/")
-
-def _ibm_embed(texts: list[str]) -> np.ndarray:
-    url = f"{BASE_URL}/ml/v1/text/embeddings?version={VERSION}"
-    hdr = {"Authorization": f"Bearer {get_ibm_iam_token()}",
-           "Accept": "application/json",
-           "Content-Type": "application/json"}
-    payload = {
-        "inputs": texts,                  # NOTE: plural
-        "model_id": EMB_MODEL_ID,
-        "project_id": PROJECT_ID
-    }
-    r = requests.post(url, headers=hdr, json=payload, timeout=60)
-    r.raise_for_status()
-    j = r.json()
-
-    # Accept either "data": [{"embedding": [...]}, ...]  OR
-    # "results": [{"embedding": [...]}, ...]
-    items = None
-    if isinstance(j, dict):
-        if "data" in j:
-            items = j["data"]
-        elif "results" in j:
-            items = j["results"]
-
-    if not items or not isinstance(items, list):
-        # Print full response once to help diagnose, then fall back
-        print(f"[retriever] Unexpected embeddings schema: {j}")
-        raise RuntimeError("Embeddings response missing 'data'/'results'")
-
-    vecs = np.asarray([it.get("embedding") for it in items], dtype=np.float32)
-    if vecs.ndim != 2:
-        print(f"[retriever] Bad embedding shapes: {vecs.shape}")
-        raise RuntimeError("Embeddings returned with wrong dimensionality")
-    # normalize for cosine/IP
-    vecs /= (np.linalg.norm(vecs, axis=1, keepdims=True) + 1e-12)
-    return vecs
-
+from app.core import health, watsonx
+from app.core.bm25 import BM25Index, reciprocal_rank_fusion
+from app.core.batcher import MicroBatcher, SingleFlight
+from app.core.cache import TTLCache
+from app.core.kb_registry import KBRegistry
+from app.core.kb_store import KBStore, content_hash, load_snippets
+from app.services.embeddings import EmbeddingBackend, get_backend
 
 def _ibm_rerank(query: str, docs: list[dict], top_n: int = 5) -> list[dict]:
     if not docs or not RERANK_MODEL_ID:
         return docs
-    url = f"{BASE_URL}/ml/v1/text/rerank?version={VERSION}"
-    hdr = {"Authorization": f"Bearer {get_ibm_iam_token()}",
-           "Accept":"application/json","Content-Type":"application/json"}
     # Use stable, unique ids per passage for rerank, then map back
     passages = [{"id": str(i), "text": d["snippet"]} for i, d in enumerate(docs)]
     id2doc = {str(i): d for i, d in enumerate(docs)}
@@ -73,10 +37,11 @@ def _ibm_rerank(query: str, docs: list[dict], top_n: int = 5) -> list[dict]:
         "project_id": PROJECT_ID,
         "top_n": min(top_n, len(docs))
     }
-    r = requests.post(url, headers=hdr, json=payload, timeout=60)
-    if r.status_code != 200:
+    try:
+        order = watsonx.post("rerank", payload, timeout=60).get("results", [])
+    except requests.RequestException as e:
+        print(f"[retriever] rerank call failed: {e}")
         return docs
-    order = r.json().get("results", [])
     out = []
     for it in order:
         d = id2doc.get(it.get("id"))
@@ -86,75 +51,366 @@ def _ibm_rerank(query: str, docs: list[dict], top_n: int = 5) -> list[dict]:
     return out or docs
 
 
-# ---------- Local embeddings fallback ----------
-_embedder = None
-
-def _local_embed(texts: list[str]) -> np.ndarray:
-    global _embedder
-    if _embedder is None:
-        from sentence_transformers import SentenceTransformer
-        _embedder = SentenceTransformer("all-MiniLM-L6-v2")
-    vecs = _embedder.encode(texts, normalize_embeddings=True)
-    return np.asarray(vecs, dtype=np.float32)
-
-def _use_ibm():
-    # use IBM only if all pieces exist
-    return bool(BASE_URL and PROJECT_ID and API_KEY and EMB_MODEL_ID)
-
-def _load_snippets() -> list[dict]:
-    docs = []
-    with open(SNIPPETS) as f:
-        for line in f:
-            line = line.strip()
-            if line:
-                docs.append(json.loads(line))
-    if not docs:
-        raise RuntimeError("No KB snippets found. Please populate kb/snippets.jsonl")
-    return docs
+# ---------- Rerank policy: skip when retrieval is decisive, cache orderings ----------
+_rerank_cache = TTLCache(maxsize=RERANK_CACHE_SIZE, ttl=RERANK_CACHE_TTL_S)
+_rerank_lock = threading.Lock()
+_rerank_counts = {
+    "requests": 0,            # hit lists that were eligible for rerank
+    "called": 0,              # actual /text/rerank round trips
+    "skipped_margin": 0,      # top hit beat the runner-up by >= RERANK_SKIP_MARGIN
+    "skipped_confidence": 0,  # top hit scored >= RERANK_SKIP_SCORE
+    "cache_hits": 0,
+    "skipped_unhealthy": 0,   # health monitor has the rerank model down
+    "coalesced": 0,           # waited for an identical rerank already in flight
+    "failed": 0,
+    "top1_changed": 0,        # rerank (called or cached) changed the top hit
+    "order_changed": 0,       # ... or at least the order of the returned hits
+}
+
+def _count(key: str) -> None:
+    with _rerank_lock:
+        _rerank_counts[key] += 1
+
+def rerank_stats() -> dict:
+    with _rerank_lock:
+        out = dict(_rerank_counts)
+    out["saved"] = out["skipped_margin"] + out["skipped_confidence"] + out["cache_hits"] + out["coalesced"]
+    out["cache"] = _rerank_cache.stats()
+    return out
+
+_rerank_flight = SingleFlight()
+
+def _rerank_cache_key(query: str, docs: list[dict], top_n: int) -> tuple:
+    # passage text is part of the key: doc ids are reused across tenants and KB versions
+    qh = hashlib.sha1(query.strip().lower().encode("utf-8")).hexdigest()
+    ph = hashlib.sha1("\x00".join(f"{d['doc_id']}\x01{d['snippet']}" for d in docs).encode("utf-8")).hexdigest()
+    return (qh, ph, tuple(d["doc_id"] for d in docs), RERANK_MODEL_ID, top_n)
+
+def _maybe_rerank(query: str, hits: list[dict], top_n: int = 5) -> list[dict]:
+    """
+    `_ibm_rerank` behind a policy layer:
+    - skip when the first-stage ranking is already decisive (cosine or
+      cosine margin; the thresholds are for raw vector cosines, so hits
+      without one, e.g. lexical-only fallbacks, are never skipped),
+    - reuse the ordering of an identical (query, passages, model) rerank, or
+      wait for one already in flight (the rerank API takes one query per
+      call, so identical requests are all there is to coalesce).
+    """
+    if not hits or not RERANK_MODEL_ID:
+        return hits
+    _count("requests")
+    top = hits[0].get("cosine")
+    if top is not None:
+        # in hybrid mode hits are in fused order; compare against the best other cosine
+        rest = [h.get("cosine") for h in hits[1:]]
+        if top >= RERANK_SKIP_SCORE:
+            _count("skipped_confidence")
+            return hits
+        if not rest or (None not in rest and top - max(rest) >= RERANK_SKIP_MARGIN):
+            _count("skipped_margin")
+            return hits
+
+    key = _rerank_cache_key(query, hits, top_n)
+    order = _rerank_cache.get(key)
+    if order is not None:
+        _count("cache_hits")
+    elif not health.usable("rerank", RERANK_MODEL_ID):
+        _count("skipped_unhealthy")
+        return hits
+    else:
+        leader = []
+
+        def _call():
+            leader.append(True)
+            _count("called")
+            ranked = _ibm_rerank(query, hits, top_n=top_n)
+            if ranked is hits:  # service declined/failed; _ibm_rerank returned the input
+                _count("failed")
+                return None
+            order = [(h["doc_id"], h["score"]) for h in ranked]
+            _rerank_cache.set(key, order)
+            return order
+
+        order = _rerank_flight.do(key, _call)
+        if not leader:
+            _count("coalesced")
+        if order is None:
+            return hits
+
+    by_id = {h["doc_id"]: h for h in hits}
+    out = [{**by_id[doc_id], "score": score} for doc_id, score in order if doc_id in by_id]
+    if out and out[0]["doc_id"] != hits[0]["doc_id"]:
+        _count("top1_changed")
+    if [h["doc_id"] for h in out] != [h["doc_id"] for h in hits[:len(out)]]:
+        _count("order_changed")
+    return out or hits
+
 
 def _build_or_load():
-    os.makedirs(IDX_DIR, exist_ok=True)
-    if os.path.exists(IDX_PATH) and os.path.exists(META_PATH):
-        return faiss.read_index(IDX_PATH), json.load(open(META_PATH))
+    """(faiss index, snippets) of the published KB snapshot, building one if needed."""
+    kb = current_kb()
+    return kb.index, kb.docs
 
-    docs = _load_snippets()
-    texts = [d["snippet"] for d in docs]
-    try:
-        embs = _ibm_embed(texts) if _use_ibm() else _local_embed(texts)
-    except Exception as e:
-        # Fallback to local embeddings if IBM call fails, but surface why
-        print(f"[retriever] IBM embeddings failed, falling back to local: {e}")
-        embs = _local_embed(texts)
 
-    index = faiss.IndexFlatIP(embs.shape[1])
-    index.add(embs.astype("float32"))
-    faiss.write_index(index, IDX_PATH)
-    json.dump(docs, open(META_PATH, "w"))
-    return index, docs
+# ---------- Metadata secondary indexes ----------
+# Snippets carry metadata like {"type","quarter","year","date","month"}. We keep
+# value -> row-id postings per field so a claim's period ("Q2", "2025") can
+# restrict the vector search to matching rows via a FAISS ID selector.
+
+FILTER_FIELDS = ("type", "quarter", "year")
+_QUARTER_RE = re.compile(r"\bQ([1-4])\b", re.I)
+_YEAR_RE = re.compile(r"(?<!\d)(?<!\d[.,])(?:FY\s?)?((?:19|20)\d{2})(?!\d|%|[.,]\d)", re.I)
+
+def _doc_facets(meta: dict) -> dict:
+    """Normalized filter values of one snippet; period fields fall back to date/month."""
+    out = {}
+    if meta.get("type"):
+        out["type"] = str(meta["type"]).lower()
+    dated = str(meta.get("date") or meta.get("month") or "")
+    m = re.match(r"^((?:19|20)\d{2})(?:-(\d{2}))?", dated)
+    year = meta.get("year") or (m.group(1) if m else None)
+    if year:
+        out["year"] = str(year)
+    quarter = meta.get("quarter")
+    if not quarter and m and m.group(2):
+        quarter = f"Q{(int(m.group(2)) - 1) // 3 + 1}"
+    if quarter:
+        out["quarter"] = str(quarter).upper()
+    return out
+
+class _MetadataIndex:
+    """field -> value -> sorted row ids, plus the rows that lack the field."""
+
+    def __init__(self, docs: list[dict]):
+        self.size = len(docs)
+        postings = {f: {} for f in FILTER_FIELDS}
+        present = {f: set() for f in FILTER_FIELDS}
+        for i, d in enumerate(docs):
+            for f, v in _doc_facets(d.get("metadata") or {}).items():
+                postings[f].setdefault(v, []).append(i)
+                present[f].add(i)
+        self.postings = {f: {v: np.asarray(ids, dtype="int64") for v, ids in vals.items()}
+                         for f, vals in postings.items()}
+        self.missing = {f: np.asarray(sorted(set(range(self.size)) - present[f]), dtype="int64")
+                        for f in FILTER_FIELDS}
+
+    def select(self, filters: dict) -> np.ndarray | None:
+        """
+        Row ids matching every filtered field (OR within a field). Rows without
+        the field (e.g. SLA/policy snippets with no period) always pass.
+        Returns None when the filter doesn't narrow anything.
+        """
+        ids = None
+        for field, values in (filters or {}).items():
+            if field not in self.postings or not values:
+                continue
+            parts = [self.postings[field].get(str(v), np.empty(0, dtype="int64")) for v in values]
+            parts.append(self.missing[field])
+            field_ids = np.unique(np.concatenate(parts))
+            ids = field_ids if ids is None else np.intersect1d(ids, field_ids, assume_unique=True)
+        if ids is None or len(ids) == self.size:
+            return None
+        return ids
+
+def claim_filters(text: str) -> dict:
+    """Derive metadata filters from claim text: "Q2" -> quarter, "2025"/"FY2025" -> year."""
+    filters = {}
+    quarters = {f"Q{q}" for q in _QUARTER_RE.findall(text or "")}
+    years = set(_YEAR_RE.findall(text or ""))
+    if quarters:
+        filters["quarter"] = quarters
+    if years:
+        filters["year"] = years
+    return filters
+
+class _KB:
+    """
+    One loaded KB snapshot: FAISS index (None in lexical-only mode), snippets,
+    BM25 and metadata postings, plus memory-mapped float32 vectors for
+    re-scoring when the index is quantized. Immutable, so in-flight calls can
+    keep using it after a newer snapshot is published.
+    """
+
+    def __init__(self, index, docs: list[dict], bm25: BM25Index, manifest: dict | None = None,
+                 vectors: np.ndarray | None = None):
+        self.index = index
+        self.vectors = vectors
+        self.docs = docs
+        self.bm25 = bm25
+        self.manifest = manifest or {}
+        self.meta_index = _MetadataIndex(docs)
+
+    @property
+    def version(self) -> str:
+        return self.manifest.get("version", "")
+
+    def query_backend(self) -> EmbeddingBackend:
+        """The backend that built this index; never embed queries with anything else."""
+        backend = get_backend(self.manifest["backend"])
+        if backend.model_id != self.manifest.get("model"):
+            raise RuntimeError(
+                f"index built with {self.manifest.get('model')!r} but backend "
+                f"{backend.name!r} is configured for {backend.model_id!r}; rebuild the KB snapshot")
+        return backend
+
+def _open_snapshot(store: KBStore, version: str) -> _KB:
+    index, docs, bm25, manifest = store.load(version)
+    return _KB(index, docs, bm25, manifest, store.load_vectors(version))
+
+def _open_lexical(store: KBStore) -> _KB:
+    # lexical mode needs no model: BM25 straight from the snippets, nothing published
+    docs = load_snippets(store.snippets)
+    manifest = {"backend": "bm25", "version": "lexical-" + content_hash(docs, {"backend": "bm25"})}
+    return _KB(None, docs, BM25Index.build(d["snippet"] for d in docs), manifest)
+
+# retrieval runs on several scheduler threads; the registry loads each tenant's KB once
+kb_registry = KBRegistry(_open_snapshot, _open_lexical)
+
+def current_kb(vectors: bool | None = None, tenant: str | None = None) -> _KB:
+    """
+    The published KB snapshot of `tenant` (the default KB if None), loaded on
+    first use and kept in memory by `kb_registry`. CURRENT is re-checked at
+    most every KB_RELOAD_INTERVAL_S, so a newly published snapshot is picked
+    up without a restart. With vectors=False and nothing published yet, only
+    the lexical side is built from the snippets.
+    """
+    if vectors is None:
+        vectors = RETRIEVER_MODE != "lexical"
+    return kb_registry.get(tenant, vectors=vectors)
+
+def kb_version(tenant: str | None = None) -> str:
+    """Version of the KB snapshot that searches currently run against."""
+    return current_kb(tenant=tenant).version
 
 def _normalize_snippet(s: str) -> str:
     return re.sub(r"\s+", " ", (s or "").strip()).lower()
 
-def _search(query_text: str, k: int = 8) -> list[dict]:
-    index, meta = _build_or_load()
+# ---------- Cross-request micro-batching of query embeddings ----------
+# Concurrent calls' claims/queries are collected for a few ms and embedded in
+# one backend call (one watsonx round trip instead of one per request).
+
+def _embed_batch(key: tuple, texts: list[str]) -> list[np.ndarray]:
+    backend_name, prio = key
+    unique = list(dict.fromkeys(texts))
+    with watsonx.priority(prio):   # batches run on the batcher's threads, not the callers'
+        vecs = get_backend(backend_name).embed(unique)
+    row = {t: i for i, t in enumerate(unique)}
+    return [vecs[row[t]] for t in texts]
+
+_embed_batcher = MicroBatcher(_embed_batch, name="embed")
+
+def _embed(kb: _KB, texts: list[str]) -> np.ndarray:
+    """Embed with the KB's query backend, via the micro-batcher when enabled."""
+    backend = kb.query_backend()
+    if backend.name == "ibm" and not health.usable("embeddings", backend.model_id):
+        raise RuntimeError("watsonx embeddings are down (health monitor)")
+    if not MICROBATCH:
+        return backend.embed(texts)
+    return np.vstack(_embed_batcher.submit((backend.name, watsonx.current_priority()), texts))
+
+def batching_stats() -> dict:
+    return {"embed": _embed_batcher.stats()}
+
+def embed_queries(texts: list[str], kb: _KB | None = None) -> np.ndarray | None:
+    """
+    Embed texts in the KB index's vector space (e.g. claims, once, for dedupe
+    and retrieval). None in lexical-only mode or if the backend fails.
+    """
+    if RETRIEVER_MODE == "lexical" or not texts:
+        return None
+    try:
+        kb = kb or current_kb()
+        return _embed(kb, texts)
+    except Exception as e:
+        print(f"[retriever] embedding {len(texts)} queries failed: {e}")
+        return None
+
+def _vector_rank(kb: _KB, query_text: str, k: int, subset, query_vec: np.ndarray | None = None) -> list[tuple[int, float]] | None:
+    """(row, cosine) pairs from FAISS; None if the query couldn't be embedded."""
+    params = None
+    if subset is not None:
+        params = faiss.SearchParameters(sel=faiss.IDSelectorBatch(subset))
     try:
-        q = _ibm_embed([query_text]) if _use_ibm() else _local_embed([query_text])
+        q = _embed(kb, [query_text]) if query_vec is None else query_vec.reshape(1, -1)
+        if q.shape[1] != kb.index.d:
+            raise RuntimeError(f"query dim {q.shape[1]} != index dim {kb.index.d}")
     except Exception as e:
-        print(f"[retriever] IBM query embed failed, using local: {e}")
-        q = _local_embed([query_text])
-    D, I = index.search(q.astype("float32"), k)
+        # a different model would put the query in another vector space; use BM25 instead
+        print(f"[retriever] query embed failed, using lexical hits only: {e}")
+        return None
+    q = q.astype("float32")
+    rescore = kb.vectors is not None and KB_RESCORE_FACTOR > 0
+    D, I = kb.index.search(q, k * KB_RESCORE_FACTOR if rescore else k, params=params)
+    # idx < 0 when fewer than k rows passed the filter
+    ranked = [(idx, float(D[0][rank])) for rank, idx in enumerate(I[0].tolist()) if idx >= 0]
+    if rescore and ranked:
+        # quantized scores pick the shortlist; exact float32 cosines order it
+        rows = np.asarray([r for r, _ in ranked])
+        exact = np.asarray(kb.vectors[np.sort(rows)]) @ q[0]
+        exact = dict(zip(np.sort(rows).tolist(), exact.tolist()))
+        ranked = sorted(((r, exact[r]) for r in rows.tolist()), key=lambda t: -t[1])[:k]
+    return ranked
+
+def _lexical_rank(kb: _KB, query_text: str, k: int, subset) -> list[tuple[int, float]]:
+    """(row, score) pairs from BM25, scores scaled so the best hit is 1.0."""
+    scores, rows = kb.bm25.search(query_text, k=k, subset=subset)
+    if not len(rows):
+        return []
+    top = float(scores[0]) or 1.0
+    return [(int(r), float(s) / top) for r, s in zip(rows, scores)]
+
+def _search(query_text: str, k: int = 8, filters: dict | None = None, mode: str | None = None,
+            query_vec: np.ndarray | None = None, kb: _KB | None = None) -> list[dict]:
+    """
+    Top-k KB hits for a query (`query_vec`: its embedding, if already computed;
+    `kb`: a pinned snapshot, so one call sees one KB version throughout).
+    - `filters` ({field: values}) restricts the search to matching snippets;
+      by default they are derived from the query text.
+    - `mode`: "vector" (FAISS), "lexical" (BM25, no model calls) or "hybrid"
+      (both, fused with reciprocal-rank fusion). Defaults to RETRIEVER_MODE.
+    """
+    mode = mode or RETRIEVER_MODE
+    kb = kb or current_kb(vectors=mode != "lexical")
+    meta = kb.docs
+    if filters is None:
+        filters = claim_filters(query_text) if METADATA_FILTERS else {}
+    subset = kb.meta_index.select(filters)
+    if subset is not None and len(subset) == 0:
+        print(f"[retriever] metadata filter {filters} matched nothing; searching whole KB")
+        subset = None
+
+    cosines: dict = {}   # row -> raw vector cosine (drives the rerank skip policy)
+    if mode == "lexical" or kb.index is None:
+        ranked = _lexical_rank(kb, query_text, k, subset)
+    elif mode == "vector":
+        ranked = _vector_rank(kb, query_text, k, subset, query_vec)
+        if ranked is None:
+            ranked = _lexical_rank(kb, query_text, k, subset)
+        else:
+            cosines = dict(ranked)
+    else:
+        vec = _vector_rank(kb, query_text, k, subset, query_vec)
+        lex = _lexical_rank(kb, query_text, k, subset)
+        if vec is None:
+            ranked = lex
+        else:
+            cosines = dict(vec)
+            ranked = reciprocal_rank_fusion(
+                [[r for r, _ in vec], [r for r, _ in lex]], k=RETRIEVER_RRF_K)[:k]
+
     hits = []
-    for rank, idx in enumerate(I[0].tolist()):
+    for idx, score in ranked:
         d = meta[idx]
         hits.append({
             "doc_id": d["doc_id"], "source": d.get("source","KB"),
-            "snippet": d["snippet"], "score": float(D[0][rank]),
+            "snippet": d["snippet"], "score": score, "cosine": cosines.get(idx),
             "metadata": d.get("metadata", {})
         })
-    try:
-        hits = _ibm_rerank(query_text, hits, top_n=5) if _use_ibm() else hits
-    except Exception as e:
-        print(f"[retriever] IBM rerank failed, using original hits: {e}")
+    if mode != "lexical":
+        try:
+            hits = _maybe_rerank(query_text, hits, top_n=5)
+        except Exception as e:
+            print(f"[retriever] IBM rerank failed, using original hits: {e}")
     # Deduplicate by normalized snippet text while preserving order
     seen_snippets = set()
     deduped = []
@@ -166,10 +422,13 @@ def _search(query_text: str, k: int = 8) -> list[dict]:
         deduped.append(h)
     return deduped
 
-def retrieve_evidence_for_claims(claims: List[Claim], k: int = 8) -> Tuple[List[Claim], Dict[str, List[Evidence]]]:
+def retrieve_evidence_for_claims(
+    claims: List[Claim], k: int = 8, query_vecs: Dict[str, np.ndarray] | None = None,
+    kb: _KB | None = None,
+) -> Tuple[List[Claim], Dict[str, List[Evidence]]]:
     claim_to_evidence: Dict[str, List[Evidence]] = {}
     for cl in claims:
-        hits = _search(cl.text, k=k)
+        hits = _search(cl.text, k=k, query_vec=(query_vecs or {}).get(cl.id), kb=kb)
         ev_list = [
             Evidence(
                 doc_id=h["doc_id"], source=h["source"], snippet=h["snippet"],
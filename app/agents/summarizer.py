@@ -1,19 +1,22 @@
 # app/agents/summarizer.py
 from __future__ import annotations
-import os, json, time, requests
-from typing import List, Dict, Any
+import json, re, contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional
 
 from app.schemas.report import CallReport
 from app.schemas.claim import Claim
 from app.schemas.evidence import Evidence
 from app.schemas.verdict import Verdict
+from app.core import health, profiler, watsonx
 from app.core.config import (
-    WATSONX_BASE_URL,
     WATSONX_PROJECT,
     IBM_SUMMARY_MODEL_ID as MODEL_ID,
-    IBM_API_VERSION,
+    SUMMARY_CHUNK_CHARS,
+    SUMMARY_MAP_CONCURRENCY,
+    SUMMARY_REDUCE_MAX_CHARS,
+    SUMMARY_MAX_CLAIMS,
 )
-from app.core.auth import get_ibm_iam_token
 from app.core.parse_json import parse_json_anywhere
 
 
@@ -40,23 +43,55 @@ def _compact_segments(segments: List[Dict[str, Any]], max_chars: int = 6000) ->
             break
     return list(reversed(out))
 
+def _seg_chars(segments: List[Dict[str, Any]]) -> int:
+    return sum(len(s.get("text", "") or "") for s in segments)
+
+def split_segment(seg: Dict[str, Any], max_chars: int = SUMMARY_CHUNK_CHARS) -> List[Dict[str, Any]]:
+    """Cut one oversized segment (e.g. a pasted transcript) into sentence-aligned pieces."""
+    text = seg.get("text", "") or ""
+    if len(text) <= max_chars:
+        return [seg]
+    pieces, cur = [], ""
+    for sent in re.split(r"(?<=[.!?])\s+", text):
+        if cur and len(cur) + len(sent) + 1 > max_chars:
+            pieces.append(cur)
+            cur = ""
+        while len(sent) > max_chars:   # no sentence break for a long stretch
+            pieces.append(sent[:max_chars])
+            sent = sent[max_chars:]
+        cur = f"{cur} {sent}".strip()
+    if cur:
+        pieces.append(cur)
+    return [{**seg, "text": p} for p in pieces]
+
+def chunk_segments(segments: List[Dict[str, Any]], max_chars: int = SUMMARY_CHUNK_CHARS) -> List[List[Dict[str, Any]]]:
+    """Consecutive groups of ~max_chars of transcript (the map step's input)."""
+    chunks, cur, size = [], [], 0
+    for seg in segments:
+        for piece in split_segment(seg, max_chars):
+            n = len(piece.get("text", "") or "")
+            if cur and size + n > max_chars:
+                chunks.append(cur)
+                cur, size = [], 0
+            cur.append(piece)
+            size += n
+    if cur:
+        chunks.append(cur)
+    return chunks
+
+def _top_claims(claims: List[Claim], verdicts: List[Verdict], n: int = SUMMARY_MAX_CLAIMS):
+    """At most n claims/verdicts for the reduce prompt: refuted first, then insufficient, then supported."""
+    rank = {"refuted": 0, "insufficient": 1, "supported": 2}
+    by_id = {c.id: c for c in claims}
+    picked = sorted(verdicts, key=lambda v: (rank.get(v.label, 3), -(v.confidence or 0.0)))[:n]
+    return [by_id[v.claim_id] for v in picked if v.claim_id in by_id], picked
+
 def _verdict_stats(verdicts: List[Verdict]) -> Dict[str, int]:
     s = sum(1 for v in verdicts if v.label == "supported")
     r = sum(1 for v in verdicts if v.label == "refuted")
     i = sum(1 for v in verdicts if v.label == "insufficient")
     return {"supported": s, "refuted": r, "insufficient": i, "total": len(verdicts)}
 
-def _http_post_with_retry(url: str, headers: dict, body: dict, timeout: int = 120, tries: int = 4, backoff: float = 1.5):
-    for attempt in range(tries):
-        r = requests.post(url, headers=headers, json=body, timeout=timeout)
-        if r.status_code not in (429, 500, 502, 503, 504):
-            r.raise_for_status()
-            return r
-        time.sleep(backoff * (2 ** attempt))
-    # last try result:
-    r.raise_for_status()
-    return r
-
 
 # -------- Prompt (kept tight & structured) --------
 
@@ -90,8 +125,144 @@ Output JSON only (no extra text, no markdown, no backticks):
 """
 
 
+MAP_PROMPT = """You summarize one part of a longer sales/stakeholder call.
+Return STRICT JSON only with:
+{
+  "summary": "string (<= 4 sentences; keep concrete numbers, dates, KPIs, names and commitments)",
+  "action_items": ["string", "..."]  // 0-3 imperative bullets agreed or requested in this part
+}
+
+Transcript part:
+{TEXT}
+
+Output JSON only (no extra text, no markdown, no backticks):
+"""
+
+REDUCE_PROMPT = """You are a precise meeting summarizer for sales/stakeholder calls.
+Below are summaries of consecutive parts of one call (in order), the verification stats of the claims made
+in it, and the most important checked claims. Produce a concise executive summary of the WHOLE call.
+
+Return STRICT JSON only with:
+{
+  "call_summary": "string (<= 6 sentences, neutral, factual, cites concrete numbers/dates/KPIs when present)",
+  "action_items": ["string", "..."]  // 1-6 imperative bullets; each starts with a verb
+}
+
+Guidance:
+- Cover the whole call, not just its end.
+- Emphasize mismatches between stated claims and evidence.
+- Be concise; avoid fluff and opinions.
+
+Verification stats (do not invent numbers):
+{VERDICT_STATS}
+
+Part summaries (JSON):
+{PARTS_JSON}
+
+Key claims (JSON):
+{CLAIMS_JSON}
+
+Verdicts (JSON):
+{VERDICTS_JSON}
+
+Output JSON only (no extra text, no markdown, no backticks):
+"""
+
+
+def _generate_json(prompt: str, max_new_tokens: int = 400) -> Dict[str, Any]:
+    if not health.usable("generation", MODEL_ID):
+        raise RuntimeError("summary model is down (health monitor)")
+    body = {
+        "input": prompt,
+        "model_id": MODEL_ID,
+        "project_id": WATSONX_PROJECT,
+        "parameters": {
+            "decoding_method": "greedy",
+            "temperature": 0.0,
+            "max_new_tokens": max_new_tokens,
+            "min_new_tokens": 0,
+            "repetition_penalty": 1.0,
+            "stop_sequences": ["\n\n", "\nOutput JSON", "\nTranscript part:"]
+        }
+    }
+    gen = watsonx.generated_text(watsonx.post("generation", body, timeout=120))
+    parsed = parse_json_anywhere(gen, root_key=None)
+    if isinstance(parsed, list) and parsed and isinstance(parsed[0], dict):
+        parsed = parsed[0]
+    if not isinstance(parsed, dict):
+        raise ValueError("summary model returned no JSON object")
+    return parsed
+
+
+def summarize_chunk(segments: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Map step: summary + action items of one transcript chunk. Never raises;
+    falls back to the chunk's opening text so the reduce step always has input.
+    """
+    text = " ".join(s.get("text", "") for s in segments if s.get("text")).strip()
+    out = {"start": segments[0].get("start", 0.0) if segments else 0.0,
+           "end": segments[-1].get("end", 0.0) if segments else 0.0,
+           "summary": "", "action_items": []}
+    if not text:
+        return out
+    try:
+        parsed = _generate_json(MAP_PROMPT.replace("{TEXT}", text), max_new_tokens=250)
+        out["summary"] = str(parsed.get("summary") or "").strip()
+        items = parsed.get("action_items") or []
+        out["action_items"] = items if isinstance(items, list) else [str(items)]
+    except Exception as e:
+        print(f"[summarizer] chunk summary failed: {e}")
+    if not out["summary"]:
+        out["summary"] = text[:300].strip() + ("…" if len(text) > 300 else "")
+    return out
+
+
+def _map(fn, items: list) -> list:
+    # keep the caller's request context (watsonx priority, active profile) in the worker threads
+    if len(items) <= 1 or SUMMARY_MAP_CONCURRENCY <= 1:
+        return [fn(x) for x in items]
+    with ThreadPoolExecutor(max_workers=SUMMARY_MAP_CONCURRENCY, thread_name_prefix="summary-map") as pool:
+        futs = [pool.submit(contextvars.copy_context().run, profiler.attached, fn, x) for x in items]
+        return [f.result() for f in futs]
+
+
+def map_summaries(segments: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Map step over a whole transcript, SUMMARY_MAP_CONCURRENCY chunks at a time."""
+    return _map(summarize_chunk, chunk_segments(segments))
+
+
+def _collapse(parts: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Merge consecutive part summaries in rounds until they fit SUMMARY_REDUCE_MAX_CHARS."""
+    while len(parts) > 1 and sum(len(p["summary"]) for p in parts) > SUMMARY_REDUCE_MAX_CHARS:
+        groups = chunk_segments([{"start": p["start"], "end": p["end"], "text": p["summary"],
+                                  "action_items": p.get("action_items", [])} for p in parts],
+                                max_chars=max(1, SUMMARY_REDUCE_MAX_CHARS // 2))
+        if len(groups) >= len(parts):
+            break   # summaries too long to merge further; the reduce prompt gets them as they are
+
+        def merge(group):
+            merged = summarize_chunk(group)
+            merged["action_items"] = [a for g in group for a in g.get("action_items", [])] + merged["action_items"]
+            return merged
+        parts = _map(merge, groups)
+    return parts
+
+
 # -------- Public API --------
 
+def make_claim_table(claims: List[Claim], verdicts: List[Verdict]) -> List[Dict[str, Any]]:
+    """One row per verdict: claim text, status and best evidence id."""
+    id2claim = {c.id: c.text for c in claims}
+    claim_table: List[Dict[str, Any]] = []
+    for v in verdicts:
+        claim_text = id2claim.get(v.claim_id, "")
+        claim_table.append({
+            "claim": claim_text,
+            "status": v.label.capitalize(),
+            "evidence_source": v.best_evidence_id or ""
+        })
+    return claim_table
+
 def make_report(
     segments: List[Dict[str, Any]],
     claims: List[Claim],
@@ -99,23 +270,21 @@ def make_report(
     verdicts: List[Verdict],
     *,
     evidence_by_claim: Dict[str, List[Evidence]] | None = None,
+    chunk_summaries: Optional[List[Dict[str, Any]]] = None,
 ) -> CallReport:
     """
     Build a CallReport:
       - call_summary + action_items from IBM LLM (robust parse)
       - claim_table derived from verdicts (+ best evidence id)
+
+    Calls longer than SUMMARY_CHUNK_CHARS are summarized map-reduce: one
+    summary per transcript chunk (`chunk_summaries`, computed by the
+    orchestrator while verification runs, or here in parallel if not given),
+    then a reduce call over those plus the verdict stats.
     """
 
     # 1) Build claim table from verdicts (always succeeds)
-    id2claim = {c.id: c.text for c in claims}
-    claim_table: List[Dict[str, Any]] = []
-    for v in verdicts:
-        claim_text = id2claim.get(v.claim_id, "")
-        claim_table.append({
-            "claim": claim_text,
-            "status": v.label.capitalize(),
-            "evidence_source": v.best_evidence_id or ""
-        })
+    claim_table = make_claim_table(claims, verdicts)
 
     # 2) Short-circuit if we have no content to summarize
     if not segments and not claims:
@@ -129,8 +298,12 @@ def make_report(
             evidence_by_claim=evidence_by_claim or {},
         )
 
-    # 3) Prepare compact context + stats
-    compact = _compact_segments(segments, max_chars=6000)
+    # 3) Prepare compact context + stats (map step first on long calls)
+    if chunk_summaries is None and _seg_chars(segments) > SUMMARY_CHUNK_CHARS:
+        chunk_summaries = map_summaries(segments)
+    if chunk_summaries:
+        return _reduce_report(chunk_summaries, claims, evidence_flat, verdicts, claim_table, evidence_by_claim)
+    compact = _compact_segments(segments, max_chars=SUMMARY_CHUNK_CHARS)
     stats = _verdict_stats(verdicts)
 
     # 4) Call IBM Granite (watsonx) for structured summary
@@ -138,13 +311,8 @@ def make_report(
     action_items: List[str] = []
 
     try:
-        tok = get_ibm_iam_token()
-        url = f"{WATSONX_BASE_URL.rstrip('/')}/ml/v1/text/generation?version={IBM_API_VERSION}"
-        headers = {
-            "Authorization": f"Bearer {tok}",
-            "Accept": "application/json",
-            "Content-Type": "application/json",
-        }
+        if not health.usable("generation", MODEL_ID):
+            raise RuntimeError("summary model is down (health monitor)")
         body = {
             "input": PROMPT \
                 .replace("{VERDICT_STATS}", json.dumps(stats, ensure_ascii=False)) \
@@ -169,8 +337,7 @@ def make_report(
             }
         }
 
-        resp = _http_post_with_retry(url, headers, body, timeout=120)
-        out = resp.json()
+        out = watsonx.post("generation", body, timeout=120)
         gen = (out.get("results") or [{}])[0].get("generated_text", "") or ""
 
         # Robust parse (accepts full JSON, partials, or multiple JSON objects)
@@ -204,3 +371,54 @@ def make_report(
         evidence=evidence_flat,
         evidence_by_claim=evidence_by_claim or {},
     )
+
+
+def _reduce_report(
+    parts: List[Dict[str, Any]],
+    claims: List[Claim],
+    evidence_flat: List[Evidence],
+    verdicts: List[Verdict],
+    claim_table: List[Dict[str, Any]],
+    evidence_by_claim: Dict[str, List[Evidence]] | None,
+) -> CallReport:
+    """Reduce step: merge chunk summaries + verdict stats into the call summary."""
+    parts = _collapse(list(parts))
+    chunk_items = [a for p in parts for a in p.get("action_items", [])]
+    top_claims, top_verdicts = _top_claims(claims, verdicts)
+    call_summary = ""
+    action_items: List[str] = []
+    try:
+        parsed = _generate_json(
+            REDUCE_PROMPT
+            .replace("{VERDICT_STATS}", json.dumps(_verdict_stats(verdicts), ensure_ascii=False))
+            .replace("{PARTS_JSON}", json.dumps([{"start": p["start"], "end": p["end"], "summary": p["summary"]}
+                                                 for p in parts], ensure_ascii=False))
+            .replace("{CLAIMS_JSON}", json.dumps([{"id": c.id, "text": c.text} for c in top_claims], ensure_ascii=False))
+            .replace("{VERDICTS_JSON}", json.dumps([{
+                "claim_id": v.claim_id,
+                "label": v.label,
+                "confidence": v.confidence,
+                "rationale": v.rationale
+            } for v in top_verdicts], ensure_ascii=False)),
+        )
+        call_summary = (parsed.get("call_summary") or "").strip()
+        action_items = parsed.get("action_items") or []
+        if not isinstance(action_items, list):
+            action_items = [str(action_items)]
+    except Exception as e:
+        # Fallback: the part summaries themselves, in call order
+        print(f"[summarizer] watsonx reduce failed: {e}")
+    if not call_summary:
+        joined = " ".join(p["summary"] for p in parts if p.get("summary"))
+        call_summary = joined[:900].strip() + ("…" if len(joined) > 900 else "")
+        action_items = action_items or list(dict.fromkeys(chunk_items))[:6]
+
+    return CallReport(
+        call_summary=call_summary,
+        claim_table=claim_table,
+        action_items=action_items,
+        claims=claims,
+        verdicts=verdicts,
+        evidence=evidence_flat,
+        evidence_by_claim=evidence_by_claim or {},
+    )
@@ -1,13 +1,13 @@
 # app/agents/verifier.py
 from __future__ import annotations
-import os, json, requests
+import json
 from typing import List, Dict
 
 from app.schemas.claim import Claim
 from app.schemas.evidence import Evidence
 from app.schemas.verdict import Verdict
-from app.core.config import WATSONX_BASE_URL, WATSONX_PROJECT, IBM_VERIFIER_MODEL_ID, IBM_API_VERSION
-from app.core.auth import get_ibm_iam_token
+from app.core import health, watsonx
+from app.core.config import WATSONX_PROJECT, IBM_VERIFIER_MODEL_ID
 from app.core.parse_json import parse_json_anywhere 
 
 PROMPT = """You are a precise fact verifier.
@@ -37,24 +37,13 @@ Output JSON:
 """
 
 
-def _gen(url: str, body: dict, timeout: int = 120) -> str:
-	"""Low-level call to watsonx text/generation; returns raw model text."""
-	tok = get_ibm_iam_token()
-	headers = {
-		"Authorization": f"Bearer {tok}",
-		"Accept": "application/json",
-		"Content-Type": "application/json",
-	}
-	r = requests.post(url, headers=headers, json=body, timeout=timeout)
-	r.raise_for_status()
-	j = r.json()
-	res = j.get("results") or []
-	return (res[0].get("generated_text") if res else "") or ""
+def _gen(body: dict, timeout: int = 120) -> str:
+	"""Low-level call to watsonx text/generation (via the shared governor); returns raw model text."""
+	return watsonx.generated_text(watsonx.post("generation", body, timeout=timeout))
 
 
 def _post_generation(prompt: str) -> dict:
 	"""Call model → parse with parse_json_anywhere(root='verdicts') → repair once if needed."""
-	url = f"{WATSONX_BASE_URL.rstrip('/')}/ml/v1/text/generation?version={IBM_API_VERSION}"
 	body = {
 		"input": prompt,
 		"model_id": IBM_VERIFIER_MODEL_ID,
@@ -68,7 +57,7 @@ def _post_generation(prompt: str) -> dict:
 		},
 	}
 
-	text = _gen(url, body)
+	text = _gen(body)
 	parsed = parse_json_anywhere(text, root_key="verdicts")
 	if parsed and parsed.get("verdicts"):
 		return parsed
@@ -87,7 +76,7 @@ def _post_generation(prompt: str) -> dict:
 			"temperature": 0.0,
 		},
 	}
-	repaired = _gen(url, repair_body)
+	repaired = _gen(repair_body)
 	reparsed = parse_json_anywhere(repaired, root_key="verdicts")
 	if reparsed and reparsed.get("verdicts"):
 		return reparsed
@@ -97,10 +86,12 @@ def _post_generation(prompt: str) -> dict:
 	return {"verdicts": []}
 
 
-def verify(claims: List[Claim], evidence_map: Dict[str, List[Evidence]]) -> List[Verdict]:
+def verify(claims: List[Claim], evidence_map: Dict[str, List[Evidence]], strict: bool = False) -> List[Verdict]:
 	"""
 	claims: list of Claim (must have .id and .text)
 	evidence_map: claim_id -> List[Evidence] (must have .doc_id, .snippet)
+	strict: raise instead of returning "insufficient" fallbacks when the model
+	        is down or fails, and leave out claims it gave no verdict for
 	returns: List[Verdict]
 	"""
 	# 1) Flatten evidence to a doc_id -> snippet catalog
@@ -121,8 +112,12 @@ def verify(claims: List[Claim], evidence_map: Dict[str, List[Evidence]]) -> List
 
 	# 4) Call model + robust parse
 	try:
+		if not health.usable("generation", IBM_VERIFIER_MODEL_ID):
+			raise RuntimeError("verifier model is down (health monitor)")
 		parsed = _post_generation(prompt)
 	except Exception as e:
+		if strict:
+			raise
 		# Fail-safe: mark all as insufficient
 		print(f"[verifier] generation failed: {e}")
 		return [
@@ -170,6 +165,9 @@ def verify(claims: List[Claim], evidence_map: Dict[str, List[Evidence]]) -> List
 			citation_ids=cites,
 		))
 
+	if strict:
+		return out
+
 	# Ensure every claim has a verdict
 	have = {v.claim_id for v in out}
 	for c in claims:
@@ -1,6 +1,6 @@
 import time
 import requests
-from app.core.config import WATSONX_API_KEY
+from app.core.config import WATSONX_API_KEY, IBM_IAM_URL
 
 
 _iam_cache = {"token": None, "expiry": 0.0}
@@ -14,7 +14,7 @@ def get_ibm_iam_token() -> str:
         return token
 
     response = requests.post(
-        "https://iam.cloud.ibm.com/identity/token",
+        IBM_IAM_URL,
         data={
             "grant_type": "urn:ibm:params:oauth:grant-type:apikey",
             "apikey": WATSONX_API_KEY,
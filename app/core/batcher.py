@@ -0,0 +1,209 @@
+# app/core/batcher.py
+from __future__ import annotations
+import contextvars, threading, time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+from app.core import profiler
+from app.core.config import (
+    MICROBATCH_WINDOW_MS,
+    MICROBATCH_MAX_ITEMS,
+    MICROBATCH_MAX_DELAY_MS,
+    MICROBATCH_MAX_INFLIGHT,
+)
+
+
+class _Pending:
+    __slots__ = ("key", "items", "ctx", "enqueued", "taken", "done", "result", "error")
+
+    def __init__(self, key: Hashable, items: list):
+        self.key = key
+        self.items = items
+        self.ctx = contextvars.copy_context()   # the submitter's, for fn's contextvars and profiles
+        self.enqueued = time.monotonic()
+        self.taken = False
+        self.done = threading.Event()
+        self.result: Optional[list] = None
+        self.error: Optional[BaseException] = None
+
+
+class MicroBatcher:
+    """
+    Coalesces small concurrent calls into one batched call.
+
+    `submit(key, items)` queues a request and blocks until its results are in.
+    A dispatcher thread waits up to `window_ms` after the oldest queued request
+    (or until `max_items` items with the same key are queued), then calls
+    `fn(key, all_items)` once and hands each caller back its own slice.
+    `fn` must return one result per item, in order. It runs in the first
+    caller's context, and every caller's profile sees it (profiler.joined).
+    At most `max_inflight` batches run at once; a request that hasn't been
+    picked up within `max_delay_ms` runs on its own instead, so batching never
+    adds more than that to a call's latency. If a batch of several requests
+    fails, each is retried on its own, so one bad input only fails its caller.
+    """
+
+    def __init__(self, fn: Callable[[Hashable, list], list], name: str = "batch",
+                 window_ms: float = MICROBATCH_WINDOW_MS, max_items: int = MICROBATCH_MAX_ITEMS,
+                 max_delay_ms: float = MICROBATCH_MAX_DELAY_MS, max_inflight: int = MICROBATCH_MAX_INFLIGHT):
+        self.fn = fn
+        self.name = name
+        self.window = window_ms / 1000.0
+        self.max_items = max(1, max_items)
+        self.max_delay = max(max_delay_ms, window_ms) / 1000.0
+        self._slots = threading.Semaphore(max(1, max_inflight))
+        self._pool = ThreadPoolExecutor(max_workers=max(1, max_inflight), thread_name_prefix=f"{name}-batch")
+        self._cond = threading.Condition()
+        self._queue: "deque[_Pending]" = deque()
+        self._thread: Optional[threading.Thread] = None
+        self.counts = {"requests": 0, "items": 0, "batches": 0, "batched_items": 0,
+                       "bypassed": 0, "max_batch": 0, "errors": 0, "split_retries": 0}
+
+    # -------- Public API --------
+
+    def submit(self, key: Hashable, items: list) -> list:
+        if not items:
+            return []
+        p = _Pending(key, list(items))
+        with self._cond:
+            self.counts["requests"] += 1
+            self.counts["items"] += len(p.items)
+            self._queue.append(p)
+            self._ensure_thread()
+            self._cond.notify_all()
+        if not p.done.wait(self.max_delay):
+            with self._cond:
+                bypass = not p.taken
+                if bypass:
+                    self._queue.remove(p)
+                    self.counts["bypassed"] += 1
+            if bypass:
+                return self.fn(key, p.items)
+            p.done.wait()
+        if p.error is not None:
+            raise p.error
+        return p.result
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            out = dict(self.counts)
+            out["queued"] = len(self._queue)
+        out["mean_batch"] = round(out["batched_items"] / out["batches"], 2) if out["batches"] else 0.0
+        out["window_ms"] = self.window * 1000.0
+        out["max_items"] = self.max_items
+        out["max_delay_ms"] = self.max_delay * 1000.0
+        return out
+
+    # -------- Dispatcher --------
+
+    def _ensure_thread(self) -> None:
+        # _cond held
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name=f"{self.name}-dispatch", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            self._slots.acquire()   # wait for a free in-flight slot before collecting a batch
+            batch = self._collect()
+            self._pool.submit(self._dispatch, batch)
+
+    def _collect(self) -> List[_Pending]:
+        with self._cond:
+            while True:
+                while not self._queue:
+                    self._cond.wait()
+                first = self._queue[0]
+                deadline = first.enqueued + self.window
+                while self._queue and self._queue[0] is first and time.monotonic() < deadline \
+                        and self._queued_items(first.key) < self.max_items:
+                    self._cond.wait(max(0.0, deadline - time.monotonic()))
+                if self._queue and self._queue[0] is first:
+                    break
+                # the first request bypassed: wait out the new head's own window
+            key = self._queue[0].key
+            batch, n = [], 0
+            for p in list(self._queue):
+                if p.key != key:
+                    continue
+                if batch and n + len(p.items) > self.max_items:
+                    break
+                batch.append(p)
+                n += len(p.items)
+            for p in batch:
+                p.taken = True
+                self._queue.remove(p)
+            return batch
+
+    def _queued_items(self, key: Hashable) -> int:
+        return sum(len(p.items) for p in self._queue if p.key == key)
+
+    def _call(self, batch: List[_Pending]) -> list:
+        items = [it for p in batch for it in p.items]
+        results = batch[0].ctx.run(profiler.joined, [p.ctx for p in batch], self.fn, batch[0].key, items)
+        if len(results) != len(items):
+            raise RuntimeError(f"{self.name}: {len(results)} results for {len(items)} items")
+        return results
+
+    def _dispatch(self, batch: List[_Pending]) -> None:
+        try:
+            items = [it for p in batch for it in p.items]
+            try:
+                results = self._call(batch)
+            except BaseException as e:
+                with self._cond:
+                    self.counts["errors"] += 1
+                    if len(batch) > 1:
+                        self.counts["split_retries"] += 1
+                if len(batch) == 1:
+                    batch[0].error = e
+                    batch[0].done.set()
+                    return
+                # one caller's bad input must not fail the others: retry each request alone
+                for p in batch:
+                    try:
+                        p.result = self._call([p])
+                    except BaseException as e2:
+                        p.error = e2
+                    p.done.set()
+                return
+            with self._cond:
+                self.counts["batches"] += 1
+                self.counts["batched_items"] += len(items)
+                self.counts["max_batch"] = max(self.counts["max_batch"], len(items))
+            i = 0
+            for p in batch:
+                p.result = results[i:i + len(p.items)]
+                i += len(p.items)
+                p.done.set()
+        finally:
+            self._slots.release()
+
+
+class SingleFlight:
+    """Concurrent calls with the same key share one execution of `fn`."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._inflight: Dict[Hashable, Future] = {}
+        self.coalesced = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            fut = self._inflight.get(key)
+            leader = fut is None
+            if leader:
+                fut = self._inflight[key] = Future()
+            else:
+                self.coalesced += 1
+        if not leader:
+            return fut.result()
+        try:
+            fut.set_result(fn())
+        except BaseException as e:
+            fut.set_exception(e)
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+        return fut.result()
@@ -0,0 +1,115 @@
+# app/core/bm25.py
+from __future__ import annotations
+import json, math, re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+# Keep numbers like 99.982 / 124,801 / 250ms intact: they are what claims hinge on.
+_TOKEN_RE = re.compile(r"\d+(?:[.,]\d+)*|[a-z]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from had has have in is it of on or our that the "
+    "their this to was we were with".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    toks = _TOKEN_RE.findall((text or "").lower())
+    return [t.replace(",", "") for t in toks if t not in _STOPWORDS]
+
+
+class BM25Index:
+    """
+    In-memory Okapi BM25 inverted index over KB snippets.
+    Row ids match the FAISS index / kb_meta.json order, so both can be searched
+    (and filtered) with the same ids.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.doc_len: List[int] = []
+        self.postings: Dict[str, Dict[int, int]] = {}   # term -> {row id: tf}
+
+    @classmethod
+    def build(cls, texts: Iterable[str], **kw) -> "BM25Index":
+        idx = cls(**kw)
+        idx.add(texts)
+        return idx
+
+    def add(self, texts: Iterable[str]) -> None:
+        """Append documents; their row ids continue after the existing ones."""
+        for text in texts:
+            row = len(self.doc_len)
+            toks = tokenize(text)
+            self.doc_len.append(len(toks))
+            for t in toks:
+                tf = self.postings.setdefault(t, {})
+                tf[row] = tf.get(row, 0) + 1
+
+    def __len__(self) -> int:
+        return len(self.doc_len)
+
+    def search(self, query: str, k: int = 8, subset: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (scores, row ids) of the top-k rows, optionally limited to `subset` rows."""
+        n = len(self.doc_len)
+        if not n:
+            return np.empty(0, dtype="float32"), np.empty(0, dtype="int64")
+        lengths = np.asarray(self.doc_len, dtype="float32")
+        avgdl = float(lengths.mean()) or 1.0
+        norm = self.k1 * (1.0 - self.b + self.b * lengths / avgdl)
+        scores = np.zeros(n, dtype="float32")
+        for t in set(tokenize(query)):
+            tf_map = self.postings.get(t)
+            if not tf_map:
+                continue
+            rows = np.fromiter(tf_map.keys(), dtype="int64", count=len(tf_map))
+            tf = np.fromiter(tf_map.values(), dtype="float32", count=len(tf_map))
+            idf = math.log(1.0 + (n - len(tf_map) + 0.5) / (len(tf_map) + 0.5))
+            scores[rows] += idf * tf * (self.k1 + 1.0) / (tf + norm[rows])
+        if subset is not None:
+            mask = np.zeros(n, dtype=bool)
+            mask[subset] = True
+            scores[~mask] = 0.0
+        hits = np.flatnonzero(scores > 0)
+        if not len(hits):
+            return np.empty(0, dtype="float32"), np.empty(0, dtype="int64")
+        top = hits[np.argsort(-scores[hits], kind="stable")[:k]]
+        return scores[top], top
+
+    # -------- Persistence (kb/index/kb_bm25.json) --------
+
+    def to_dict(self) -> dict:
+        return {
+            "k1": self.k1, "b": self.b, "doc_len": self.doc_len,
+            "postings": {t: [list(m.keys()), list(m.values())] for t, m in self.postings.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "BM25Index":
+        idx = cls(k1=d.get("k1", 1.5), b=d.get("b", 0.75))
+        idx.doc_len = list(d.get("doc_len") or [])
+        idx.postings = {t: dict(zip(rows, tfs)) for t, (rows, tfs) in (d.get("postings") or {}).items()}
+        return idx
+
+    def save(self, path: str) -> None:
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f)
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+
+def reciprocal_rank_fusion(rankings: List[List[int]], k: int = 60) -> List[Tuple[int, float]]:
+    """
+    Fuse several ranked id lists: score(d) = sum 1 / (k + rank). Scores are
+    scaled so a row ranked first in every list gets 1.0.
+    """
+    fused: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, row in enumerate(ranking, 1):
+            fused[row] = fused.get(row, 0.0) + 1.0 / (k + rank)
+    best = len([r for r in rankings if r]) / (k + 1.0) or 1.0
+    return sorted(((row, s / best) for row, s in fused.items()), key=lambda x: -x[1])
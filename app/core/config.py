@@ -9,9 +9,120 @@ WHISPER_MODEL_SIZE = os.getenv("WHISPER_MODEL_SIZE", "")
 WATSONX_BASE_URL = os.getenv("WATSONX_BASE_URL", "")
 WATSONX_PROJECT  = os.getenv("WATSONX_PROJECT_ID", "")
 WATSONX_API_KEY  = os.getenv("WATSONX_API_KEY", "")
+IBM_IAM_URL = os.getenv("IBM_IAM_URL", "https://iam.cloud.ibm.com/identity/token")   # point at bench/watsonx_stub.py for load tests
 IBM_API_VERSION = os.getenv("IBM_API_VERSION", "")
 IBM_EMBEDDINGS_MODEL_ID = os.getenv("IBM_EMBEDDINGS_MODEL_ID", "")
 IBM_RERANK_MODEL_ID = os.getenv("IBM_RERANK_MODEL_ID", "")
 IBM_CLAIM_MODEL_ID = os.getenv("IBM_CLAIM_MODEL_ID", "")
 IBM_VERIFIER_MODEL_ID = os.getenv("IBM_VERIFIER_MODEL_ID", "")
-IBM_SUMMARY_MODEL_ID = os.getenv("IBM_SUMMARY_MODEL_ID", "")
\ No newline at end of file
+IBM_SUMMARY_MODEL_ID = os.getenv("IBM_SUMMARY_MODEL_ID", "")
+
+# Outbound watsonx traffic governor (app/core/watsonx.py)
+WATSONX_RATE_LIMITS = os.getenv("WATSONX_RATE_LIMITS", "generation=8,embeddings=20,rerank=10")  # req/s per model; "endpoint:model=rps" overrides
+WATSONX_CONCURRENCY_INITIAL = int(os.getenv("WATSONX_CONCURRENCY_INITIAL", "4"))   # AIMD start, per endpoint
+WATSONX_CONCURRENCY_MIN = int(os.getenv("WATSONX_CONCURRENCY_MIN", "1"))
+WATSONX_CONCURRENCY_MAX = int(os.getenv("WATSONX_CONCURRENCY_MAX", "32"))
+WATSONX_AIMD_COOLDOWN_S = float(os.getenv("WATSONX_AIMD_COOLDOWN_S", "1.0"))       # at most one halving per window
+WATSONX_RETRIES = int(os.getenv("WATSONX_RETRIES", "4"))
+WATSONX_BACKOFF_S = float(os.getenv("WATSONX_BACKOFF_S", "1.5"))
+WATSONX_HEDGE = os.getenv("WATSONX_HEDGE", "0").lower() not in ("0", "false", "no")   # duplicate slow idempotent calls
+WATSONX_HEDGE_PERCENTILE = float(os.getenv("WATSONX_HEDGE_PERCENTILE", "95"))   # hedge once a call outlives this latency
+WATSONX_HEDGE_MIN_SAMPLES = int(os.getenv("WATSONX_HEDGE_MIN_SAMPLES", "20"))
+WATSONX_HEDGE_MIN_DELAY_MS = float(os.getenv("WATSONX_HEDGE_MIN_DELAY_MS", "200"))
+WATSONX_HEDGE_BUDGET = float(os.getenv("WATSONX_HEDGE_BUDGET", "0.1"))          # max hedges / requests
+WATSONX_BREAKER_FAILURES = int(os.getenv("WATSONX_BREAKER_FAILURES", "5"))      # consecutive failures to open
+WATSONX_BREAKER_COOLDOWN_S = float(os.getenv("WATSONX_BREAKER_COOLDOWN_S", "30"))
+
+# Record/replay of watsonx traffic (app/core/transport.py)
+WATSONX_TRANSPORT = os.getenv("WATSONX_TRANSPORT", "passthrough").lower()   # passthrough | record | replay
+WATSONX_CASSETTE_DIR = os.getenv("WATSONX_CASSETTE_DIR", "data/cassettes/default")
+WATSONX_REPLAY_LATENCY_SCALE = float(os.getenv("WATSONX_REPLAY_LATENCY_SCALE", "0"))   # 1 = sleep recorded latencies
+WATSONX_REPLAY_MISS = os.getenv("WATSONX_REPLAY_MISS", "error").lower()    # error | passthrough
+
+# Background watsonx health monitor (app/core/health.py)
+HEALTH_PROBE = os.getenv("HEALTH_PROBE", "1").lower() not in ("0", "false", "no")
+HEALTH_PROBE_INTERVAL_S = float(os.getenv("HEALTH_PROBE_INTERVAL_S", "30"))
+HEALTH_WINDOW_S = float(os.getenv("HEALTH_WINDOW_S", "300"))          # rolling stats cover this much history
+HEALTH_DOWN_FAILURES = int(os.getenv("HEALTH_DOWN_FAILURES", "3"))       # this many failures in a row = down (for a breaker cooldown)
+HEALTH_DEGRADED_ERROR_RATE = float(os.getenv("HEALTH_DEGRADED_ERROR_RATE", "0.1"))
+HEALTH_SLOW_MS = float(os.getenv("HEALTH_SLOW_MS", "15000"))          # p95 above this = degraded
+
+# Orchestrator pipeline (per-stage concurrency of the DAG scheduler)
+ORCH_EXTRACT_CONCURRENCY = int(os.getenv("ORCH_EXTRACT_CONCURRENCY", "2"))
+ORCH_RETRIEVE_CONCURRENCY = int(os.getenv("ORCH_RETRIEVE_CONCURRENCY", "4"))
+ORCH_VERIFY_CONCURRENCY = int(os.getenv("ORCH_VERIFY_CONCURRENCY", "2"))
+ORCH_SUMMARY_CONCURRENCY = int(os.getenv("ORCH_SUMMARY_CONCURRENCY", "1"))
+ORCH_VERIFY_BATCH_SIZE = int(os.getenv("ORCH_VERIFY_BATCH_SIZE", "4"))
+ORCH_EXTRACT_CHUNK_CHARS = int(os.getenv("ORCH_EXTRACT_CHUNK_CHARS", "4000"))
+CLAIM_DEDUPE = os.getenv("CLAIM_DEDUPE", "1").lower() not in ("0", "false", "no")
+CLAIM_DEDUPE_THRESHOLD = float(os.getenv("CLAIM_DEDUPE_THRESHOLD", "0.9"))   # cosine between claim embeddings
+
+# Stored reports + re-verification after KB updates (app/core/report_store.py, app/core/reverify.py)
+REPORT_STORE = os.getenv("REPORT_STORE", "1").lower() not in ("0", "false", "no")
+REPORTS_DIR = os.getenv("REPORTS_DIR", "data/reports")
+REPORTS_MAX_STORED = int(os.getenv("REPORTS_MAX_STORED", "1000"))         # least recently updated beyond this are deleted (0 = keep all)
+
+# Report wire format (app/core/wire.py)
+WIRE_COMPRESS_MIN_BYTES = int(os.getenv("WIRE_COMPRESS_MIN_BYTES", "1024"))   # smaller bodies go out uncompressed
+WIRE_GZIP_LEVEL = int(os.getenv("WIRE_GZIP_LEVEL", "6"))
+WIRE_BROTLI_QUALITY = int(os.getenv("WIRE_BROTLI_QUALITY", "5"))
+
+# Live calls (WebSocket audio ingest, app/core/live.py)
+LIVE_SAMPLE_RATE = 16000                                                   # whisper input rate; clients are resampled to it
+LIVE_ASR_STEP_S = float(os.getenv("LIVE_ASR_STEP_S", "2.0"))              # re-transcribe after this much new audio
+LIVE_ASR_HOLDBACK_S = float(os.getenv("LIVE_ASR_HOLDBACK_S", "1.5"))      # segments ending this close to the buffer end stay tentative
+LIVE_ASR_MAX_BUFFER_S = float(os.getenv("LIVE_ASR_MAX_BUFFER_S", "30"))   # past this, everything decoded is committed
+LIVE_EXTRACT_MIN_CHARS = int(os.getenv("LIVE_EXTRACT_MIN_CHARS", "120"))  # new committed text per extraction window
+LIVE_EXTRACT_CONTEXT_SEGMENTS = int(os.getenv("LIVE_EXTRACT_CONTEXT_SEGMENTS", "2"))  # already-checked segments repeated as context
+LIVE_VERIFY_CONCURRENCY = int(os.getenv("LIVE_VERIFY_CONCURRENCY", "2"))
+
+# Map-reduce call summaries (app/agents/summarizer.py)
+SUMMARY_CHUNK_CHARS = int(os.getenv("SUMMARY_CHUNK_CHARS", "6000"))        # transcript per map call; shorter calls use one pass
+SUMMARY_MAP_CONCURRENCY = int(os.getenv("SUMMARY_MAP_CONCURRENCY", "2"))
+SUMMARY_REDUCE_MAX_CHARS = int(os.getenv("SUMMARY_REDUCE_MAX_CHARS", "8000"))  # above this, chunk summaries are merged in rounds
+SUMMARY_MAX_CLAIMS = int(os.getenv("SUMMARY_MAX_CLAIMS", "40"))            # claims/verdicts shown to the reduce step
+
+# Per-request sampling profiler (app/core/profiler.py)
+PROFILE_HEADER = os.getenv("PROFILE_HEADER", "1").lower() not in ("0", "false", "no")   # honour "X-Profile: 1"
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))       # fraction of requests profiled at random
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))       # stack sampling period
+PROFILE_KEEP_MIN_MS = float(os.getenv("PROFILE_KEEP_MIN_MS", "0"))       # sampled (not requested) profiles faster than this are dropped
+PROFILES_DIR = os.getenv("PROFILES_DIR", "data/profiles")
+PROFILE_MAX_STORED = int(os.getenv("PROFILE_MAX_STORED", "200"))         # oldest profiles beyond this are deleted
+
+# Cross-call verdict cache (claim embedding + KB version -> Verdict + evidence)
+VERDICT_CACHE = os.getenv("VERDICT_CACHE", "1").lower() not in ("0", "false", "no")
+VERDICT_CACHE_THRESHOLD = float(os.getenv("VERDICT_CACHE_THRESHOLD", "0.97"))
+VERDICT_CACHE_MAX_ENTRIES = int(os.getenv("VERDICT_CACHE_MAX_ENTRIES", "10000"))
+VERDICT_CACHE_TTL_S = float(os.getenv("VERDICT_CACHE_TTL_S", "86400"))
+VERDICT_CACHE_KB_VERSIONS = int(os.getenv("VERDICT_CACHE_KB_VERSIONS", "2"))   # KB versions kept per tenant (calls in flight keep the older one busy)
+
+# Retriever
+RETRIEVER_METADATA_FILTERS = os.getenv("RETRIEVER_METADATA_FILTERS", "1").lower() not in ("0", "false", "no")
+KB_RELOAD_INTERVAL_S = float(os.getenv("KB_RELOAD_INTERVAL_S", "1.0"))         # how often readers re-check kb/index/CURRENT
+KB_SNAPSHOT_RETENTION_DAYS = float(os.getenv("KB_SNAPSHOT_RETENTION_DAYS", "14"))
+KB_SNAPSHOT_MIN_KEEP = int(os.getenv("KB_SNAPSHOT_MIN_KEEP", "3"))
+KB_TENANTS_DIR = os.getenv("KB_TENANTS_DIR", "kb/tenants")          # <dir>/<kb>/snippets.jsonl + <dir>/<kb>/index/
+KB_DEFAULT_TENANT = os.getenv("KB_DEFAULT_TENANT", "default")      # served from kb/snippets.jsonl + kb/index/
+KB_MEMORY_BUDGET_MB = float(os.getenv("KB_MEMORY_BUDGET_MB", "2048"))  # loaded KBs beyond this are evicted (LRU)
+KB_INDEX_DTYPE = os.getenv("KB_INDEX_DTYPE", "float32").lower()   # float32 | fp16 | int8 (scalar-quantized) for new builds
+KB_RESCORE_FACTOR = int(os.getenv("KB_RESCORE_FACTOR", "4"))      # quantized index: re-score k*factor hits in float32; 0 = off
+RETRIEVER_MODE = os.getenv("RETRIEVER_MODE", "vector").lower()   # vector | lexical | hybrid (opt-in; Evidence.score becomes an RRF score)
+RETRIEVER_RRF_K = int(os.getenv("RETRIEVER_RRF_K", "60"))
+RERANK_SKIP_MARGIN = float(os.getenv("RERANK_SKIP_MARGIN", "0.15"))   # top1 - best other vector cosine (any mode)
+RERANK_SKIP_SCORE = float(os.getenv("RERANK_SKIP_SCORE", "0.9"))     # top1 vector cosine
+RERANK_CACHE_SIZE = int(os.getenv("RERANK_CACHE_SIZE", "2048"))
+RERANK_CACHE_TTL_S = float(os.getenv("RERANK_CACHE_TTL_S", "900"))
+MICROBATCH = os.getenv("MICROBATCH", "1").lower() not in ("0", "false", "no")   # coalesce concurrent embedding calls
+MICROBATCH_WINDOW_MS = float(os.getenv("MICROBATCH_WINDOW_MS", "5"))        # wait this long for more inputs
+MICROBATCH_MAX_ITEMS = int(os.getenv("MICROBATCH_MAX_ITEMS", "64"))         # ... or until this many are queued
+MICROBATCH_MAX_DELAY_MS = float(os.getenv("MICROBATCH_MAX_DELAY_MS", "50"))  # never queue a call longer than this
+MICROBATCH_MAX_INFLIGHT = int(os.getenv("MICROBATCH_MAX_INFLIGHT", "4"))    # batched calls running at once
+
+# Embeddings
+EMBED_BACKEND = os.getenv("EMBED_BACKEND", "auto").lower()               # auto | ibm | st | onnx
+EMBED_LOCAL_BACKEND = os.getenv("EMBED_LOCAL_BACKEND", "st").lower()     # fallback when IBM is unavailable
+EMBED_LOCAL_MODEL = os.getenv("EMBED_LOCAL_MODEL", "all-MiniLM-L6-v2")
+EMBED_ONNX_FILE = os.getenv("EMBED_ONNX_FILE", "onnx/model_quint8_avx2.onnx")
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+EMBED_THREADS = int(os.getenv("EMBED_THREADS", "0"))                     # 0 = library default
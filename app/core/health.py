@@ -0,0 +1,198 @@
+# app/core/health.py
+"""
+Background health monitor for the configured watsonx models.
+
+A daemon thread probes each configured model (embeddings, rerank, and the
+claim/verifier/summary generators) every HEALTH_PROBE_INTERVAL_S at
+"background" priority. Every watsonx request, whether probe or real traffic,
+is also observed through app.core.watsonx, so the rolling per-(endpoint, model)
+latency and error-rate stats reflect live conditions between probes.
+
+`/health/ibm` serves `monitor.snapshot()` without touching watsonx, and
+callers use `usable(endpoint, model)` to route around a model that is down:
+local embeddings for KB builds, BM25 instead of query embeddings, no rerank,
+and the verifier/summary fallbacks.
+
+A model is "down" only while its endpoint's breaker rejects calls, or for one
+breaker cooldown after HEALTH_DOWN_FAILURES failures in a row. Callers stop
+sending it traffic while it is down, so the window's error rate would lag
+far behind a recovery; it only marks a model "degraded".
+"""
+from __future__ import annotations
+import threading, time
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.core import watsonx
+from app.core import ibm_sanity
+from app.core.config import (
+    WATSONX_BASE_URL,
+    WATSONX_PROJECT,
+    WATSONX_API_KEY,
+    IBM_EMBEDDINGS_MODEL_ID,
+    IBM_RERANK_MODEL_ID,
+    IBM_CLAIM_MODEL_ID,
+    IBM_VERIFIER_MODEL_ID,
+    IBM_SUMMARY_MODEL_ID,
+    HEALTH_PROBE_INTERVAL_S,
+    HEALTH_WINDOW_S,
+    HEALTH_DOWN_FAILURES,
+    HEALTH_DEGRADED_ERROR_RATE,
+    HEALTH_SLOW_MS,
+)
+
+
+def _probes() -> List[Tuple[str, str, str, Callable[[], dict]]]:
+    """(name, endpoint, model, probe) for every configured model."""
+    out = []
+    if IBM_EMBEDDINGS_MODEL_ID:
+        out.append(("embeddings", "embeddings", IBM_EMBEDDINGS_MODEL_ID, ibm_sanity.sanity_embeddings))
+    if IBM_RERANK_MODEL_ID:
+        out.append(("rerank", "rerank", IBM_RERANK_MODEL_ID, ibm_sanity.sanity_rerank))
+    for name, model in (("claim_gen", IBM_CLAIM_MODEL_ID), ("verify_gen", IBM_VERIFIER_MODEL_ID),
+                        ("summary_gen", IBM_SUMMARY_MODEL_ID)):
+        if model:
+            out.append((name, "generation", model,
+                        lambda m=model: ibm_sanity.sanity_generation(m, "Say OK")))
+    return out
+
+
+class HealthMonitor:
+    def __init__(self, interval: float = HEALTH_PROBE_INTERVAL_S, window: float = HEALTH_WINDOW_S):
+        self.interval = interval
+        self.window = window
+        self._lock = threading.Lock()
+        self._obs: Dict[Tuple[str, str], deque] = {}      # (endpoint, model) -> (t, ok, seconds, error)
+        self._probes: Dict[str, Dict[str, Any]] = {}        # probe name -> last result
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.rounds = 0
+        self.last_round: Optional[float] = None
+
+    # -------- Observations --------
+
+    def observe(self, endpoint: str, model: str, ok: bool, seconds: float, error: Optional[str] = None) -> None:
+        with self._lock:
+            q = self._obs.setdefault((endpoint, model), deque(maxlen=1000))
+            q.append((time.time(), ok, seconds, error))
+
+    def _recent(self, endpoint: str, model: str) -> list:
+        # _lock held
+        cutoff = time.time() - self.window
+        q = self._obs.get((endpoint, model))
+        while q and q[0][0] < cutoff:
+            q.popleft()
+        return list(q) if q else []
+
+    def model_stats(self, endpoint: str, model: str) -> Dict[str, Any]:
+        with self._lock:
+            recent = self._recent(endpoint, model)
+        lane_breaker = watsonx.governor.lane(endpoint).breaker
+        breaker, rejecting = lane_breaker.state, lane_breaker.is_open()
+        if not recent:
+            return {"state": "down" if rejecting else "unknown", "n": 0, "breaker": breaker}
+        errors = sum(1 for _, ok, _, _ in recent if not ok)
+        lat = np.asarray([s for _, ok, s, _ in recent if ok]) * 1000.0
+        rate = errors / len(recent)
+        p95 = float(np.percentile(lat, 95)) if len(lat) else None
+        n = max(1, HEALTH_DOWN_FAILURES)
+        tail = recent[-n:]
+        failing = (len(tail) == n and not any(ok for _, ok, _, _ in tail)
+                   and time.time() - tail[-1][0] < lane_breaker.cooldown)
+        if rejecting or failing:
+            state = "down"
+        elif rate >= HEALTH_DEGRADED_ERROR_RATE or (p95 is not None and p95 > HEALTH_SLOW_MS):
+            state = "degraded"
+        else:
+            state = "up"
+        last_error = next((e for _, ok, _, e in reversed(recent) if not ok), None)
+        return {
+            "state": state,
+            "n": len(recent),
+            "error_rate": round(rate, 3),
+            "p50_ms": round(float(np.percentile(lat, 50)), 1) if len(lat) else None,
+            "p95_ms": round(p95, 1) if p95 is not None else None,
+            "last_error": last_error,
+            "breaker": breaker,
+        }
+
+    def usable(self, endpoint: str, model: str) -> bool:
+        """False when `model` is known to be down (unknown counts as usable)."""
+        return self.model_stats(endpoint, model)["state"] != "down"
+
+    # -------- Probing --------
+
+    def probe_once(self) -> None:
+        with watsonx.priority("background"):
+            for name, endpoint, model, fn in _probes():
+                t0 = time.monotonic()
+                try:
+                    res = {**fn(), "error": None}
+                except Exception as e:
+                    res = {"ok": False, "error": f"{type(e).__name__}: {e}"[:300]}
+                res.update(latency_ms=round((time.monotonic() - t0) * 1000.0, 1), at=time.time(),
+                           endpoint=endpoint, model=model)
+                with self._lock:
+                    self._probes[name] = res
+        with self._lock:
+            self.rounds += 1
+            self.last_round = time.time()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.probe_once()
+            except Exception as e:
+                print(f"[health] probe round failed: {e}")
+            self._stop.wait(self.interval)
+
+    def start(self) -> None:
+        if not (WATSONX_BASE_URL and WATSONX_PROJECT and WATSONX_API_KEY):
+            print("[health] watsonx not configured; background probes disabled")
+            return
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="health-probe", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    # -------- Reporting --------
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Cached health for /health/ibm: last probe per model + rolling stats."""
+        with self._lock:
+            probes = {k: dict(v) for k, v in self._probes.items()}
+            keys = list(self._obs)
+            rounds, last_round = self.rounds, self.last_round
+        models = {}
+        for name, endpoint, model, _ in _probes():
+            models[name] = {"endpoint": endpoint, "model": model, **self.model_stats(endpoint, model)}
+        for endpoint, model in keys:   # models seen in traffic but not probed
+            if not any(m["endpoint"] == endpoint and m["model"] == model for m in models.values()):
+                models[f"{endpoint}:{model}"] = {"endpoint": endpoint, "model": model,
+                                                 **self.model_stats(endpoint, model)}
+        states = [m["state"] for m in models.values()]
+        overall = ("down" if states and all(s == "down" for s in states)
+                   else "degraded" if any(s in ("down", "degraded") for s in states)
+                   else "up" if states and all(s == "up" for s in states) else "unknown")
+        return {
+            "ok": overall != "down",
+            "status": overall,
+            "probed_at": last_round,
+            "probe_rounds": rounds,
+            "interval_s": self.interval,
+            "models": models,
+            "probes": probes,
+        }
+
+
+monitor = HealthMonitor()
+watsonx.add_observer(monitor.observe)
+
+
+def usable(endpoint: str, model: str) -> bool:
+    return monitor.usable(endpoint, model)
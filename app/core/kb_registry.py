@@ -0,0 +1,188 @@
+# app/core/kb_registry.py
+from __future__ import annotations
+import os, threading, time
+from collections import OrderedDict, deque
+from typing import Any, Callable, Dict, Optional
+
+import numpy as np
+
+from app.core.config import KB_DEFAULT_TENANT, KB_MEMORY_BUDGET_MB, KB_RELOAD_INTERVAL_S
+from app.core.kb_store import KBStore
+
+
+class UnknownKBError(KeyError):
+    """Requested KB has no snippets and no published index."""
+
+
+class _Slot:
+    __slots__ = ("store", "kb", "version", "mtime", "checked", "nbytes", "lock")
+
+    def __init__(self, store: KBStore):
+        self.store = store
+        self.kb = None
+        self.version: Optional[str] = None
+        self.mtime: Optional[int] = None
+        self.checked = 0.0
+        self.nbytes = 0
+        self.lock = threading.Lock()
+
+
+class KBRegistry:
+    """
+    Per-tenant loaded KB snapshots, kept in memory under an LRU policy.
+
+    A tenant's KB is loaded on first use (cold load, timed), re-checks its
+    CURRENT pointer at most every `reload_interval` seconds, and is dropped
+    least-recently-used first once the loaded KBs exceed `budget_mb` (sized by
+    the snapshot files they were read from). The KB just requested is never
+    evicted, and in-flight calls keep their own reference to an evicted KB.
+
+    `open_snapshot(store, version)` and `open_lexical(store)` build the KB
+    objects (see app/agents/retriever.py); the registry only manages them.
+    """
+
+    def __init__(self, open_snapshot: Callable[[KBStore, str], Any],
+                 open_lexical: Callable[[KBStore], Any],
+                 budget_mb: float = KB_MEMORY_BUDGET_MB,
+                 reload_interval: float = KB_RELOAD_INTERVAL_S):
+        self._open_snapshot = open_snapshot
+        self._open_lexical = open_lexical
+        self.budget_bytes = int(budget_mb * 2**20)
+        self.reload_interval = reload_interval
+        self._lock = threading.Lock()
+        self._slots: "OrderedDict[str, _Slot]" = OrderedDict()   # LRU order, oldest first
+        self._cold_ms: deque = deque(maxlen=512)
+        self.counts = {"requests": 0, "cold_loads": 0, "reloads": 0, "evictions": 0}
+
+    # -------- Public API --------
+
+    def get(self, tenant: Optional[str] = None, vectors: bool = True):
+        """Loaded KB of `tenant` (default KB if None); with vectors=False a lexical-only KB may do."""
+        tenant = tenant or KB_DEFAULT_TENANT
+        slot = self._slot(tenant)
+        with slot.lock:
+            kb = self._refresh(tenant, slot, vectors)
+        self._enforce_budget(keep=tenant)
+        return kb
+
+    def store(self, tenant: Optional[str] = None) -> KBStore:
+        return self._slot(tenant or KB_DEFAULT_TENANT).store
+
+    def evict(self, tenant: str) -> bool:
+        with self._lock:
+            slot = self._slots.get(tenant)
+        if slot is None or slot.kb is None:
+            return False
+        with slot.lock:
+            self._drop(tenant, slot)
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            loaded = {t: {"version": s.version or (s.kb.version if s.kb is not None else None),
+                          "mb": round(s.nbytes / 2**20, 2)}
+                      for t, s in self._slots.items() if s.kb is not None}
+            used = sum(s.nbytes for s in self._slots.values())
+            cold = np.asarray(self._cold_ms) if self._cold_ms else None
+        return {
+            **self.counts,
+            "loaded": len(loaded),
+            "memory_mb": round(used / 2**20, 2),
+            "budget_mb": round(self.budget_bytes / 2**20, 2),
+            "cold_load_ms": None if cold is None else {
+                "p50": round(float(np.percentile(cold, 50)), 1),
+                "p95": round(float(np.percentile(cold, 95)), 1),
+                "max": round(float(cold.max()), 1),
+                "last": round(float(cold[-1]), 1),
+            },
+            "tenants": loaded,
+        }
+
+    # -------- Internals --------
+
+    def _slot(self, tenant: str) -> _Slot:
+        with self._lock:
+            self.counts["requests"] += 1
+            slot = self._slots.get(tenant)
+            if slot is None:
+                store = KBStore.for_tenant(tenant)
+                if tenant != KB_DEFAULT_TENANT and not store.exists():
+                    raise UnknownKBError(tenant)
+                slot = self._slots[tenant] = _Slot(store)
+            self._slots.move_to_end(tenant)
+            return slot
+
+    def _refresh(self, tenant: str, slot: _Slot, vectors: bool):
+        # slot.lock held: only one thread builds/loads a given tenant's index
+        now = time.monotonic()
+        kb = slot.kb
+        usable = kb is not None and (kb.index is not None or not vectors)
+        if usable and now - slot.checked < self.reload_interval:
+            return kb
+        slot.checked = now
+        mtime = slot.store.current_mtime()
+        if usable and mtime == slot.mtime:
+            return kb
+        version = slot.store.current()
+        if version is None and not vectors:
+            if kb is None:
+                t0 = time.perf_counter()
+                slot.kb = self._open_lexical(slot.store)
+                slot.nbytes = 2 * _file_size(slot.store.snippets)   # docs + BM25 postings
+                self._loaded(tenant, slot, t0, cold=True)
+            return slot.kb
+        if version is None:
+            version = slot.store.ensure_current()
+            mtime = slot.store.current_mtime()
+        if version != slot.version:
+            t0 = time.perf_counter()
+            new = self._open_snapshot(slot.store, version)
+            if kb is not None:
+                print(f"[kb_registry] {tenant}: KB snapshot {kb.version} -> {version}")
+            slot.version, slot.kb = version, new
+            slot.nbytes = slot.store.snapshot_bytes(version)
+            self._loaded(tenant, slot, t0, cold=kb is None)
+        slot.mtime = mtime
+        return slot.kb
+
+    def _loaded(self, tenant: str, slot: _Slot, t0: float, cold: bool) -> None:
+        ms = (time.perf_counter() - t0) * 1000.0
+        with self._lock:
+            if cold:
+                self.counts["cold_loads"] += 1
+                self._cold_ms.append(ms)
+            else:
+                self.counts["reloads"] += 1
+        if cold:
+            print(f"[kb_registry] loaded {tenant} ({slot.kb.version}, {slot.nbytes / 2**20:.1f} MB) in {ms:.0f} ms")
+
+    def _enforce_budget(self, keep: str) -> None:
+        with self._lock:
+            used = sum(s.nbytes for s in self._slots.values())
+            if used <= self.budget_bytes:
+                return
+            victims = [(t, s) for t, s in self._slots.items() if t != keep and s.kb is not None]
+        for tenant, slot in victims:   # oldest first
+            if used <= self.budget_bytes:
+                break
+            if not slot.lock.acquire(blocking=False):
+                continue   # being (re)loaded right now; try the next one
+            try:
+                used -= slot.nbytes
+                self._drop(tenant, slot)
+            finally:
+                slot.lock.release()
+
+    def _drop(self, tenant: str, slot: _Slot) -> None:
+        # slot.lock held
+        print(f"[kb_registry] evicting {tenant} ({slot.nbytes / 2**20:.1f} MB)")
+        slot.kb, slot.version, slot.mtime, slot.checked, slot.nbytes = None, None, None, 0.0, 0
+        with self._lock:
+            self.counts["evictions"] += 1
+
+
+def _file_size(path: str) -> int:
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
@@ -0,0 +1,386 @@
+# app/core/kb_store.py
+"""
+Versioned, immutable KB index snapshots.
+
+    kb/index/
+      CURRENT                      # name of the published snapshot (atomically replaced)
+      snapshots/<version>/         # never modified after publish
+        kb.index  kb_meta.json  kb_bm25.json  manifest.json
+        vectors.npy                # float32 embeddings, quantized indexes only
+
+A snapshot is written to a temp dir and renamed into place, then published by
+atomically replacing CURRENT; readers always load a complete, self-consistent
+snapshot and pick up a new CURRENT without restarting. Old snapshots are kept
+for KB_SNAPSHOT_RETENTION_DAYS (at least KB_SNAPSHOT_MIN_KEEP of them) so a bad
+KB can be rolled back by publishing an older version.
+
+The index holds float32 (IndexFlatIP) or scalar-quantized fp16/int8 codes
+(KB_INDEX_DTYPE, 2x/4x smaller). Quantized snapshots also keep the float32
+vectors on disk; the retriever memory-maps them to re-score its shortlist
+exactly, so only the rows it touches are paged in.
+
+Each KB ("tenant") has its own store: the default one lives in kb/, others in
+KB_TENANTS_DIR/<kb>/{snippets.jsonl,index/}; see app/core/kb_registry.py.
+
+CLI (--kb <name> selects a tenant KB):
+    python -m app.core.kb_store build [--dtype fp16|int8|float32]   # embed kb/snippets.jsonl, publish
+    python -m app.core.kb_store list
+    python -m app.core.kb_store publish <version> # roll forward/back
+    python -m app.core.kb_store prune
+    python -m app.core.kb_store tenants          # KB names and their published versions
+"""
+from __future__ import annotations
+import argparse, hashlib, json, os, re, shutil, sys, time, uuid
+from typing import List, Optional, Tuple
+
+import faiss
+import numpy as np
+
+from app.core.bm25 import BM25Index
+from app.core.config import (
+    KB_SNAPSHOT_RETENTION_DAYS,
+    KB_SNAPSHOT_MIN_KEEP,
+    KB_INDEX_DTYPE,
+    KB_TENANTS_DIR,
+    KB_DEFAULT_TENANT,
+)
+from app.services.embeddings import default_backend, get_backend, local_backend
+
+IDX_DIR = "kb/index"
+SNIPPETS = "kb/snippets.jsonl"
+
+INDEX_FILE = "kb.index"
+META_FILE = "kb_meta.json"
+BM25_FILE = "kb_bm25.json"
+MANIFEST_FILE = "manifest.json"
+VECTORS_FILE = "vectors.npy"
+
+INDEX_DTYPES = ("float32", "fp16", "int8")
+
+_TENANT_RE = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_.-]{0,63}$")
+
+
+def load_snippets(path: str = SNIPPETS) -> list[dict]:
+    docs = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                docs.append(json.loads(line))
+    if not docs:
+        raise RuntimeError(f"No KB snippets found. Please populate {path}")
+    return docs
+
+
+def make_index(embs: np.ndarray, dtype: str = "float32"):
+    """Inner-product index over normalized `embs`: exact float32, or fp16/int8 scalar-quantized."""
+    if dtype not in INDEX_DTYPES:
+        raise ValueError(f"Unknown index dtype: {dtype!r} (expected one of {INDEX_DTYPES})")
+    embs = np.ascontiguousarray(embs, dtype="float32")
+    d = embs.shape[1]
+    if dtype == "float32":
+        index = faiss.IndexFlatIP(d)
+    else:
+        qtype = faiss.ScalarQuantizer.QT_fp16 if dtype == "fp16" else faiss.ScalarQuantizer.QT_8bit
+        index = faiss.IndexScalarQuantizer(d, qtype, faiss.METRIC_INNER_PRODUCT)
+        index.train(embs)   # per-dimension ranges (no-op for fp16)
+    index.add(embs)
+    return index
+
+
+def index_bytes(index) -> int:
+    """Bytes held by the index's vector codes."""
+    return int(index.sa_code_size()) * int(index.ntotal)
+
+
+def content_hash(docs: list[dict], backend: dict) -> str:
+    """Hash of the snippets + the model that embeds them; changes on any KB edit."""
+    h = hashlib.sha256(json.dumps(backend, sort_keys=True).encode("utf-8"))
+    for d in docs:
+        h.update(json.dumps(d, sort_keys=True, ensure_ascii=False).encode("utf-8"))
+    return h.hexdigest()[:16]
+
+
+def list_tenants() -> List[str]:
+    """The default KB plus every KB_TENANTS_DIR/<name>/ with snippets or an index."""
+    names = [KB_DEFAULT_TENANT]
+    if os.path.isdir(KB_TENANTS_DIR):
+        for name in sorted(os.listdir(KB_TENANTS_DIR)):
+            if name != KB_DEFAULT_TENANT and KBStore.for_tenant(name).exists():
+                names.append(name)
+    return names
+
+
+class KBStore:
+    """Snapshot directory management for one KB (snippets file + index root)."""
+
+    def __init__(self, root: str = IDX_DIR, snippets: str = SNIPPETS):
+        self.root = root
+        self.snippets = snippets
+        self.snapshots_dir = os.path.join(root, "snapshots")
+        self.current_path = os.path.join(root, "CURRENT")
+
+    @classmethod
+    def for_tenant(cls, tenant: Optional[str] = None) -> "KBStore":
+        """Store of one tenant KB; raises ValueError on names that aren't a plain directory name."""
+        tenant = tenant or KB_DEFAULT_TENANT
+        if tenant == KB_DEFAULT_TENANT:
+            return cls()
+        if not _TENANT_RE.match(tenant):
+            raise ValueError(f"invalid KB name {tenant!r}")
+        base = os.path.join(KB_TENANTS_DIR, tenant)
+        return cls(os.path.join(base, "index"), os.path.join(base, "snippets.jsonl"))
+
+    def exists(self) -> bool:
+        return os.path.exists(self.snippets) or os.path.exists(self.current_path)
+
+    # -------- Reading --------
+
+    def current(self) -> Optional[str]:
+        try:
+            with open(self.current_path) as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def current_mtime(self) -> Optional[int]:
+        try:
+            return os.stat(self.current_path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def snapshot_dir(self, version: str) -> str:
+        return os.path.join(self.snapshots_dir, version)
+
+    def manifest(self, version: str) -> dict:
+        with open(os.path.join(self.snapshot_dir(version), MANIFEST_FILE)) as f:
+            return json.load(f)
+
+    def list(self) -> List[dict]:
+        """Manifests of all complete snapshots, newest first."""
+        out = []
+        if os.path.isdir(self.snapshots_dir):
+            for name in os.listdir(self.snapshots_dir):
+                if name.startswith("."):
+                    continue
+                try:
+                    out.append(self.manifest(name))
+                except (OSError, ValueError):
+                    continue
+        return sorted(out, key=lambda m: m.get("created_at", 0), reverse=True)
+
+    def load(self, version: str) -> Tuple[object, list, BM25Index, dict]:
+        """(faiss index, docs, bm25, manifest) of one snapshot."""
+        d = self.snapshot_dir(version)
+        index = faiss.read_index(os.path.join(d, INDEX_FILE))
+        with open(os.path.join(d, META_FILE)) as f:
+            docs = json.load(f)
+        bm25 = BM25Index.load(os.path.join(d, BM25_FILE))
+        return index, docs, bm25, self.manifest(version)
+
+    def snapshot_bytes(self, version: str) -> int:
+        """On-disk size of what load() reads (vectors.npy is memory-mapped, so excluded)."""
+        d = self.snapshot_dir(version)
+        return sum(os.path.getsize(os.path.join(d, f)) for f in (INDEX_FILE, META_FILE, BM25_FILE)
+                   if os.path.exists(os.path.join(d, f)))
+
+    def load_vectors(self, version: str) -> Optional[np.ndarray]:
+        """Memory-mapped float32 embeddings of a snapshot (None if it doesn't keep them)."""
+        path = os.path.join(self.snapshot_dir(version), VECTORS_FILE)
+        return np.load(path, mmap_mode="r") if os.path.exists(path) else None
+
+    def _stored_vectors(self, chash: str) -> Optional[np.ndarray]:
+        """float32 embeddings of any snapshot with this content, to re-index without re-embedding."""
+        for m in self.list():
+            if m.get("content_hash") != chash:
+                continue
+            vecs = self.load_vectors(m["version"])
+            if vecs is not None:
+                return np.asarray(vecs)
+            if m.get("index_dtype", "float32") == "float32":
+                index = faiss.read_index(os.path.join(self.snapshot_dir(m["version"]), INDEX_FILE))
+                return index.reconstruct_n(0, index.ntotal)
+        return None
+
+    # -------- Writing --------
+
+    def build(self, publish: bool = True, dtype: str = KB_INDEX_DTYPE) -> dict:
+        """
+        Embed the snippets into a new snapshot with a `dtype` index (reusing an
+        existing snapshot with identical content + model + dtype, and the stored
+        vectors of one with another dtype), then optionally publish it.
+        """
+        if dtype not in INDEX_DTYPES:
+            raise ValueError(f"Unknown index dtype: {dtype!r} (expected one of {INDEX_DTYPES})")
+        docs = load_snippets(self.snippets)
+        backend = default_backend()
+        chash = content_hash(docs, backend.describe())
+        existing = next((m for m in self.list() if m.get("content_hash") == chash
+                         and m.get("index_dtype", "float32") == dtype), None)
+        if existing:
+            print(f"[kb_store] snippets unchanged; reusing snapshot {existing['version']}")
+            if publish:
+                self.publish(existing["version"])
+            return existing
+
+        texts = [d["snippet"] for d in docs]
+        embs = self._stored_vectors(chash)
+        if embs is not None:
+            print(f"[kb_store] snippets unchanged; re-indexing stored vectors as {dtype}")
+        else:
+            try:
+                embs = backend.embed(texts)
+            except Exception as e:
+                if backend is local_backend():
+                    raise
+                # Fallback to local embeddings if IBM call fails, but surface why
+                print(f"[kb_store] {backend.name} embeddings failed, falling back to local: {e}")
+                backend = local_backend()
+                embs = backend.embed(texts)
+                chash = content_hash(docs, backend.describe())
+
+        index = make_index(embs, dtype)
+        manifest = {
+            **backend.describe(),
+            "dim": int(embs.shape[1]),
+            "count": len(docs),
+            "content_hash": chash,
+            "snippets": self.snippets,
+            "index_dtype": dtype,
+            "index_bytes": index_bytes(index),
+        }
+        vectors = embs if dtype != "float32" else None
+        return self._write_snapshot(index, docs, BM25Index.build(texts), manifest, publish, vectors)
+
+    def _write_snapshot(self, index, docs: list, bm25: BM25Index, manifest: dict, publish: bool,
+                        vectors: Optional[np.ndarray] = None) -> dict:
+        now = time.time()
+        version = f"{time.strftime('%Y%m%dT%H%M%SZ', time.gmtime(now))}-{manifest['content_hash'][:8]}"
+        if manifest.get("index_dtype", "float32") != "float32":
+            version += f"-{manifest['index_dtype']}"
+        manifest = {**manifest, "version": version, "created_at": now}
+        os.makedirs(self.snapshots_dir, exist_ok=True)
+        tmp = os.path.join(self.snapshots_dir, f".tmp-{uuid.uuid4().hex}")
+        os.makedirs(tmp)
+        faiss.write_index(index, os.path.join(tmp, INDEX_FILE))
+        if vectors is not None:
+            np.save(os.path.join(tmp, VECTORS_FILE), np.ascontiguousarray(vectors, dtype="float32"))
+        with open(os.path.join(tmp, META_FILE), "w") as f:
+            json.dump(docs, f)
+        bm25.save(os.path.join(tmp, BM25_FILE))
+        with open(os.path.join(tmp, MANIFEST_FILE), "w") as f:
+            json.dump(manifest, f, indent=2)   # written last: its presence marks a complete snapshot
+        try:
+            os.rename(tmp, self.snapshot_dir(version))
+        except OSError:
+            # same content built by another process within the same second
+            shutil.rmtree(tmp, ignore_errors=True)
+        print(f"[kb_store] wrote snapshot {version} ({manifest['count']} snippets, {manifest['backend']}/{manifest['model']}, "
+              f"{manifest.get('index_dtype', 'float32')})")
+        if publish:
+            self.publish(version)
+        return manifest
+
+    def publish(self, version: str) -> None:
+        """Atomically point CURRENT at `version`; every reader switches on its next search."""
+        if not os.path.exists(os.path.join(self.snapshot_dir(version), MANIFEST_FILE)):
+            raise FileNotFoundError(f"no complete snapshot {version!r} under {self.snapshots_dir}")
+        tmp = f"{self.current_path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp, "w") as f:
+            f.write(version)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.current_path)
+        print(f"[kb_store] published {version}")
+        self.prune()
+
+    def prune(self) -> List[str]:
+        """Drop snapshots past the retention window (never CURRENT or the newest few)."""
+        current = self.current()
+        cutoff = time.time() - KB_SNAPSHOT_RETENTION_DAYS * 86400
+        removed = []
+        for i, m in enumerate(self.list()):
+            v = m["version"]
+            if v == current or i < KB_SNAPSHOT_MIN_KEEP or m.get("created_at", 0) >= cutoff:
+                continue
+            shutil.rmtree(self.snapshot_dir(v), ignore_errors=True)
+            removed.append(v)
+        if os.path.isdir(self.snapshots_dir):
+            for name in os.listdir(self.snapshots_dir):
+                p = os.path.join(self.snapshots_dir, name)
+                if name.startswith(".tmp-") and time.time() - os.stat(p).st_mtime > 3600:
+                    shutil.rmtree(p, ignore_errors=True)   # abandoned half-written build
+        if removed:
+            print(f"[kb_store] pruned {len(removed)} old snapshot(s): {removed}")
+        return removed
+
+    def ensure_current(self) -> str:
+        """Published version; imports a pre-snapshot flat index or builds one if needed."""
+        version = self.current()
+        if version:
+            return version
+        if os.path.exists(os.path.join(self.root, INDEX_FILE)) and os.path.exists(os.path.join(self.root, META_FILE)):
+            self._import_legacy()
+        else:
+            self.build(publish=True)
+        return self.current()
+
+    def _import_legacy(self) -> None:
+        """Wrap kb/index/kb.index + kb_meta.json from older builds into a snapshot."""
+        index = faiss.read_index(os.path.join(self.root, INDEX_FILE))
+        with open(os.path.join(self.root, META_FILE)) as f:
+            docs = json.load(f)
+        legacy_manifest = os.path.join(self.root, "kb_manifest.json")
+        if os.path.exists(legacy_manifest):
+            with open(legacy_manifest) as f:
+                desc = {k: v for k, v in json.load(f).items() if k in ("backend", "model")}
+        else:
+            # built before manifests existed: IBM when configured, else MiniLM (st)
+            desc = default_backend().describe() if default_backend().name == "ibm" else get_backend("st").describe()
+        print(f"[kb_store] importing legacy index from {self.root} as {desc}")
+        manifest = {**desc, "dim": int(index.d), "count": int(index.ntotal),
+                    "content_hash": content_hash(docs, desc), "snippets": self.snippets,
+                    "index_dtype": "float32", "index_bytes": index_bytes(index)}
+        bm25 = BM25Index.build(d["snippet"] for d in docs)
+        self._write_snapshot(index, docs, bm25, manifest, publish=True)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Manage versioned KB index snapshots")
+    ap.add_argument("--kb", default=None, help="tenant KB name (default: the kb/ KB)")
+    ap.add_argument("--root", default=None, help="index root (overrides --kb)")
+    ap.add_argument("--snippets", default=None, help="snippets file (overrides --kb)")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    b = sub.add_parser("build", help="embed snippets into a new snapshot")
+    b.add_argument("--no-publish", action="store_true")
+    b.add_argument("--dtype", choices=INDEX_DTYPES, default=KB_INDEX_DTYPE,
+                   help="index storage: exact float32 or scalar-quantized fp16/int8")
+    sub.add_parser("list", help="list snapshots (newest first)")
+    p = sub.add_parser("publish", help="make a snapshot current (also used for rollback)")
+    p.add_argument("version")
+    sub.add_parser("prune", help="delete snapshots past the retention window")
+    sub.add_parser("tenants", help="list KB names")
+    args = ap.parse_args(argv)
+
+    store = KBStore.for_tenant(args.kb)
+    store = KBStore(args.root or store.root, args.snippets or store.snippets)
+    if args.cmd == "build":
+        print(json.dumps(store.build(publish=not args.no_publish, dtype=args.dtype), indent=2))
+    elif args.cmd == "list":
+        current = store.current()
+        for m in store.list():
+            mark = "*" if m["version"] == current else " "
+            print(f"{mark} {m['version']}  {m['backend']}/{m['model']}  dim={m['dim']}  n={m['count']}  "
+                  f"{m.get('index_dtype', 'float32')}")
+    elif args.cmd == "publish":
+        store.publish(args.version)
+    elif args.cmd == "prune":
+        store.prune()
+    elif args.cmd == "tenants":
+        for name in list_tenants():
+            print(f"{name}  {KBStore.for_tenant(name).current() or '(not built)'}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,359 @@
+# app/core/live.py
+"""
+Live call mode: claims are checked while the call is still going on.
+
+A `LiveSession` is fed raw PCM chunks (see the /live WebSocket in app/main.py).
+Audio is buffered and re-transcribed every LIVE_ASR_STEP_S seconds of new
+input. Decoded segments that end at least LIVE_ASR_HOLDBACK_S before the end
+of the buffer are committed, and their audio is dropped from the buffer. The
+rest stay tentative and are decoded again with more audio next time.
+
+Once LIVE_EXTRACT_MIN_CHARS of newly committed text has built up, claim
+extraction runs on a window made of those segments plus the last
+LIVE_EXTRACT_CONTEXT_SEGMENTS already-checked segments (as context). Windows
+overlap, so the same claim can be extracted more than once. Every extracted
+claim therefore goes through the session's ClaimDeduper, and only new
+representatives are retrieved and verified, each exactly once. Results are
+pushed through `emit(event)` as they happen:
+
+  {"type": "partial", "text"}                 tentative text of the current buffer
+  {"type": "segment", "segment"}              committed ASR segment
+  {"type": "claim", "claim"}                  new claim, about to be checked
+  {"type": "verdict", "claim_id", "verdict", "evidence", "cached", "lag_s"}
+  {"type": "error", "stage", "detail"}
+
+`lag_s` is the wall-clock time from receiving the audio that ended the claim's
+window to emitting its verdict. `finish()` flushes the buffer, waits for
+pending checks and returns the CallReport of the whole call.
+"""
+from __future__ import annotations
+import bisect, threading, time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from app.core import watsonx
+from app.schemas.claim import Claim
+from app.schemas.evidence import Evidence
+from app.schemas.report import CallReport
+from app.schemas.verdict import Verdict
+from app.services.asr import transcribe_array
+from app.agents.claims import extract_claims
+from app.agents.retriever import retrieve_evidence_for_claims, current_kb
+from app.agents.verifier import verify
+from app.agents.summarizer import make_report, summarize_chunk
+from app.agents.dedupe import ClaimDeduper, claim_numbers
+from app.core.orchestrator import _flatten_evidence, store_report
+from app.core.verdict_cache import verdict_cache
+from app.core.config import (
+    KB_DEFAULT_TENANT,
+    VERDICT_CACHE,
+    LIVE_SAMPLE_RATE,
+    LIVE_ASR_STEP_S,
+    LIVE_ASR_HOLDBACK_S,
+    LIVE_ASR_MAX_BUFFER_S,
+    LIVE_EXTRACT_MIN_CHARS,
+    LIVE_EXTRACT_CONTEXT_SEGMENTS,
+    LIVE_VERIFY_CONCURRENCY,
+    SUMMARY_CHUNK_CHARS,
+    SUMMARY_MAP_CONCURRENCY,
+)
+
+ENCODINGS = ("s16le", "f32le")
+
+
+def decode_pcm(data: bytes, encoding: str = "s16le", sample_rate: int = LIVE_SAMPLE_RATE) -> np.ndarray:
+    """Raw mono PCM -> float32 in [-1, 1] at LIVE_SAMPLE_RATE (linear resampling)."""
+    if encoding == "s16le":
+        x = np.frombuffer(data[: len(data) - len(data) % 2], dtype="<i2").astype("float32") / 32768.0
+    elif encoding == "f32le":
+        x = np.frombuffer(data[: len(data) - len(data) % 4], dtype="<f4").astype("float32")
+    else:
+        raise ValueError(f"unsupported encoding {encoding!r} (expected one of {', '.join(ENCODINGS)})")
+    if sample_rate != LIVE_SAMPLE_RATE and len(x):
+        n = max(1, int(round(len(x) * LIVE_SAMPLE_RATE / sample_rate)))
+        x = np.interp(np.linspace(0, len(x) - 1, n), np.arange(len(x)), x).astype("float32")
+    return x
+
+
+class LiveSession:
+    def __init__(self, emit: Callable[[Dict[str, Any]], None], kb_id: Optional[str] = None,
+                 sample_rate: int = LIVE_SAMPLE_RATE, encoding: str = "s16le", priority: str = "interactive"):
+        if encoding not in ENCODINGS:
+            raise ValueError(f"unsupported encoding {encoding!r} (expected one of {', '.join(ENCODINGS)})")
+        if sample_rate <= 0:
+            raise ValueError("sample_rate must be positive")
+        self.emit = emit
+        self.kb_id = kb_id or KB_DEFAULT_TENANT
+        self.kb = current_kb(tenant=self.kb_id)     # pinned for the whole call
+        self.sample_rate = sample_rate
+        self.encoding = encoding
+        self.priority = priority
+
+        self._cv = threading.Condition()
+        self._buf = np.zeros(0, dtype="float32")    # uncommitted audio
+        self._base = 0.0                             # call time (s) of _buf[0]
+        self._received = 0                           # samples received so far
+        self._pending = 0                            # samples since the last ASR step
+        self._arrivals: List[float] = []             # call time (s) at the end of each chunk ...
+        self._arrived_at: List[float] = []           # ... and when it was received
+        self._finished = False
+        self._cancelled = False
+
+        self.segments: List[Dict[str, Any]] = []
+        self._checked = 0                            # segments[:_checked] have been through extraction
+        self._windows = 0
+        self.deduper = ClaimDeduper(kb=self.kb)
+        self.claims: List[Claim] = []                # representatives only (each verified once)
+        self.evmap: Dict[str, List[Evidence]] = {}
+        self.verdicts: List[Verdict] = []
+        self._lags: List[float] = []
+        self._lock = threading.Lock()
+        self._part: List[Dict[str, Any]] = []       # committed segments not yet in a summary part
+        self._parts: list = []                       # futures of the summary map step, in call order
+
+        # extraction stays in window order (one thread); checks of different windows overlap
+        self._extract_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="live-extract")
+        self._verify_pool = ThreadPoolExecutor(max_workers=max(1, LIVE_VERIFY_CONCURRENCY),
+                                               thread_name_prefix="live-verify")
+        self._summary_pool = ThreadPoolExecutor(max_workers=max(1, SUMMARY_MAP_CONCURRENCY),
+                                                thread_name_prefix="live-summary")
+        self._thread = threading.Thread(target=self._run, name="live-asr", daemon=True)
+        self._thread.start()
+
+    # -------- Public API --------
+
+    def feed(self, data: bytes) -> None:
+        """Queue one chunk of raw PCM audio."""
+        x = decode_pcm(data, self.encoding, self.sample_rate)
+        if not len(x):
+            return
+        with self._cv:
+            if self._finished:
+                return
+            self._buf = np.concatenate([self._buf, x])
+            self._received += len(x)
+            self._pending += len(x)
+            self._arrivals.append(self._received / LIVE_SAMPLE_RATE)
+            self._arrived_at.append(time.monotonic())
+            if self._pending >= LIVE_ASR_STEP_S * LIVE_SAMPLE_RATE:
+                self._cv.notify_all()
+
+    def finish(self) -> CallReport:
+        """End of audio: decode what's left, wait for every check, build the report."""
+        with self._cv:
+            self._finished = True
+            self._cv.notify_all()
+        self._thread.join()
+        if self._parts and self._part:
+            self._add_part()
+        self._extract_pool.shutdown(wait=True)
+        self._verify_pool.shutdown(wait=True)
+        self._summary_pool.shutdown(wait=True)
+        with self._lock:
+            claims, evmap, verdicts = list(self.claims), dict(self.evmap), list(self.verdicts)
+        segments = self.segments or [{"start": 0.0, "end": 0.0, "speaker": "A", "text": ""}]
+        parts = [f.result() for f in self._parts] or None
+        report = make_report(segments, claims, _flatten_evidence(evmap), verdicts, evidence_by_claim=evmap,
+                             chunk_summaries=parts)
+        report.timings = {"live": self.stats()}
+        report.kb_id, report.kb_version = self.kb_id, self.kb.version
+        store_report(report, segments)
+        return report
+
+    def cancel(self) -> None:
+        """Client went away: stop without building a report."""
+        with self._cv:
+            self._finished = self._cancelled = True
+            self._cv.notify_all()
+        self._extract_pool.shutdown(wait=False, cancel_futures=True)
+        self._verify_pool.shutdown(wait=False, cancel_futures=True)
+        self._summary_pool.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lags = np.asarray(self._lags) if self._lags else None
+            out = {
+                "audio_s": round(self._received / LIVE_SAMPLE_RATE, 2),
+                "segments": len(self.segments),
+                "windows": self._windows,
+                "claims": len(self.claims),
+                "verdicts": len(self.verdicts),
+            }
+        if lags is not None:
+            out["lag_s"] = {"p50": round(float(np.percentile(lags, 50)), 2),
+                            "p95": round(float(np.percentile(lags, 95)), 2),
+                            "max": round(float(lags.max()), 2)}
+        return out
+
+    # -------- ASR loop --------
+
+    def _run(self) -> None:
+        with watsonx.priority(self.priority):
+            while True:
+                with self._cv:
+                    while not self._finished and self._pending < LIVE_ASR_STEP_S * LIVE_SAMPLE_RATE:
+                        self._cv.wait()
+                    if self._cancelled:
+                        return
+                    final = self._finished
+                    audio, base = self._buf, self._base
+                    self._pending = 0
+                try:
+                    committed = self._transcribe(audio, base, final)
+                except Exception as e:
+                    self._error("asr", e)
+                    committed = False
+                if committed or final:
+                    self._window(final)
+                if final:
+                    return
+
+    def _transcribe(self, audio: np.ndarray, base: float, final: bool) -> bool:
+        if not len(audio):
+            return False
+        end = base + len(audio) / LIVE_SAMPLE_RATE
+        prompt = " ".join(s["text"] for s in self.segments[-3:])[-200:]
+        segs = transcribe_array(audio, offset=base, prompt=prompt)
+        if final or end - base >= LIVE_ASR_MAX_BUFFER_S:
+            cutoff = end
+        else:
+            cutoff = end - LIVE_ASR_HOLDBACK_S
+        done = [s for s in segs if s["end"] <= cutoff]
+        tentative = [s for s in segs if s["end"] > cutoff]
+        if done:
+            new_base = done[-1]["end"]
+        elif not segs:
+            new_base = max(base, cutoff)           # silence: keep only the hold-back tail
+        else:
+            new_base = base
+        with self._cv:
+            drop = int(round((new_base - self._base) * LIVE_SAMPLE_RATE))
+            if drop > 0:
+                self._buf = self._buf[drop:]
+                self._base = new_base
+        for s in done:
+            self.segments.append(s)
+            self.emit({"type": "segment", "segment": s})
+            if self._part and sum(len(p["text"]) for p in self._part) + len(s["text"]) > SUMMARY_CHUNK_CHARS:
+                self._add_part()
+            self._part.append(s)
+        if tentative:
+            self.emit({"type": "partial", "text": " ".join(s["text"] for s in tentative)})
+        return bool(done)
+
+    def _add_part(self) -> None:
+        # map step of the call summary, while the call goes on
+        part, self._part = self._part, []
+        try:
+            self._parts.append(self._summary_pool.submit(self._summarize, part))
+        except RuntimeError:
+            pass   # cancelled
+
+    def _summarize(self, part: List[Dict[str, Any]]) -> Dict[str, Any]:
+        with watsonx.priority(self.priority):
+            return summarize_chunk(part)
+
+    # -------- Claims --------
+
+    def _window(self, final: bool) -> None:
+        new = self.segments[self._checked:]
+        if not new or (not final and sum(len(s["text"]) for s in new) < LIVE_EXTRACT_MIN_CHARS):
+            return
+        context = self.segments[max(0, self._checked - LIVE_EXTRACT_CONTEXT_SEGMENTS):self._checked]
+        self._checked = len(self.segments)
+        idx = self._windows
+        self._windows += 1
+        spoken = self._arrival(new[-1]["end"])
+        try:
+            self._extract_pool.submit(self._extract, idx, context + new, spoken)
+        except RuntimeError:
+            pass   # cancelled
+
+    def _arrival(self, t: float) -> float:
+        # when the audio up to call time `t` was received
+        with self._cv:
+            i = bisect.bisect_left(self._arrivals, t)
+            return self._arrived_at[min(i, len(self._arrived_at) - 1)] if self._arrived_at else time.monotonic()
+
+    def _extract(self, idx: int, window: List[Dict[str, Any]], spoken: float) -> None:
+        with watsonx.priority(self.priority):
+            try:
+                found = extract_claims(window, id_prefix=f"w{idx}_")
+                reps = self.deduper.add(found)
+            except Exception as e:
+                self._error("extract", e)
+                return
+        if not reps:
+            return
+        with self._lock:
+            self.claims.extend(reps)
+        for c in reps:
+            self.emit({"type": "claim", "claim": c.model_dump()})
+        try:
+            self._verify_pool.submit(self._check, reps, spoken)
+        except RuntimeError:
+            pass   # cancelled
+
+    def _check(self, claims: List[Claim], spoken: float) -> None:
+        with watsonx.priority(self.priority):
+            try:
+                cached, todo = self._from_cache(claims)
+                evmap: Dict[str, List[Evidence]] = {}
+                verdicts: List[Verdict] = []
+                if todo:
+                    _, evmap = retrieve_evidence_for_claims(todo, k=8, query_vecs=self.deduper.vectors, kb=self.kb)
+                    verdicts = verify(todo, evmap)
+                    if VERDICT_CACHE:
+                        self._remember(todo, evmap, verdicts)
+            except Exception as e:
+                self._error("verify", e)
+                return
+        lag = time.monotonic() - spoken
+        with self._lock:
+            for v, ev in cached:
+                self.evmap[v.claim_id] = ev
+            self.evmap.update(evmap)
+            self.verdicts.extend(v for v, _ in cached)
+            self.verdicts.extend(verdicts)
+            self._lags.append(lag)
+        for v, ev in cached:
+            self._emit_verdict(v, ev, True, lag)
+        for v in verdicts:
+            self._emit_verdict(v, evmap.get(v.claim_id, []), False, lag)
+
+    def _from_cache(self, claims: List[Claim]):
+        if not VERDICT_CACHE:
+            return [], claims
+        cached, todo = [], []
+        for c in claims:
+            vec = self.deduper.vectors.get(c.id)
+            hit = verdict_cache.lookup(vec, claim_numbers(c.text), self.kb.version, kb=self.kb_id) \
+                if vec is not None else None
+            if hit is None:
+                todo.append(c)
+            else:
+                verdict, evidence, _ = hit
+                cached.append((verdict.model_copy(update={"claim_id": c.id}), list(evidence)))
+        return cached, todo
+
+    def _remember(self, claims: List[Claim], evmap: Dict[str, List[Evidence]], verdicts: List[Verdict]) -> None:
+        by_id = {c.id: c for c in claims}
+        for v in verdicts:
+            c = by_id.get(v.claim_id)
+            vec = self.deduper.vectors.get(v.claim_id)
+            if c is None or vec is None or v.label not in ("supported", "refuted"):
+                continue
+            verdict_cache.put(vec, claim_numbers(c.text), self.kb.version, c.text, v,
+                              evmap.get(c.id, []), kb=self.kb_id)
+
+    # -------- Events --------
+
+    def _emit_verdict(self, v: Verdict, evidence: List[Evidence], cached: bool, lag: float) -> None:
+        self.emit({"type": "verdict", "claim_id": v.claim_id, "verdict": v.model_dump(),
+                   "evidence": [e.model_dump() for e in evidence], "cached": cached, "lag_s": round(lag, 2)})
+
+    def _error(self, stage: str, e: Exception) -> None:
+        print(f"[live] {stage} failed: {e}")
+        self.emit({"type": "error", "stage": stage, "detail": f"{type(e).__name__}: {e}"[:300]})
@@ -1,42 +1,53 @@
 # app/core/orchestrator.py
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple, Callable
+from functools import partial
 from app.schemas.report import CallReport
 from app.schemas.claim import Claim
 from app.schemas.evidence import Evidence
 from app.schemas.verdict import Verdict
-from app.services.asr import transcribe
+from app.services.asr import iter_transcribe
 from app.agents.claims import extract_claims
-from app.agents.retriever import retrieve_evidence_for_claims
+from app.agents.retriever import retrieve_evidence_for_claims, embed_queries, current_kb
 from app.agents.verifier import verify
-from app.agents.summarizer import make_report
-import os, re, json
+from app.agents.summarizer import make_report, summarize_chunk, split_segment
+from app.agents.dedupe import ClaimDeduper, expand_duplicates, claim_numbers
+from app.core.verdict_cache import verdict_cache
+from app.core.report_store import report_store
+from app.core.scheduler import DagScheduler, Cancelled
+from app.core.config import (
+	ORCH_EXTRACT_CONCURRENCY,
+	ORCH_RETRIEVE_CONCURRENCY,
+	ORCH_VERIFY_CONCURRENCY,
+	ORCH_SUMMARY_CONCURRENCY,
+	ORCH_VERIFY_BATCH_SIZE,
+	ORCH_EXTRACT_CHUNK_CHARS,
+	CLAIM_DEDUPE,
+	VERDICT_CACHE,
+	KB_DEFAULT_TENANT,
+	REPORT_STORE,
+	SUMMARY_CHUNK_CHARS,
+	SUMMARY_MAP_CONCURRENCY,
+)
+import os, re, json, threading
 
 os.environ.setdefault("KMP_DUPLICATE_LIB_OK", "TRUE")
-os.environ.setdefault("OMP_NUM_THREADS", "1")
+# CPU threads for local embeddings are set per backend (EMBED_THREADS), not forced globally
+
+STAGE_LIMITS = {
+	"asr": 1,
+	"extract": ORCH_EXTRACT_CONCURRENCY,
+	"retrieve": ORCH_RETRIEVE_CONCURRENCY,
+	"verify": ORCH_VERIFY_CONCURRENCY,
+	"summarize": ORCH_SUMMARY_CONCURRENCY,
+	"summarize_map": SUMMARY_MAP_CONCURRENCY,
+}
 
 
 def _norm_snippet(s: str) -> str:
 	return re.sub(r"\s+", " ", (s or "").strip()).lower()
 
 
-def process_call(audio_path: Optional[str] = None, transcript: Optional[str] = None) -> CallReport:
-	print("[orchestrator] START")
-
-	segments = transcribe(audio_path) if audio_path else [
-		{"start":0.0,"end":0.0,"speaker":"A","text": transcript or ""}]
-
-	# 2) Claim extraction (IBM)
-	claims: List[Claim] = extract_claims(segments)
-	print(f"[orchestrator] Claims extracted: {len(claims)}")
-	if not claims:
-		print("[orchestrator] No claims found; building minimal report.")
-		return make_report(segments, [], [], [], evidence_by_claim={})
-
-	# 3) Evidence retrieval (IBM embeddings + optional rerank)
-	claims, evmap = retrieve_evidence_for_claims(claims, k=8)
-	ev_count = sum(len(v) for v in evmap.values())
-
-	# Print evidence per claim (detailed)
+def _print_evidence(claims: List[Claim], evmap: Dict[str, List[Evidence]]) -> None:
 	print("[orchestrator] Evidence per claim (top k):")
 	for c in claims:
 		evs = evmap.get(c.id, [])
@@ -53,7 +64,9 @@ def process_call(audio_path: Optional[str] = None, transcript: Optional[str] = N
 			if e.metadata:
 				print(f"          meta: {meta_preview}")
 
-	# Flatten and deduplicate global evidence by normalized snippet, keeping highest score
+
+def _flatten_evidence(evmap: Dict[str, List[Evidence]]) -> List[Evidence]:
+	"""Flatten and deduplicate global evidence by normalized snippet, keeping highest score."""
 	flat: List[Evidence] = [e for lst in evmap.values() for e in lst]
 	by_snippet: Dict[str, Evidence] = {}
 	for e in flat:
@@ -61,17 +74,258 @@ def process_call(audio_path: Optional[str] = None, transcript: Optional[str] = N
 		best = by_snippet.get(key)
 		if not best or (e.score or 0.0) > (best.score or 0.0):
 			by_snippet[key] = e
-	evidence_flat = list(by_snippet.values())
+	return list(by_snippet.values())
+
+
+def store_report(report: CallReport, segments: List[Dict[str, Any]]) -> None:
+	"""Keep the report + its artifacts for later re-verification (REPORT_STORE)."""
+	if not REPORT_STORE:
+		return
+	try:
+		report_store.save(report, segments)
+	except Exception as e:
+		print(f"[orchestrator] could not store report: {e}")
+
+
+def process_call(audio_path: Optional[str] = None, transcript: Optional[str] = None,
+				 kb_id: Optional[str] = None,
+				 on_event: Optional[Callable[[Dict[str, Any]], None]] = None) -> CallReport:
+	"""
+	Run the call pipeline as a dependency graph instead of stage-by-stage:
+
+	  asr -> extract:<chunk> -> retrieve:<claim> -> verify:<batch> -> summary
+	      -> summarize:<part> ---------------------------------------/
+
+	ASR segments are grouped into extraction chunks as they are decoded; each
+	extracted claim gets its own retrieval node, and a verification batch fires
+	as soon as the evidence for its claims is in. Stage concurrency is capped by
+	ORCH_*_CONCURRENCY; per-node timings and the critical path end up in
+	`report.timings`. `kb_id` picks the tenant KB (default KB if None).
+	Calls longer than SUMMARY_CHUNK_CHARS are summarized map-reduce: each
+	transcript part is summarized as soon as ASR has produced it, overlapping
+	with verification, and the final summary node only merges them.
+
+	`on_event(event)` (optional) gets partial results as soon as they exist,
+	from scheduler threads: {"type": "segment"|"claim"|"evidence"|"verdict"|
+	"summary", ...}. Claims collapsed as duplicates come with `duplicate_of` and
+	share their representative's evidence/verdict events. If `on_event` raises
+	scheduler.Cancelled, the call stops: nodes that have not started are
+	dropped and process_call raises Cancelled.
+	"""
+	print("[orchestrator] START")
+
+	lock = threading.Lock()
+	segments: List[Dict[str, Any]] = []
+	claims_by_chunk: Dict[int, List[Claim]] = {}
+	evmap: Dict[str, List[Evidence]] = {}
+	verdicts_by_batch: Dict[Tuple[int, int], List[Verdict]] = {}
+	verify_nodes: List[str] = []
+	n_chunks = 0
+	part_summaries: Dict[int, Dict[str, Any]] = {}
+	summary_nodes: List[str] = []
+	# one KB snapshot for the whole call, even if a newer one is published meanwhile
+	kb_id = kb_id or KB_DEFAULT_TENANT
+	kb = current_kb(tenant=kb_id)
+	deduper = ClaimDeduper(kb=kb) if CLAIM_DEDUPE else None
+	claim_vecs: Dict[str, Any] = deduper.vectors if deduper else {}
+	cached_verdicts: List[Verdict] = []
+
+	sched = DagScheduler(STAGE_LIMITS)
+
+	def _emit(kind: str, **fields: Any) -> None:
+		if on_event is None:
+			return
+		try:
+			on_event({"type": kind, **fields})
+		except Cancelled:
+			raise
+		except Exception as e:
+			print(f"[orchestrator] on_event failed: {e}")
+
+	def _retrieve(claim: Claim) -> None:
+		# 3) Evidence retrieval (IBM embeddings + optional rerank), one node per distinct claim
+		_, ev = retrieve_evidence_for_claims([claim], k=8, query_vecs=claim_vecs, kb=kb)
+		with lock:
+			evmap.update(ev)
+		_emit("evidence", claim_id=claim.id, evidence=[e.model_dump() for e in ev.get(claim.id, [])])
+
+	def _verify(key: Tuple[int, int], batch: List[Claim]) -> None:
+		# 4) Verification, one node per batch once its evidence is ready
+		with lock:
+			batch_ev = {c.id: evmap.get(c.id, []) for c in batch}
+		out = verify(batch, batch_ev)
+		with lock:
+			verdicts_by_batch[key] = out
+		for v in out:
+			_emit("verdict", verdict=v.model_dump(), cached=False)
+		if VERDICT_CACHE:
+			_remember(batch, batch_ev, out)
+
+	def _remember(batch: List[Claim], batch_ev: Dict[str, List[Evidence]], out: List[Verdict]) -> None:
+		# only decisive verdicts are shared across calls; "insufficient" gets another try
+		by_id = {c.id: c for c in batch}
+		for v in out:
+			c = by_id.get(v.claim_id)
+			vec = claim_vecs.get(v.claim_id)
+			if c is None or vec is None or v.label not in ("supported", "refuted"):
+				continue
+			verdict_cache.put(vec, claim_numbers(c.text), kb.version, c.text, v, batch_ev.get(c.id, []), kb=kb_id)
+
+	def _from_cache(found: List[Claim]) -> List[Claim]:
+		# 2c) Reuse verdicts of earlier calls; returns the claims that still need work
+		missing = [c for c in found if c.id not in claim_vecs]
+		if missing:
+			vecs = embed_queries([c.text for c in missing], kb=kb)
+			if vecs is not None:
+				with lock:
+					claim_vecs.update({c.id: vecs[i] for i, c in enumerate(missing)})
+		todo = []
+		for c in found:
+			vec = claim_vecs.get(c.id)
+			hit = verdict_cache.lookup(vec, claim_numbers(c.text), kb.version, kb=kb_id) if vec is not None else None
+			if hit is None:
+				todo.append(c)
+				continue
+			verdict, evidence, sim = hit
+			print(f"[orchestrator] {c.id}: cached verdict {verdict.label} (sim={sim:.3f})")
+			cached = verdict.model_copy(update={"claim_id": c.id})
+			with lock:
+				evmap[c.id] = list(evidence)
+				cached_verdicts.append(cached)
+			_emit("evidence", claim_id=c.id, evidence=[e.model_dump() for e in evidence])
+			_emit("verdict", verdict=cached.model_dump(), cached=True)
+		return todo
+
+	def _extract(chunk_idx: int, chunk: List[Dict[str, Any]]) -> None:
+		# 2) Claim extraction (IBM) for one chunk; fan out retrieval + verification
+		prefix = "c" if chunk_idx == 0 else f"c{chunk_idx}_"
+		found = extract_claims(chunk, id_prefix=prefix)
+		with lock:
+			claims_by_chunk[chunk_idx] = found
+		# 2b) Collapse repeats (within and across chunks); only representatives go on
+		reps = deduper.add(found) if deduper else found
+		for c in found:
+			_emit("claim", claim=c.model_dump())
+		found = reps
+		found = _from_cache(found) if VERDICT_CACHE else found
+		for c in found:
+			# dep on the running extract node only links the graph (for the critical path)
+			sched.add(f"retrieve:{c.id}", partial(_retrieve, c), stage="retrieve",
+					  deps=[f"extract:{chunk_idx}"])
+		for b in range(0, len(found), ORCH_VERIFY_BATCH_SIZE):
+			batch = found[b:b + ORCH_VERIFY_BATCH_SIZE]
+			node = sched.add(
+				f"verify:{chunk_idx}:{b}", partial(_verify, (chunk_idx, b), batch),
+				stage="verify", deps=[f"retrieve:{c.id}" for c in batch],
+			)
+			with lock:
+				verify_nodes.append(node)
+
+	def _add_extract(chunk: List[Dict[str, Any]]) -> None:
+		nonlocal n_chunks
+		idx = n_chunks
+		n_chunks += 1
+		sched.add(f"extract:{idx}", partial(_extract, idx, chunk), stage="extract")
+
+	def _summarize_part(idx: int, part: List[Dict[str, Any]]) -> None:
+		# 5a) Map step of the summary, one node per transcript part (never fails)
+		out = summarize_chunk(part)
+		with lock:
+			part_summaries[idx] = out
+
+	def _add_part(part: List[Dict[str, Any]]) -> None:
+		idx = len(summary_nodes)
+		summary_nodes.append(sched.add(f"summarize:{idx}", partial(_summarize_part, idx, part),
+									   stage="summarize_map"))
+
+	def _chunk_summaries() -> Optional[List[Dict[str, Any]]]:
+		if not summary_nodes:
+			return None   # short call: single-pass summary
+		with lock:
+			return [part_summaries[i] for i in sorted(part_summaries)]
+
+	def _asr() -> None:
+		# 1) ASR (or the raw transcript), cut into extraction chunks as segments arrive
+		source = iter_transcribe(audio_path) if audio_path else [
+			{"start":0.0,"end":0.0,"speaker":"A","text": transcript or ""}]
+		buf: List[Dict[str, Any]] = []
+		size = 0
+		part: List[Dict[str, Any]] = []
+		part_size = 0
+		for seg in source:
+			segments.append(seg)
+			_emit("segment", segment=seg)
+			buf.append(seg)
+			size += len(seg.get("text", "") or "")
+			if size >= ORCH_EXTRACT_CHUNK_CHARS:
+				_add_extract(buf)
+				buf, size = [], 0
+			for piece in split_segment(seg, SUMMARY_CHUNK_CHARS):
+				n = len(piece.get("text", "") or "")
+				if part and part_size + n > SUMMARY_CHUNK_CHARS:
+					_add_part(part)
+					part, part_size = [], 0
+				part.append(piece)
+				part_size += n
+		if not segments:
+			segments.append({"start": 0.0, "end": 0.0, "speaker": "A", "text": ""})
+		if buf or n_chunks == 0:
+			_add_extract(buf or list(segments))
+		if part and summary_nodes:
+			_add_part(part)
+
+	try:
+		sched.add("asr", _asr, stage="asr")
+		sched.wait()
+
+		claims: List[Claim] = [c for i in sorted(claims_by_chunk) for c in claims_by_chunk[i]]
+		distinct = sum(1 for c in claims if not c.duplicate_of)
+		print(f"[orchestrator] Claims extracted: {len(claims)} ({distinct} distinct)")
+		if not claims:
+			print("[orchestrator] No claims found; building minimal report.")
+			report = make_report(segments, [], [], [], evidence_by_claim={}, chunk_summaries=_chunk_summaries())
+			_emit("summary", call_summary=report.call_summary, action_items=report.action_items,
+				  claim_table=report.claim_table)
+			report.timings = sched.report()
+			report.kb_id, report.kb_version = kb_id, kb.version
+			store_report(report, segments)
+			return report
+
+		verdicts: List[Verdict] = [v for k in sorted(verdicts_by_batch) for v in verdicts_by_batch[k]]
+		verdicts.extend(cached_verdicts)
+		if deduper:
+			evmap, verdicts = expand_duplicates(claims, evmap, verdicts)
+
+		ev_count = sum(len(v) for v in evmap.values())
+		print(f"[orchestrator] Evidence items retrieved: {ev_count}")
+		_print_evidence(claims, evmap)
+		evidence_flat = _flatten_evidence(evmap)
+
+		print(f"[orchestrator] Verifier produced {len(verdicts)} verdicts")
+		print("[orchestrator] Verdicts with citations:")
+		for v in verdicts:
+			cites = getattr(v, "citation_ids", [])
+			print(f"  - {v.claim_id}: {v.label}  conf={v.confidence:.2f}  best={v.best_evidence_id}  cites={cites}")
 
-	verdicts: List[Verdict] = verify(claims, evmap)
-	print(f"[orchestrator] Verifier produced {len(verdicts)} verdicts")
-	print("[orchestrator] Verdicts with citations:")
-	for v in verdicts:
-		cites = getattr(v, "citation_ids", [])
-		print(f"  - {v.claim_id}: {v.label}  conf={v.confidence:.2f}  best={v.best_evidence_id}  cites={cites}")
+		# 5b) Summarize (reduce) after every verification and part-summary node has finished
+		sched.add(
+			"summary",
+			lambda: make_report(segments, claims, evidence_flat, verdicts, evidence_by_claim=evmap,
+								chunk_summaries=_chunk_summaries()),
+			stage="summarize", deps=verify_nodes + summary_nodes,
+		)
+		sched.wait()
+		report: CallReport = sched.result("summary")
+		_emit("summary", call_summary=report.call_summary, action_items=report.action_items,
+			  claim_table=report.claim_table)
+	finally:
+		sched.close()
 
-	# 5) Summarize
-	report = make_report(segments, claims, evidence_flat, verdicts, evidence_by_claim=evmap)
+	report.timings = sched.report()
+	report.kb_id, report.kb_version = kb_id, kb.version
+	store_report(report, segments)
 	print(report.call_summary)
+	print(f"[orchestrator] critical path: {' -> '.join(report.timings['critical_path'])}"
+		  f"  ({report.timings['total_ms']:.0f} ms)")
 	print("[orchestrator] DONE")
-	return report
\ No newline at end of file
+	return report
@@ -0,0 +1,348 @@
+# app/core/profiler.py
+"""
+Opt-in sampling profiler for single requests.
+
+A request is profiled when it carries `X-Profile: 1` (PROFILE_HEADER=1) or
+is picked at random with probability PROFILE_SAMPLE_RATE. While the request
+runs, a background thread reads the Python stack of every thread working on
+it every PROFILE_INTERVAL_MS. These are the request thread itself plus the
+DagScheduler and summary-map workers it starts (see `attached`), and the
+micro-batch threads that send its embedding calls (see `joined`). The stacks
+are counted in folded form ("thread;outer;...;inner <count>"). Every watsonx
+attempt the request makes is also logged with its endpoint, model, outcome
+and time.
+
+Each profile is saved under PROFILES_DIR as `<id>.folded`, which flamegraph.pl,
+speedscope and inferno read directly, plus `<id>.json` with the outbound call
+log, the scheduler's critical path and run metadata. Randomly sampled
+requests are kept only if they took at least PROFILE_KEEP_MIN_MS, so a low
+sampling rate collects slow calls rather than typical ones.
+
+Requests that are not profiled pay for one context-variable lookup at each
+hook, and no sampler thread runs.
+"""
+from __future__ import annotations
+import contextvars, json, os, random, re, sys, threading, time, uuid
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from app.core import watsonx
+from app.core.config import (
+    PROFILE_HEADER,
+    PROFILE_SAMPLE_RATE,
+    PROFILE_INTERVAL_MS,
+    PROFILE_KEEP_MIN_MS,
+    PROFILES_DIR,
+    PROFILE_MAX_STORED,
+)
+
+_active: ContextVar[Optional["Profile"]] = ContextVar("profile", default=None)
+_joined: ContextVar[tuple] = ContextVar("profile_joined", default=())
+_ID = re.compile(r"^[hs][0-9a-f]{11}$")
+
+
+def wanted(header: Optional[str]) -> Optional[str]:
+    """
+    New profile id if this request should be profiled, else None. Ids start
+    with "h" when the X-Profile header asked for it and "s" when sampled.
+    """
+    if PROFILE_HEADER and header and header.strip().lower() in ("1", "true", "yes", "on"):
+        return "h" + uuid.uuid4().hex[:11]
+    if PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE:
+        return "s" + uuid.uuid4().hex[:11]
+    return None
+
+
+def current() -> Optional["Profile"]:
+    return _active.get()
+
+
+# -------- Stack folding --------
+
+_names: Dict[str, str] = {}
+
+
+def _short(filename: str) -> str:
+    name = _names.get(filename)
+    if name is None:
+        name = filename.replace("\\", "/")
+        for marker in ("/site-packages/", "/dist-packages/", "/lib/python"):
+            if marker in name:
+                name = name.split(marker, 1)[1]
+                break
+        else:
+            cwd = os.getcwd().replace("\\", "/") + "/"
+            if name.startswith(cwd):
+                name = name[len(cwd):]
+        _names[filename] = name
+    return name
+
+
+def _fold(frame, root: str) -> str:
+    parts = []
+    while frame is not None:
+        code = frame.f_code
+        parts.append(f"{getattr(code, 'co_qualname', code.co_name)} ({_short(code.co_filename)})")
+        frame = frame.f_back
+    parts.append(root)
+    return ";".join(reversed(parts))
+
+
+class Profile:
+    def __init__(self, profile_id: str, name: str, forced: bool, meta: Dict[str, Any]):
+        self.id = profile_id
+        self.name = name
+        self.forced = forced
+        self.meta = dict(meta)
+        self.stacks: Dict[str, int] = defaultdict(int)
+        self.samples = 0
+        self.outbound: List[Dict[str, Any]] = []
+        self._threads: Dict[int, List] = {}       # ident -> [depth, root label]
+        self._lock = threading.Lock()
+        self._t0 = time.perf_counter()
+        self.started = time.time()
+        self.wall_ms = 0.0
+
+    # -------- Threads working on the request --------
+
+    def enter(self) -> None:
+        t = threading.current_thread()
+        with self._lock:
+            entry = self._threads.get(t.ident)
+            if entry is None:
+                # pool threads are "dag_3", "summary-map_0": group them by pool
+                self._threads[t.ident] = [1, re.sub(r"[_-]\d+$", "", t.name)]
+            else:
+                entry[0] += 1
+
+    def exit(self) -> None:
+        ident = threading.get_ident()
+        with self._lock:
+            entry = self._threads.get(ident)
+            if entry is not None:
+                entry[0] -= 1
+                if entry[0] <= 0:
+                    del self._threads[ident]
+
+    def sample(self, frames: Dict[int, Any]) -> None:
+        with self._lock:
+            threads = [(ident, entry[1]) for ident, entry in self._threads.items()]
+        stacks = [_fold(frames[ident], root) for ident, root in threads if ident in frames]
+        with self._lock:
+            self.samples += 1
+            for s in stacks:
+                self.stacks[s] += 1
+
+    def call(self, endpoint: str, model: str, ok: bool, seconds: float, error: Optional[str]) -> None:
+        with self._lock:
+            self.outbound.append({
+                "endpoint": endpoint, "model": model, "ok": ok, "ms": round(seconds * 1000.0, 2),
+                "at_ms": round((time.perf_counter() - self._t0) * 1000.0 - seconds * 1000.0, 2),
+                "error": error,
+            })
+
+    # -------- Output --------
+
+    def folded(self) -> str:
+        with self._lock:
+            return "".join(f"{s} {n}\n" for s, n in sorted(self.stacks.items()))
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            calls = list(self.outbound)
+        by_call: Dict[str, Dict[str, Any]] = {}
+        for c in calls:
+            s = by_call.setdefault(f"{c['endpoint']}:{c['model']}", {"n": 0, "errors": 0, "total_ms": 0.0, "max_ms": 0.0})
+            s["n"] += 1
+            s["errors"] += 0 if c["ok"] else 1
+            s["total_ms"] = round(s["total_ms"] + c["ms"], 2)
+            s["max_ms"] = max(s["max_ms"], c["ms"])
+        return {
+            "id": self.id, "name": self.name, "forced": self.forced, "started": self.started,
+            "wall_ms": self.wall_ms, "samples": self.samples, "interval_ms": PROFILE_INTERVAL_MS,
+            "outbound_summary": by_call, "outbound": calls, **self.meta,
+        }
+
+
+class _Sampler:
+    """One thread samples every active profile; it exits when none are left."""
+
+    def __init__(self, interval_s: float):
+        self.interval_s = interval_s
+        self._profiles: List[Profile] = []
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def add(self, profile: Profile) -> None:
+        with self._lock:
+            self._profiles.append(profile)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+                self._thread.start()
+
+    def remove(self, profile: Profile) -> None:
+        with self._lock:
+            if profile in self._profiles:
+                self._profiles.remove(profile)
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                profiles = list(self._profiles)
+                if not profiles:
+                    self._thread = None
+                    return
+            frames = sys._current_frames()
+            for p in profiles:
+                p.sample(frames)
+            del frames
+            time.sleep(self.interval_s)
+
+
+_sampler = _Sampler(PROFILE_INTERVAL_MS / 1000.0)
+
+
+@contextmanager
+def profile(profile_id: Optional[str], name: str, **meta) -> Iterator[Optional[Profile]]:
+    """
+    Profile the enclosed block (and the worker threads it hands work to)
+    under `profile_id` from `wanted`. With profile_id=None nothing happens and
+    None is yielded. The profile is saved on exit; add to `.meta` inside the
+    block to store extra fields.
+    """
+    if profile_id is None:
+        yield None
+        return
+    p = Profile(profile_id, name, forced=profile_id.startswith("h"), meta=meta)
+    token = _active.set(p)
+    p.enter()
+    _sampler.add(p)
+    try:
+        yield p
+    except BaseException as e:
+        p.meta["error"] = f"{type(e).__name__}: {e}"[:300]
+        raise
+    finally:
+        _sampler.remove(p)
+        p.exit()
+        _active.reset(token)
+        p.wall_ms = round((time.perf_counter() - p._t0) * 1000.0, 2)
+        if p.forced or p.wall_ms >= PROFILE_KEEP_MIN_MS:
+            save(p)
+
+
+def attached(fn: Callable, *args, **kwargs) -> Any:
+    """Run fn, counting the current thread as part of the active profile if there is one."""
+    p = _active.get()
+    if p is None:
+        return fn(*args, **kwargs)
+    p.enter()
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        p.exit()
+
+
+def joined(contexts: List[contextvars.Context], fn: Callable, *args, **kwargs) -> Any:
+    """
+    Run fn on behalf of several requests at once (one micro-batch, see
+    app/core/batcher.py): the profile of each context in `contexts` counts the
+    current thread and logs the outbound calls fn makes.
+    """
+    profiles = []
+    for ctx in contexts:
+        p = ctx.get(_active)
+        if p is not None and p not in profiles:
+            profiles.append(p)
+    if not profiles:
+        return fn(*args, **kwargs)
+    for p in profiles:
+        p.enter()
+    token = _joined.set(tuple(profiles))
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        _joined.reset(token)
+        for p in profiles:
+            p.exit()
+
+
+def _observe(endpoint: str, model: str, ok: bool, seconds: float, error: Optional[str]) -> None:
+    profiles = _joined.get()
+    if not profiles:
+        p = _active.get()
+        profiles = (p,) if p is not None else ()
+    for p in profiles:
+        p.call(endpoint, model, ok, seconds, error)
+
+
+# -------- Storage --------
+
+def _path(profile_id: str, ext: str) -> str:
+    if not _ID.match(profile_id):
+        raise KeyError(profile_id)
+    return os.path.join(PROFILES_DIR, f"{profile_id}.{ext}")
+
+
+def save(p: Profile) -> None:
+    try:
+        os.makedirs(PROFILES_DIR, exist_ok=True)
+        with open(_path(p.id, "folded"), "w", encoding="utf-8") as f:
+            f.write(p.folded())
+        with open(_path(p.id, "json"), "w", encoding="utf-8") as f:
+            json.dump(p.summary(), f, ensure_ascii=False, default=str)
+        print(f"[profiler] {p.id} ({p.name}): {p.wall_ms:.0f} ms, {p.samples} samples, "
+              f"{len(p.outbound)} outbound calls")
+        _prune()
+    except Exception as e:
+        print(f"[profiler] could not save profile {p.id}: {e}")
+
+
+def _prune() -> None:
+    metas = sorted((os.path.getmtime(os.path.join(PROFILES_DIR, n)), n[:-5])
+                   for n in os.listdir(PROFILES_DIR) if n.endswith(".json"))
+    for _, profile_id in metas[:max(0, len(metas) - PROFILE_MAX_STORED)]:
+        for ext in ("json", "folded"):
+            try:
+                os.remove(os.path.join(PROFILES_DIR, f"{profile_id}.{ext}"))
+            except FileNotFoundError:
+                pass
+
+
+def list_profiles() -> List[Dict[str, Any]]:
+    """Stored profiles, newest first (id, name, wall time, samples, outbound call count)."""
+    out = []
+    if not os.path.isdir(PROFILES_DIR):
+        return out
+    for name in os.listdir(PROFILES_DIR):
+        if name.endswith(".json"):
+            try:
+                meta = load(name[:-5])
+            except (KeyError, ValueError):
+                continue
+            out.append({"id": meta["id"], "name": meta["name"], "started": meta["started"],
+                        "wall_ms": meta["wall_ms"], "samples": meta["samples"],
+                        "outbound": len(meta.get("outbound", [])), "report_id": meta.get("report_id", "")})
+    return sorted(out, key=lambda m: m["started"], reverse=True)
+
+
+def load(profile_id: str) -> Dict[str, Any]:
+    """Stored profile metadata; KeyError if unknown."""
+    try:
+        with open(_path(profile_id, "json"), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        raise KeyError(profile_id)
+
+
+def load_folded(profile_id: str) -> str:
+    try:
+        with open(_path(profile_id, "folded"), encoding="utf-8") as f:
+            return f.read()
+    except FileNotFoundError:
+        raise KeyError(profile_id)
+
+
+watsonx.add_observer(_observe)
@@ -0,0 +1,135 @@
+# app/core/report_store.py
+"""
+Stored call reports plus the intermediate artifacts needed to re-check them.
+
+    data/reports/<report_id>/
+      report.json       # the CallReport in compact form (app/core/wire.py), patched by re-verification
+      artifacts.json    # segments, claims, evidence keys per claim, KB id/version, history
+
+The evidence key of a claim is the list of `doc_id:<snippet hash>` of the
+evidence it was verified against. app/core/reverify.py re-runs retrieval for
+stored claims against a newer KB snapshot and only calls the verifier again for
+claims whose evidence set changed. Files are written to a temp name and renamed
+into place, so readers never see a half-written report. Beyond
+REPORTS_MAX_STORED reports, the least recently updated ones are deleted.
+"""
+from __future__ import annotations
+import hashlib, json, os, re, shutil, threading, time, uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.schemas.evidence import Evidence
+from app.schemas.report import CallReport
+from app.core.config import REPORTS_DIR, REPORTS_MAX_STORED
+from app.core.wire import compact_report, expand_report, dumps
+
+REPORT_FILE = "report.json"
+ARTIFACTS_FILE = "artifacts.json"
+_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+
+
+def evidence_key(e: Evidence) -> str:
+    snippet = re.sub(r"\s+", " ", (e.snippet or "").strip()).lower()
+    return f"{e.doc_id}:{hashlib.sha1(snippet.encode('utf-8')).hexdigest()[:12]}"
+
+
+def evidence_keys(evidence_by_claim: Dict[str, List[Evidence]]) -> Dict[str, List[str]]:
+    return {cid: [evidence_key(e) for e in evs] for cid, evs in evidence_by_claim.items()}
+
+
+class ReportStore:
+    def __init__(self, root: str = REPORTS_DIR, max_stored: int = REPORTS_MAX_STORED):
+        self.root = root
+        self.max_stored = max_stored
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_lock = threading.Lock()
+
+    def _dir(self, report_id: str) -> str:
+        if not _ID_RE.match(report_id or ""):
+            raise ValueError(f"invalid report id {report_id!r}")
+        return os.path.join(self.root, report_id)
+
+    def lock(self, report_id: str) -> threading.Lock:
+        """Per-report lock; hold it around load -> patch -> update."""
+        with self._locks_lock:
+            return self._locks.setdefault(report_id, threading.Lock())
+
+    def exists(self, report_id: str) -> bool:
+        return os.path.exists(os.path.join(self._dir(report_id), ARTIFACTS_FILE))
+
+    def save(self, report: CallReport, segments: List[Dict[str, Any]]) -> str:
+        """Store a finished report with its artifacts; sets and returns `report.report_id`."""
+        report.report_id = report.report_id or uuid.uuid4().hex
+        now = time.time()
+        artifacts = {
+            "report_id": report.report_id,
+            "kb_id": report.kb_id,
+            "kb_version": report.kb_version,
+            "created": now,
+            "updated": now,
+            "segments": segments,
+            "claims": [c.model_dump() for c in report.claims],
+            "evidence_keys": evidence_keys(report.evidence_by_claim),
+            "reverified": [],
+        }
+        self.update(report, artifacts)
+        self._prune()
+        return report.report_id
+
+    def update(self, report: CallReport, artifacts: Dict[str, Any]) -> None:
+        d = self._dir(report.report_id)
+        os.makedirs(d, exist_ok=True)
+        # artifacts last: a report dir is complete once artifacts.json exists
+        _write_json(os.path.join(d, REPORT_FILE), compact_report(report))
+        _write_json(os.path.join(d, ARTIFACTS_FILE), artifacts)
+
+    def load(self, report_id: str) -> Tuple[CallReport, Dict[str, Any]]:
+        d = self._dir(report_id)
+        try:
+            with open(os.path.join(d, ARTIFACTS_FILE)) as f:
+                artifacts = json.load(f)
+            with open(os.path.join(d, REPORT_FILE)) as f:
+                report = expand_report(json.load(f))
+        except FileNotFoundError:
+            raise KeyError(report_id)
+        return report, artifacts
+
+    def list(self, kb: Optional[str] = None) -> List[str]:
+        """Stored report ids, least recently updated first; `kb` keeps only that KB's reports."""
+        if not os.path.isdir(self.root):
+            return []
+        out = []
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name, ARTIFACTS_FILE)
+            if not _ID_RE.match(name) or not os.path.exists(path):
+                continue
+            if kb is not None:
+                with open(path) as f:
+                    if json.load(f).get("kb_id") != kb:
+                        continue
+            out.append((os.path.getmtime(path), name))
+        return [name for _, name in sorted(out)]
+
+    def _prune(self) -> None:
+        if self.max_stored <= 0:
+            return
+        ids = self.list()
+        for report_id in ids[:max(0, len(ids) - self.max_stored)]:
+            lock = self.lock(report_id)
+            if not lock.acquire(blocking=False):
+                continue   # being re-verified right now; try again after the next save
+            try:
+                shutil.rmtree(self._dir(report_id), ignore_errors=True)
+                with self._locks_lock:
+                    self._locks.pop(report_id, None)
+            finally:
+                lock.release()
+
+
+def _write_json(path: str, data: Any) -> None:
+    tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(dumps(data))
+    os.replace(tmp, path)
+
+
+report_store = ReportStore()
@@ -0,0 +1,160 @@
+# app/core/reverify.py
+"""
+Re-check stored reports after a KB update, proportional to what changed.
+
+For each representative claim of a stored report, retrieval is re-run against
+the report KB's current snapshot. The verifier is called again only for
+claims whose evidence set (doc ids + snippet hashes, see report_store) differs
+from the one they were verified with. Their verdicts and evidence are then
+patched into the stored CallReport, and duplicate claims follow their
+representative. ASR, claim extraction and the summary are not redone, except
+that `resummarize=True` regenerates the summary from the stored segments.
+
+The verifier runs in strict mode here: a claim it fails on keeps its stored
+verdict and evidence instead of an "insufficient" fallback, and the report
+stays at its old KB version, so the next run retries it.
+
+CLI:
+    python -m app.core.reverify <report_id> [...]     # specific reports
+    python -m app.core.reverify --all [--kb <name>]    # every stored report (of one KB)
+"""
+from __future__ import annotations
+import argparse, json, time
+from typing import Any, Dict, List, Optional
+
+from app.schemas.claim import Claim
+from app.schemas.evidence import Evidence
+from app.schemas.verdict import Verdict
+from app.agents.retriever import retrieve_evidence_for_claims, embed_queries, current_kb
+from app.agents.verifier import verify
+from app.agents.summarizer import make_report, make_claim_table
+from app.agents.dedupe import expand_duplicates
+from app.core import health
+from app.core.orchestrator import _flatten_evidence
+from app.core.report_store import ReportStore, report_store, evidence_keys
+from app.core.config import IBM_VERIFIER_MODEL_ID, ORCH_VERIFY_BATCH_SIZE
+
+
+def reverify_report(report_id: str, store: ReportStore = report_store, force: bool = False,
+                    resummarize: bool = False) -> Dict[str, Any]:
+    """
+    Bring one stored report up to date with its KB's current snapshot.
+    Returns {report_id, from_version, to_version, claims, changed, verified, failed}.
+    Raises KeyError for an unknown report id. Runs for the same report are
+    serialized, so concurrent ones cannot overwrite each other's patch.
+    """
+    with store.lock(report_id):
+        return _reverify(report_id, store, force, resummarize)
+
+
+def _reverify(report_id: str, store: ReportStore, force: bool, resummarize: bool) -> Dict[str, Any]:
+    report, artifacts = store.load(report_id)
+    kb_id = artifacts.get("kb_id") or report.kb_id or None
+    kb = current_kb(tenant=kb_id)
+    out = {"report_id": report_id, "from_version": artifacts.get("kb_version"), "to_version": kb.version,
+           "claims": 0, "changed": [], "verified": 0, "failed": []}
+    if kb.version == artifacts.get("kb_version") and not force:
+        return out
+    if not health.usable("generation", IBM_VERIFIER_MODEL_ID):
+        # the verifier's offline fallback would overwrite real verdicts with "insufficient"
+        raise RuntimeError("verifier model is down; not re-verifying")
+
+    claims = [Claim.model_validate(c) for c in artifacts.get("claims", [])]
+    reps = [c for c in claims if not c.duplicate_of]
+    out["claims"] = len(reps)
+    old_keys: Dict[str, List[str]] = artifacts.get("evidence_keys", {})
+
+    # 1) Retrieval for every representative claim against the new snapshot
+    vecs = embed_queries([c.text for c in reps], kb=kb) if reps else None
+    query_vecs = {c.id: vecs[i] for i, c in enumerate(reps)} if vecs is not None else None
+    _, new_ev = retrieve_evidence_for_claims(reps, k=8, query_vecs=query_vecs, kb=kb)
+    new_keys = evidence_keys(new_ev)
+    changed = [c for c in reps if set(new_keys.get(c.id, [])) != set(old_keys.get(c.id, []))]
+    out["changed"] = [c.id for c in changed]
+
+    # 2) Verification only where the evidence changed; failed claims stay as they were
+    new_verdicts: Dict[str, Verdict] = {}
+    for b in range(0, len(changed), ORCH_VERIFY_BATCH_SIZE):
+        batch = changed[b:b + ORCH_VERIFY_BATCH_SIZE]
+        try:
+            got = verify(batch, {c.id: new_ev.get(c.id, []) for c in batch}, strict=True)
+        except Exception as e:
+            print(f"[reverify] {report_id}: verifier failed for {[c.id for c in batch]}: {e}")
+            continue
+        ids = {c.id for c in batch}
+        new_verdicts.update((v.claim_id, v) for v in got if v.claim_id in ids)
+    failed = [c for c in changed if c.id not in new_verdicts]
+    changed = [c for c in changed if c.id in new_verdicts]
+    out["verified"] = len(changed)
+    out["failed"] = [c.id for c in failed]
+    to_version = out["to_version"] = kb.version if not failed else artifacts.get("kb_version")
+
+    # 3) Patch the report: representatives' evidence/verdicts, then copy onto duplicates
+    rep_ids = {c.id for c in reps}
+    evmap: Dict[str, List[Evidence]] = {cid: evs for cid, evs in report.evidence_by_claim.items() if cid in rep_ids}
+    for c in changed:
+        evmap[c.id] = new_ev.get(c.id, [])
+    verdicts = [new_verdicts.get(v.claim_id, v) for v in report.verdicts if v.claim_id in rep_ids]
+    known = {v.claim_id for v in verdicts}
+    verdicts.extend(v for cid, v in new_verdicts.items() if cid not in known)
+    evmap, verdicts = expand_duplicates(claims, evmap, verdicts)
+
+    if resummarize:
+        patched = make_report(artifacts.get("segments", []), claims, _flatten_evidence(evmap), verdicts,
+                              evidence_by_claim=evmap)
+        report.call_summary, report.action_items = patched.call_summary, patched.action_items
+    report.claim_table = make_claim_table(claims, verdicts)
+    report.verdicts = verdicts
+    report.evidence_by_claim = evmap
+    report.evidence = _flatten_evidence(evmap)
+    report.kb_version = to_version
+
+    # unchanged and failed claims keep their old keys; same set, possibly different order
+    artifacts["evidence_keys"] = {**old_keys, **{c.id: new_keys.get(c.id, []) for c in changed}}
+    artifacts["kb_version"] = to_version   # stays put until every changed claim went through
+    artifacts["updated"] = time.time()
+    artifacts.setdefault("reverified", []).append({
+        "at": artifacts["updated"], "from_version": out["from_version"], "to_version": kb.version,
+        "changed": out["changed"], "failed": out["failed"],
+    })
+    store.update(report, artifacts)
+    print(f"[reverify] {report_id}: {out['from_version']} -> {kb.version}, "
+          f"{len(changed)}/{len(reps)} claims re-verified"
+          + (f", {len(failed)} failed (will retry)" if failed else ""))
+    return out
+
+
+def reverify_all(kb: Optional[str] = None, store: ReportStore = report_store, **kwargs) -> List[Dict[str, Any]]:
+    """Re-verify every stored report (of `kb` if given); failures are reported, not raised."""
+    results = []
+    for report_id in store.list(kb=kb):
+        try:
+            results.append(reverify_report(report_id, store=store, **kwargs))
+        except Exception as e:
+            print(f"[reverify] {report_id} failed: {e}")
+            results.append({"report_id": report_id, "error": f"{type(e).__name__}: {e}"})
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Re-verify stored reports against the current KB snapshot")
+    ap.add_argument("reports", nargs="*", help="report ids")
+    ap.add_argument("--all", action="store_true", help="every stored report")
+    ap.add_argument("--kb", default=None, help="with --all: only reports of this KB")
+    ap.add_argument("--force", action="store_true", help="re-check even if the KB version is unchanged")
+    ap.add_argument("--resummarize", action="store_true", help="also regenerate the call summary")
+    args = ap.parse_args(argv)
+    opts = {"force": args.force, "resummarize": args.resummarize}
+    if args.all:
+        results = reverify_all(kb=args.kb, **opts)
+    elif args.reports:
+        results = [reverify_report(r, **opts) for r in args.reports]
+    else:
+        ap.error("give report ids or --all")
+    for r in results:
+        print(json.dumps(r))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,225 @@
+# app/core/scheduler.py
+from __future__ import annotations
+import contextvars, threading, time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional
+
+from app.core import profiler
+
+
+class Cancelled(Exception):
+    """Raised by a node to abort the whole graph: nothing that has not started yet will run."""
+
+
+class _Node:
+    __slots__ = ("name", "fn", "stage", "deps", "children", "waiting",
+                 "state", "result", "error", "added", "ready", "start", "end")
+
+    def __init__(self, name: str, fn: Callable[[], Any], stage: str, deps: List[str], now: float):
+        self.name = name
+        self.fn = fn
+        self.stage = stage
+        self.deps = deps
+        self.children: List["_Node"] = []
+        self.waiting = 0
+        self.state = "waiting"          # waiting | ready | running | done | failed
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.added = now
+        self.ready: Optional[float] = None
+        self.start: Optional[float] = None
+        self.end: Optional[float] = None
+
+
+class DagScheduler:
+    """
+    Small dependency-graph runner used by the orchestrator.
+
+    - A node runs as soon as every node it depends on has finished.
+    - Each node belongs to a stage; a stage never runs more than its limit at once.
+    - Nodes may add further nodes while running (extraction -> retrieval -> verify).
+    - Per-node timings are kept so the critical path of a call can be reported.
+    Failed nodes do not run their dependents; `wait()` re-raises the first error.
+    A node raising `Cancelled` also drops every node that has not started.
+    """
+
+    def __init__(self, stage_limits: Dict[str, int], default_limit: int = 1):
+        self._limits = {s: max(1, int(n)) for s, n in stage_limits.items()}
+        self._default_limit = max(1, default_limit)
+        self._pool = ThreadPoolExecutor(
+            max_workers=max(1, sum(self._limits.values()) + self._default_limit),
+            thread_name_prefix="dag",
+        )
+        # nodes run in a copy of the caller's context (request-scoped contextvars)
+        self._ctx = contextvars.copy_context()
+        self._cv = threading.Condition()
+        self._nodes: Dict[str, _Node] = {}
+        self._ready: Dict[str, Deque[_Node]] = {}
+        self._running: Dict[str, int] = {}
+        self._pending = 0
+        self._errors: List[BaseException] = []
+        self._cancelled = False
+        self._t0 = time.perf_counter()
+
+    # -------- Graph building --------
+
+    def add(self, name: str, fn: Callable[[], Any], *, stage: str, deps: Iterable[str] = ()) -> str:
+        """Register a node; it is scheduled once all `deps` (existing node names) are done."""
+        with self._cv:
+            if name in self._nodes:
+                raise ValueError(f"duplicate scheduler node: {name}")
+            node = _Node(name, fn, stage, list(deps), time.perf_counter())
+            failed = False
+            for d in node.deps:
+                dep = self._nodes[d]
+                if dep.state == "failed":
+                    failed = True
+                elif dep.state != "done":
+                    node.waiting += 1
+                    dep.children.append(node)
+            self._nodes[name] = node
+            self._pending += 1
+            if failed or self._cancelled:
+                self._skip(node)
+            elif node.waiting == 0:
+                self._make_ready(node)
+            self._dispatch()
+        return name
+
+    def result(self, name: str) -> Any:
+        return self._nodes[name].result
+
+    def wait(self) -> None:
+        """Block until every registered node has finished (or was skipped)."""
+        with self._cv:
+            while self._pending:
+                self._cv.wait()
+            if self._errors:
+                raise self._errors[0]
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=False)
+
+    def __enter__(self) -> "DagScheduler":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    # -------- Internals (called with self._cv held) --------
+
+    def _make_ready(self, node: _Node) -> None:
+        if self._cancelled:
+            self._skip(node)
+            return
+        node.state = "ready"
+        node.ready = time.perf_counter()
+        self._ready.setdefault(node.stage, deque()).append(node)
+
+    def _skip(self, node: _Node) -> None:
+        node.state = "failed"
+        self._pending -= 1
+        for child in node.children:
+            if child.state == "waiting":
+                self._skip(child)
+
+    def _dispatch(self) -> None:
+        for stage, queue in self._ready.items():
+            limit = self._limits.get(stage, self._default_limit)
+            while queue and self._running.get(stage, 0) < limit:
+                node = queue.popleft()
+                node.state = "running"
+                self._running[stage] = self._running.get(stage, 0) + 1
+                self._pool.submit(self._run, node)
+
+    def _run(self, node: _Node) -> None:
+        node.start = time.perf_counter()
+        result, error = None, None
+        try:
+            result = self._ctx.copy().run(profiler.attached, node.fn)
+        except BaseException as e:  # surfaced through wait()
+            error = e
+        with self._cv:
+            node.end = time.perf_counter()
+            self._running[node.stage] -= 1
+            if error is not None:
+                print(f"[scheduler] node {node.name} failed: {error}")
+                node.error = error
+                self._errors.append(error)
+                if isinstance(error, Cancelled) and not self._cancelled:
+                    self._cancelled = True
+                    for queue in self._ready.values():
+                        while queue:
+                            self._skip(queue.popleft())
+                node.state = "failed"
+                self._pending -= 1
+                for child in node.children:
+                    if child.state == "waiting":
+                        self._skip(child)
+            else:
+                node.result = result
+                node.state = "done"
+                self._pending -= 1
+                for child in node.children:
+                    child.waiting -= 1
+                    if child.waiting == 0 and child.state == "waiting":
+                        self._make_ready(child)
+            self._dispatch()
+            self._cv.notify_all()
+
+    # -------- Timings --------
+
+    def _ms(self, t: Optional[float]) -> Optional[float]:
+        return None if t is None else round((t - self._t0) * 1000.0, 2)
+
+    def timings(self) -> List[Dict[str, Any]]:
+        """Per-node timings in ms relative to scheduler creation."""
+        out = []
+        with self._cv:
+            for n in self._nodes.values():
+                out.append({
+                    "node": n.name,
+                    "stage": n.stage,
+                    "deps": list(n.deps),
+                    "state": n.state,
+                    "ready_ms": self._ms(n.ready),
+                    "start_ms": self._ms(n.start),
+                    "end_ms": self._ms(n.end),
+                    "queue_ms": round((n.start - n.ready) * 1000.0, 2) if n.start and n.ready else None,
+                    "run_ms": round((n.end - n.start) * 1000.0, 2) if n.end and n.start else None,
+                })
+        return out
+
+    def critical_path(self) -> List[str]:
+        """
+        Walk back from the last node to finish, always through the dependency
+        that finished last (the one that actually gated the next node).
+        """
+        with self._cv:
+            finished = [n for n in self._nodes.values() if n.end is not None]
+            if not finished:
+                return []
+            node = max(finished, key=lambda n: n.end)
+            path = [node.name]
+            while node.deps:
+                deps = [self._nodes[d] for d in node.deps if self._nodes[d].end is not None]
+                if not deps:
+                    break
+                node = max(deps, key=lambda n: n.end)
+                path.append(node.name)
+        return list(reversed(path))
+
+    def report(self) -> Dict[str, Any]:
+        nodes = self.timings()
+        ends = [n["end_ms"] for n in nodes if n["end_ms"] is not None]
+        by_stage: Dict[str, float] = {}
+        for n in nodes:
+            if n["run_ms"] is not None:
+                by_stage[n["stage"]] = round(by_stage.get(n["stage"], 0.0) + n["run_ms"], 2)
+        return {
+            "total_ms": max(ends) if ends else 0.0,
+            "stage_busy_ms": by_stage,
+            "critical_path": self.critical_path(),
+            "nodes": nodes,
+        }
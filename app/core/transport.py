@@ -0,0 +1,267 @@
+# app/core/transport.py
+"""
+Record / replay / passthrough transport under every watsonx request.
+
+app.core.watsonx._send hands each HTTP attempt to `transport.send`:
+
+  passthrough  send it (default; behaves as before)
+  record       send it and append request key, status, body and latency to
+               the cassette (<WATSONX_CASSETTE_DIR>/<endpoint>.jsonl)
+  replay       answer from the cassette without any network or IAM call,
+               optionally sleeping the recorded latency * WATSONX_REPLAY_LATENCY_SCALE
+
+A request's key is a hash of the endpoint and its JSON body, with `project_id`
+left out so cassettes are portable between projects. Requests with the same
+key are replayed in the order they were recorded (a 429 followed by a 200
+replays as such). Once a key's recordings run out, the last one repeats.
+Transport errors such as timeouts are recorded and re-raised. A replay miss raises
+CassetteMiss, or goes to the network if WATSONX_REPLAY_MISS=passthrough.
+
+Successful embeddings responses are recorded per input text, and a replayed
+embeddings request is put back together from its inputs' recordings. How
+texts end up grouped into one request depends on MicroBatcher timing, so a
+whole-request key would rarely match on replay. Failed embeddings requests
+(429, 5xx, timeouts) are still recorded whole and only replay for the same
+grouping.
+
+Hedged requests (WATSONX_HEDGE) record both copies; record with hedging off
+when the exact request sequence matters.
+
+CLI:
+    python -m app.core.transport stats [--dir <cassette dir>]
+"""
+from __future__ import annotations
+import argparse, hashlib, json, os, threading, time
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Optional
+
+import requests
+
+from app.core.config import (
+    WATSONX_TRANSPORT,
+    WATSONX_CASSETTE_DIR,
+    WATSONX_REPLAY_LATENCY_SCALE,
+    WATSONX_REPLAY_MISS,
+)
+
+MODES = ("passthrough", "record", "replay")
+_PER_INPUT = ("embeddings",)   # endpoints recorded per input text, see the module docstring
+_KEEP_HEADERS = ("Retry-After", "Content-Type")
+
+
+class CassetteMiss(requests.RequestException):
+    """Replay mode got a request that was never recorded (not retried, not a breaker failure)."""
+
+
+def request_key(endpoint: str, body: dict) -> str:
+    body = {k: v for k, v in body.items() if k != "project_id"}
+    raw = json.dumps([endpoint, body], sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _response(endpoint: str, entry: Dict[str, Any]) -> requests.Response:
+    r = requests.Response()
+    r.status_code = entry["status"]
+    r._content = entry.get("body", "").encode("utf-8")
+    r.headers.update(entry.get("headers") or {})
+    r.url = f"replay://{endpoint}"
+    r.encoding = "utf-8"
+    return r
+
+
+def _split(body: dict, r: requests.Response) -> Optional[List[tuple]]:
+    """(single-input body, response text) per input of a batched request, or None if it can't be split."""
+    inputs = body.get("inputs")
+    try:
+        data = r.json()
+    except ValueError:
+        return None
+    results = data.get("results") if isinstance(data, dict) else None
+    if not isinstance(inputs, list) or not isinstance(results, list) or len(inputs) != len(results):
+        return None
+    data = {k: v for k, v in data.items() if k not in ("results", "input_token_count")}
+    return [({**body, "inputs": [text]}, json.dumps({**data, "results": [res]}, ensure_ascii=False))
+            for text, res in zip(inputs, results)]
+
+
+def _error(entry: Dict[str, Any]) -> Exception:
+    cls = getattr(requests.exceptions, entry["error"].split(":")[0], requests.ConnectionError)
+    if not (isinstance(cls, type) and issubclass(cls, Exception)):
+        cls = requests.ConnectionError
+    return cls(entry["error"])
+
+
+class Transport:
+    def __init__(self, mode: str = WATSONX_TRANSPORT, cassette_dir: str = WATSONX_CASSETTE_DIR,
+                 latency_scale: float = WATSONX_REPLAY_LATENCY_SCALE, on_miss: str = WATSONX_REPLAY_MISS):
+        self._lock = threading.Lock()
+        self.configure(mode, cassette_dir, latency_scale, on_miss)
+
+    def configure(self, mode: Optional[str] = None, cassette_dir: Optional[str] = None,
+                  latency_scale: Optional[float] = None, on_miss: Optional[str] = None) -> None:
+        """Switch mode/cassette at runtime (benchmarks, tests); resets replay positions."""
+        with self._lock:
+            mode = (mode or getattr(self, "mode", "passthrough")).lower()
+            if mode not in MODES:
+                raise ValueError(f"unknown transport mode {mode!r} (expected one of {', '.join(MODES)})")
+            self.mode = mode
+            self.dir = cassette_dir or getattr(self, "dir", WATSONX_CASSETTE_DIR)
+            if latency_scale is not None:
+                self.latency_scale = latency_scale
+            if on_miss is not None:
+                self.on_miss = on_miss
+            self._tapes: Optional[Dict[str, List[Dict[str, Any]]]] = None
+            self._pos: Dict[str, int] = defaultdict(int)
+            self.counts = {"sent": 0, "recorded": 0, "replayed": 0, "misses": 0}
+
+    # -------- Public API --------
+
+    def send(self, endpoint: str, body: dict, timeout: float,
+             live: Callable[[str, dict, float], requests.Response]) -> requests.Response:
+        if self.mode == "replay":
+            entry = self._next_joined(endpoint, body) if endpoint in _PER_INPUT else None
+            if entry is None:
+                entry = self._next(endpoint, request_key(endpoint, body))
+            if entry is not None:
+                return self._replay(endpoint, entry, timeout)
+            with self._lock:
+                self.counts["misses"] += 1
+            if self.on_miss != "passthrough":
+                raise CassetteMiss(f"no recording for {endpoint} request {request_key(endpoint, body)[:12]}")
+        with self._lock:
+            self.counts["sent"] += 1
+        if self.mode != "record":
+            return live(endpoint, body, timeout)
+        t0 = time.perf_counter()
+        try:
+            r = live(endpoint, body, timeout)
+        except requests.RequestException as e:
+            self._record(endpoint, body, {"error": f"{type(e).__name__}: {e}"[:300]}, time.perf_counter() - t0)
+            raise
+        seconds = time.perf_counter() - t0
+        headers = {h: r.headers[h] for h in _KEEP_HEADERS if h in r.headers}
+        parts = _split(body, r) if endpoint in _PER_INPUT and r.status_code == 200 else None
+        if parts is not None:
+            for part_body, text in parts:
+                self._record(endpoint, part_body, {"status": 200, "headers": headers, "body": text}, seconds)
+            return r
+        self._record(endpoint, body, {
+            "status": r.status_code,
+            "headers": headers,
+            "body": r.text,
+        }, seconds)
+        return r
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"mode": self.mode, "dir": self.dir, **self.counts}
+
+    # -------- Cassette --------
+
+    def _path(self, endpoint: str) -> str:
+        return os.path.join(self.dir, f"{endpoint.replace('/', '_')}.jsonl")
+
+    def _record(self, endpoint: str, body: dict, entry: Dict[str, Any], seconds: float) -> None:
+        entry = {"key": request_key(endpoint, body), "endpoint": endpoint, "model": body.get("model_id", ""),
+                 "latency": round(seconds, 4), **entry, "at": time.time()}
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with self._lock:
+            os.makedirs(self.dir, exist_ok=True)
+            with open(self._path(endpoint), "a", encoding="utf-8") as f:
+                f.write(line)
+            self.counts["recorded"] += 1
+
+    def _load(self) -> Dict[str, List[Dict[str, Any]]]:
+        # _lock held
+        tapes: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        if os.path.isdir(self.dir):
+            for name in sorted(os.listdir(self.dir)):
+                if not name.endswith(".jsonl"):
+                    continue
+                with open(os.path.join(self.dir, name), encoding="utf-8") as f:
+                    for line in f:
+                        if line.strip():
+                            entry = json.loads(line)
+                            tapes[entry["key"]].append(entry)
+        print(f"[transport] loaded {sum(len(v) for v in tapes.values())} recordings from {self.dir}")
+        return tapes
+
+    def _next(self, endpoint: str, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            if self._tapes is None:
+                self._tapes = self._load()
+            tape = self._tapes.get(key)
+            if not tape:
+                return None
+            i = self._pos[key]
+            self._pos[key] = i + 1
+            self.counts["replayed"] += 1
+            return tape[min(i, len(tape) - 1)]
+
+    def _next_joined(self, endpoint: str, body: dict) -> Optional[Dict[str, Any]]:
+        """One response assembled from per-input recordings, or None unless every input has one."""
+        inputs = body.get("inputs")
+        if not isinstance(inputs, list) or len(inputs) < 2:
+            return None   # a single input's own recordings replay in order via _next
+        with self._lock:
+            if self._tapes is None:
+                self._tapes = self._load()
+            entries = []
+            for text in inputs:
+                ok = [e for e in self._tapes.get(request_key(endpoint, {**body, "inputs": [text]}), ())
+                      if e.get("status") == 200]
+                if not ok:
+                    return None
+                entries.append(ok[-1])
+            self.counts["replayed"] += 1
+        data = json.loads(entries[0]["body"])
+        data["results"] = [json.loads(e["body"])["results"][0] for e in entries]
+        return {"status": 200, "headers": entries[0].get("headers") or {}, "body": json.dumps(data, ensure_ascii=False),
+                "latency": max(e.get("latency", 0.0) for e in entries)}
+
+    def _replay(self, endpoint: str, entry: Dict[str, Any], timeout: float) -> requests.Response:
+        if self.latency_scale > 0:
+            delay = entry.get("latency", 0.0) * self.latency_scale
+            time.sleep(min(delay, timeout))
+            if delay > timeout:
+                raise requests.Timeout(f"replayed latency {delay:.1f}s exceeds timeout {timeout:.1f}s")
+        if "error" in entry:
+            raise _error(entry)
+        return _response(endpoint, entry)
+
+
+def cassette_stats(cassette_dir: str) -> Dict[str, Any]:
+    """Recordings per endpoint/model with status counts and latency percentiles."""
+    import numpy as np
+    groups: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    t = Transport("replay", cassette_dir)
+    with t._lock:
+        tapes = t._load()
+    for entries in tapes.values():
+        for e in entries:
+            groups[f"{e['endpoint']}:{e.get('model', '')}"].append(e)
+    out = {}
+    for name, entries in sorted(groups.items()):
+        lat = np.asarray([e.get("latency", 0.0) for e in entries]) * 1000.0
+        status: Dict[str, int] = defaultdict(int)
+        for e in entries:
+            status[str(e.get("status", "error"))] += 1
+        out[name] = {"n": len(entries), "distinct": len({e["key"] for e in entries}), "status": dict(status),
+                     "p50_ms": round(float(np.percentile(lat, 50)), 1), "p95_ms": round(float(np.percentile(lat, 95)), 1)}
+    return out
+
+
+transport = Transport()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="watsonx cassette tools")
+    ap.add_argument("cmd", choices=["stats"])
+    ap.add_argument("--dir", default=WATSONX_CASSETTE_DIR)
+    args = ap.parse_args(argv)
+    print(json.dumps(cassette_stats(args.dir), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
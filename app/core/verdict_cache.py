@@ -0,0 +1,156 @@
+# app/core/verdict_cache.py
+from __future__ import annotations
+import threading, time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import faiss
+import numpy as np
+
+from app.schemas.evidence import Evidence
+from app.schemas.verdict import Verdict
+from app.core.config import (
+    KB_DEFAULT_TENANT,
+    VERDICT_CACHE_THRESHOLD,
+    VERDICT_CACHE_MAX_ENTRIES,
+    VERDICT_CACHE_TTL_S,
+    VERDICT_CACHE_KB_VERSIONS,
+)
+
+_Key = Tuple[str, str]   # (tenant KB, KB version)
+
+
+class _Entry:
+    __slots__ = ("key", "numbers", "text", "verdict", "evidence", "created")
+
+    def __init__(self, key: _Key, numbers: frozenset, text: str, verdict: Verdict, evidence: List[Evidence]):
+        self.key = key
+        self.numbers = numbers
+        self.text = text
+        self.verdict = verdict
+        self.evidence = evidence
+        self.created = time.monotonic()
+
+
+class VerdictCache:
+    """
+    Process-wide cache of verified claims, shared across calls.
+
+    Lookup is an inner-product ANN search over claim embeddings: a cached entry
+    is reused when its cosine >= threshold *and* its normalized numbers equal
+    the new claim's (so "churn 2%" never answers "churn 4%"). Each (tenant KB,
+    KB version) pair has its own index. Calls are pinned to one KB snapshot,
+    so after a publish the old and the new version are both in use for a
+    while. A version seen for the first time is taken as newly published, and
+    only then are versions beyond the newest `kb_versions` of that KB dropped
+    (the oldest first), so a late call on an old snapshot never evicts the
+    current one. LRU eviction beyond `max_entries` (across all KBs), optional TTL.
+    """
+
+    def __init__(self, threshold: float = VERDICT_CACHE_THRESHOLD,
+                 max_entries: int = VERDICT_CACHE_MAX_ENTRIES,
+                 ttl: Optional[float] = VERDICT_CACHE_TTL_S,
+                 kb_versions: int = VERDICT_CACHE_KB_VERSIONS):
+        self.threshold = threshold
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl
+        self.kb_versions = max(1, kb_versions)
+        self._lock = threading.Lock()
+        self._indexes: Dict[_Key, faiss.IndexIDMap2] = {}     # (KB, version) -> its entries' vectors
+        self._versions: Dict[str, List[str]] = {}               # tenant KB -> live versions, oldest first
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()
+        self._next_id = 0
+        self.counts = {"lookups": 0, "hits": 0, "misses": 0, "inserts": 0,
+                       "evictions": 0, "expired": 0, "invalidations": 0}
+
+    # -------- Public API --------
+
+    def lookup(self, vec: np.ndarray, numbers: frozenset, kb_version: str, kb: str = KB_DEFAULT_TENANT
+               ) -> Optional[Tuple[Verdict, List[Evidence], float]]:
+        with self._lock:
+            self.counts["lookups"] += 1
+            self._check_version(kb, kb_version)
+            index = self._indexes.get((kb, kb_version))
+            if index is None or index.ntotal == 0 or vec.shape[-1] != index.d:
+                self.counts["misses"] += 1
+                return None
+            D, I = index.search(vec.reshape(1, -1).astype("float32"), min(8, int(index.ntotal)))
+            for sim, eid in zip(D[0].tolist(), I[0].tolist()):
+                if eid < 0 or sim < self.threshold:
+                    break
+                entry = self._entries.get(eid)
+                if entry is None:
+                    continue
+                if self.ttl is not None and time.monotonic() - entry.created > self.ttl:
+                    self._remove(eid)
+                    self.counts["expired"] += 1
+                    continue
+                if entry.numbers != numbers:
+                    continue
+                self._entries.move_to_end(eid)
+                self.counts["hits"] += 1
+                return entry.verdict, entry.evidence, sim
+            self.counts["misses"] += 1
+            return None
+
+    def put(self, vec: np.ndarray, numbers: frozenset, kb_version: str, text: str,
+            verdict: Verdict, evidence: List[Evidence], kb: str = KB_DEFAULT_TENANT) -> None:
+        with self._lock:
+            self._check_version(kb, kb_version)
+            key = (kb, kb_version)
+            index = self._indexes.get(key)
+            if index is None:
+                index = self._indexes[key] = faiss.IndexIDMap2(faiss.IndexFlatIP(int(vec.shape[-1])))
+            elif vec.shape[-1] != index.d:
+                return
+            eid = self._next_id
+            self._next_id += 1
+            index.add_with_ids(vec.reshape(1, -1).astype("float32"), np.asarray([eid], dtype="int64"))
+            self._entries[eid] = _Entry(key, numbers, text, verdict, list(evidence))
+            self.counts["inserts"] += 1
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.counts["evictions"] += 1
+
+    def invalidate(self, kb: Optional[str] = None) -> None:
+        """Drop the entries of one KB (every version), or of all of them."""
+        with self._lock:
+            for name in ([kb] if kb is not None else list(self._versions)):
+                for version in self._versions.pop(name, []):
+                    self._clear((name, version))
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {**self.counts, "size": len(self._entries), "kbs": len(self._versions),
+                    "kb_versions": {kb: list(v) for kb, v in self._versions.items()},
+                    "threshold": self.threshold, "max_entries": self.max_entries}
+
+    # -------- Internals (lock held) --------
+
+    def _check_version(self, kb: str, kb_version: str) -> None:
+        live = self._versions.setdefault(kb, [])
+        if kb_version in live:
+            return
+        live.append(kb_version)
+        while len(live) > self.kb_versions:
+            old = live.pop(0)
+            index = self._indexes.get((kb, old))
+            if index is not None and index.ntotal:
+                print(f"[verdict_cache] KB {kb} is at {kb_version}; dropping {index.ntotal} entries of {old}")
+                self.counts["invalidations"] += 1
+            self._clear((kb, old))
+
+    def _clear(self, key: _Key) -> None:
+        self._indexes.pop(key, None)
+        for eid in [e for e, entry in self._entries.items() if entry.key == key]:
+            del self._entries[eid]
+
+    def _remove(self, eid: int) -> None:
+        entry = self._entries.pop(eid, None)
+        index = self._indexes.get(entry.key) if entry is not None else None
+        if index is not None:
+            index.remove_ids(np.asarray([eid], dtype="int64"))
+
+
+verdict_cache = VerdictCache()
@@ -0,0 +1,521 @@
+# app/core/watsonx.py
+"""
+Shared client for outbound watsonx.ai calls (text generation, embeddings,
+rerank). Every call goes through `post()`, so one process-wide governor sees
+all of the traffic:
+
+- token buckets per (endpoint, model) cap the request rate (WATSONX_RATE_LIMITS);
+  a 429 pauses that bucket for Retry-After (or the backoff) so the other
+  in-flight requests stop firing too;
+- an AIMD concurrency limit per endpoint halves on 429/5xx/timeouts (at most
+  once per WATSONX_AIMD_COOLDOWN_S) and grows by ~1 per limit's worth of successes;
+- waiting requests are admitted in priority order: interactive (UI) before
+  batch (backfill) before background (probes). The priority is taken from a
+  context variable, see `priority()`;
+- 429/5xx/timeouts are retried with jittered exponential backoff, re-queueing
+  each time. Other 4xx errors are raised immediately.
+
+Tail latency:
+- hedging (WATSONX_HEDGE): an idempotent call (embeddings, rerank, greedy
+  generation) still running after the WATSONX_HEDGE_PERCENTILE latency of
+  its endpoint+model gets a duplicate; the first good response wins. Hedges
+  are capped at WATSONX_HEDGE_BUDGET of all requests;
+- a circuit breaker per endpoint opens after WATSONX_BREAKER_FAILURES
+  consecutive timeouts/5xx/connection errors. While it is open, calls raise
+  CircuitOpenError at once, so callers go straight to their fallbacks (BM25 or
+  local embeddings, "insufficient" verdicts, the extractive summary).
+  After WATSONX_BREAKER_COOLDOWN_S, one probe call is let through.
+
+Each HTTP attempt goes out through app/core/transport.py, which can record
+it to a cassette or replay it offline (WATSONX_TRANSPORT).
+
+`stats()` returns the live limits, queue depths, bucket, latency and breaker
+states for /metrics.
+"""
+from __future__ import annotations
+import bisect, itertools, random, threading, time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeout
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+from typing import Any, Callable, Dict, Iterator, Optional
+
+import numpy as np
+import requests
+
+from app.core.auth import get_ibm_iam_token
+from app.core.transport import CassetteMiss, transport
+from app.core.config import (
+    WATSONX_BASE_URL,
+    IBM_API_VERSION,
+    WATSONX_RATE_LIMITS,
+    WATSONX_CONCURRENCY_INITIAL,
+    WATSONX_CONCURRENCY_MIN,
+    WATSONX_CONCURRENCY_MAX,
+    WATSONX_AIMD_COOLDOWN_S,
+    WATSONX_RETRIES,
+    WATSONX_BACKOFF_S,
+    WATSONX_HEDGE,
+    WATSONX_HEDGE_PERCENTILE,
+    WATSONX_HEDGE_MIN_SAMPLES,
+    WATSONX_HEDGE_MIN_DELAY_MS,
+    WATSONX_HEDGE_BUDGET,
+    WATSONX_BREAKER_FAILURES,
+    WATSONX_BREAKER_COOLDOWN_S,
+)
+
+PRIORITIES = {"interactive": 0, "batch": 1, "background": 2}
+_PRIORITY_NAMES = {v: k for k, v in PRIORITIES.items()}
+_priority: ContextVar[str] = ContextVar("watsonx_priority", default="interactive")
+
+RETRY_STATUS = (429, 500, 502, 503, 504)
+
+
+@contextmanager
+def priority(name: str) -> Iterator[None]:
+    """Run the block's watsonx calls (and scheduler nodes it starts) at `name` priority."""
+    if name not in PRIORITIES:
+        raise ValueError(f"unknown priority {name!r} (expected one of {sorted(PRIORITIES)})")
+    token = _priority.set(name)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority() -> str:
+    return _priority.get()
+
+
+def url(endpoint: str) -> str:
+    """watsonx.ai REST URL of a text endpoint ("generation", "embeddings", "rerank")."""
+    return f"{WATSONX_BASE_URL.rstrip('/')}/ml/v1/text/{endpoint}?version={IBM_API_VERSION or '2023-05-29'}"
+
+
+def _parse_rate_limits(spec: str) -> Dict[str, float]:
+    """"generation=8,embeddings=20,generation:ibm/granite-13b=2" -> {key: requests/s}."""
+    out: Dict[str, float] = {}
+    for part in (spec or "").split(","):
+        if "=" in part:
+            key, val = part.split("=", 1)
+            try:
+                out[key.strip()] = float(val)
+            except ValueError:
+                print(f"[watsonx] ignoring bad rate limit {part!r}")
+    return out
+
+
+class TokenBucket:
+    """`rate` requests/s with bursts of up to `burst`; `pause()` empties it for a while."""
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = max(rate, 1e-6)
+        self.burst = max(1.0, burst if burst is not None else rate)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def _refill(self, now: float) -> None:
+        start = max(self.updated, self.paused_until)
+        if now > start:
+            self.tokens = min(self.burst, self.tokens + (now - start) * self.rate)
+        self.updated = max(self.updated, now)
+
+    def delay(self, now: float) -> float:
+        """Seconds until a token is available (0 if one is available now)."""
+        if now < self.paused_until:
+            return self.paused_until - now
+        self._refill(now)
+        return 0.0 if self.tokens >= 1.0 else (1.0 - self.tokens) / self.rate
+
+    def take(self) -> None:
+        self.tokens -= 1.0
+
+    def pause(self, seconds: float) -> None:
+        now = time.monotonic()
+        self._refill(now)
+        self.tokens = 0.0
+        self.paused_until = max(self.paused_until, now + seconds)
+
+
+class CircuitOpenError(requests.ConnectionError):
+    """The endpoint's circuit breaker is open; fall back instead of waiting for a timeout."""
+
+
+class CircuitBreaker:
+    """closed -> open after `failures` consecutive failures -> half-open (one probe) after `cooldown` s."""
+
+    def __init__(self, endpoint: str, failures: int = WATSONX_BREAKER_FAILURES,
+                 cooldown: float = WATSONX_BREAKER_COOLDOWN_S):
+        self.endpoint = endpoint
+        self.failures = max(1, failures)
+        self.cooldown = cooldown
+        self.state = "closed"
+        self.consecutive = 0
+        self.opened_at = 0.0
+        self._probe = False
+        self._lock = threading.Lock()
+        self.counts = {"opened": 0, "rejected": 0}
+
+    def before(self) -> None:
+        with self._lock:
+            if self.state == "open":
+                if time.monotonic() - self.opened_at < self.cooldown:
+                    self.counts["rejected"] += 1
+                    raise CircuitOpenError(f"watsonx {self.endpoint} circuit open")
+                self.state, self._probe = "half_open", False
+            if self.state == "half_open":
+                if self._probe:
+                    self.counts["rejected"] += 1
+                    raise CircuitOpenError(f"watsonx {self.endpoint} circuit half-open (probe in flight)")
+                self._probe = True
+
+    def is_open(self) -> bool:
+        """True while calls are being rejected outright (open and still cooling down)."""
+        with self._lock:
+            return self.state == "open" and time.monotonic() - self.opened_at < self.cooldown
+
+    def abort(self) -> None:
+        """The call never reached the endpoint: free the probe slot without judging its health."""
+        with self._lock:
+            self._probe = False
+
+    def success(self) -> None:
+        with self._lock:
+            self.consecutive = 0
+            if self.state != "closed":
+                print(f"[watsonx] {self.endpoint}: circuit closed")
+            self.state, self._probe = "closed", False
+
+    def failure(self) -> None:
+        with self._lock:
+            self.consecutive += 1
+            if self.state == "half_open" or (self.state == "closed" and self.consecutive >= self.failures):
+                print(f"[watsonx] {self.endpoint}: circuit open after {self.consecutive} failures")
+                self.state, self.opened_at, self._probe = "open", time.monotonic(), False
+                self.counts["opened"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"state": self.state, "consecutive_failures": self.consecutive, **self.counts}
+
+
+class _Waiter:
+    __slots__ = ("key", "model")
+
+    def __init__(self, prio: int, seq: int, model: str):
+        self.key = (prio, seq)
+        self.model = model
+
+    def __lt__(self, other: "_Waiter") -> bool:
+        return self.key < other.key
+
+
+class _Lane:
+    """Admission control for one endpoint: AIMD concurrency limit + per-model token buckets."""
+
+    def __init__(self, endpoint: str, rates: Dict[str, float]):
+        self.endpoint = endpoint
+        self._rates = rates
+        self._cond = threading.Condition()
+        self._waiters: list = []           # sorted by (priority, arrival)
+        self._seq = itertools.count()
+        self._buckets: Dict[str, TokenBucket] = {}
+        self.limit = float(WATSONX_CONCURRENCY_INITIAL)
+        self.inflight = 0
+        self._last_decrease = 0.0
+        self.counts = {"admitted": 0, "ok": 0, "throttled": 0, "errors": 0, "decreases": 0,
+                       "hedges": 0, "hedge_wins": 0}
+        self._wait_total = 0.0
+        self._latency: Dict[str, deque] = {}   # model -> recent successful call latencies (s)
+        self.breaker = CircuitBreaker(endpoint)
+
+    def _bucket(self, model: str) -> TokenBucket:
+        b = self._buckets.get(model)
+        if b is None:
+            rate = self._rates.get(f"{self.endpoint}:{model}", self._rates.get(self.endpoint, 8.0))
+            b = self._buckets[model] = TokenBucket(rate)
+        return b
+
+    def acquire(self, model: str, prio: int) -> None:
+        me = _Waiter(prio, next(self._seq), model)
+        t0 = time.monotonic()
+        with self._cond:
+            bisect.insort(self._waiters, me)
+            try:
+                while True:
+                    now = time.monotonic()
+                    timeout = None
+                    if self.inflight < max(1, int(self.limit)):
+                        # admit the first waiter (priority order) whose model has a token
+                        for w in self._waiters:
+                            d = self._bucket(w.model).delay(now)
+                            if d == 0.0:
+                                break
+                            if w is me:
+                                timeout = d
+                        else:
+                            w = None
+                        if w is me:
+                            self._bucket(model).take()
+                            self.inflight += 1
+                            self.counts["admitted"] += 1
+                            self._wait_total += now - t0
+                            return
+                        if w is not None:
+                            self._cond.notify_all()   # someone else can go now
+                    self._cond.wait(timeout)
+            finally:
+                self._waiters.remove(me)
+
+    def release(self, model: str, ok: bool, overload: bool = False, retry_after: Optional[float] = None) -> None:
+        with self._cond:
+            self.inflight -= 1
+            now = time.monotonic()
+            if overload:
+                self.counts["throttled" if retry_after is not None else "errors"] += 1
+                if retry_after is not None:
+                    self._bucket(model).pause(retry_after)
+                if now - self._last_decrease >= WATSONX_AIMD_COOLDOWN_S:
+                    old = self.limit
+                    self.limit = max(float(WATSONX_CONCURRENCY_MIN), self.limit / 2.0)
+                    self._last_decrease = now
+                    self.counts["decreases"] += 1
+                    print(f"[watsonx] {self.endpoint}: concurrency limit {old:.1f} -> {self.limit:.1f}")
+            elif ok:
+                self.counts["ok"] += 1
+                self.limit = min(float(WATSONX_CONCURRENCY_MAX), self.limit + 1.0 / self.limit)
+            self._cond.notify_all()
+
+    def record_latency(self, model: str, seconds: float) -> None:
+        with self._cond:
+            self._latency.setdefault(model, deque(maxlen=512)).append(seconds)
+
+    def hedge_delay(self, model: str) -> Optional[float]:
+        """Seconds to wait before hedging a call to `model`; None without enough history or budget."""
+        with self._cond:
+            lat = self._latency.get(model)
+            if not lat or len(lat) < WATSONX_HEDGE_MIN_SAMPLES:
+                return None
+            if self.counts["hedges"] >= WATSONX_HEDGE_BUDGET * self.counts["admitted"] + 1:
+                return None
+            p = float(np.percentile(np.asarray(lat), WATSONX_HEDGE_PERCENTILE))
+        return max(p, WATSONX_HEDGE_MIN_DELAY_MS / 1000.0)
+
+    def count(self, key: str) -> None:
+        with self._cond:
+            self.counts[key] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            now = time.monotonic()
+            latency = {}
+            for m, lat in self._latency.items():
+                a = np.asarray(lat) * 1000.0
+                latency[m or "-"] = {"n": len(a), "p50": round(float(np.percentile(a, 50)), 1),
+                                     "p95": round(float(np.percentile(a, 95)), 1),
+                                     "p99": round(float(np.percentile(a, 99)), 1)}
+            queued: Dict[str, int] = {}
+            for w in self._waiters:
+                name = _PRIORITY_NAMES.get(w.key[0], str(w.key[0]))
+                queued[name] = queued.get(name, 0) + 1
+            buckets = {}
+            for m, b in self._buckets.items():
+                b.delay(now)   # refill
+                buckets[m or "-"] = {"rate": b.rate, "tokens": round(b.tokens, 2),
+                                     "paused_s": round(max(0.0, b.paused_until - now), 2)}
+            admitted = self.counts["admitted"]
+            return {
+                "limit": round(self.limit, 2),
+                "inflight": self.inflight,
+                "queued": queued,
+                **self.counts,
+                "mean_wait_ms": round(1000.0 * self._wait_total / admitted, 1) if admitted else 0.0,
+                "buckets": buckets,
+                "latency_ms": latency,
+                "breaker": self.breaker.stats(),
+            }
+
+
+class Governor:
+    """Process-wide outbound traffic governor: one `_Lane` per watsonx endpoint."""
+
+    def __init__(self, rate_limits: str = WATSONX_RATE_LIMITS):
+        self._rates = _parse_rate_limits(rate_limits)
+        self._lanes: Dict[str, _Lane] = {}
+        self._lock = threading.Lock()
+
+    def lane(self, endpoint: str) -> _Lane:
+        with self._lock:
+            if endpoint not in self._lanes:
+                self._lanes[endpoint] = _Lane(endpoint, self._rates)
+            return self._lanes[endpoint]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lanes = dict(self._lanes)
+        return {name: lane.stats() for name, lane in lanes.items()}
+
+
+governor = Governor()
+
+
+def _retry_after(r: requests.Response) -> Optional[float]:
+    try:
+        return max(0.0, float(r.headers.get("Retry-After", "")))
+    except ValueError:
+        return None
+
+
+def _send(endpoint: str, body: dict, timeout: float) -> requests.Response:
+    # record / replay / passthrough, see app/core/transport.py
+    return transport.send(endpoint, body, timeout, _http_send)
+
+
+def _http_send(endpoint: str, body: dict, timeout: float) -> requests.Response:
+    headers = {
+        "Authorization": f"Bearer {get_ibm_iam_token()}",
+        "Accept": "application/json",
+        "Content-Type": "application/json",
+    }
+    return requests.post(url(endpoint), headers=headers, json=body, timeout=timeout)
+
+
+_observers: list = []
+
+
+def add_observer(fn: Callable[[str, str, bool, float, Optional[str]], None]) -> None:
+    """Call `fn(endpoint, model, ok, seconds, error)` after every request attempt (see app/core/health.py)."""
+    _observers.append(fn)
+
+
+def _notify(endpoint: str, model: str, ok: bool, seconds: float, error: Optional[str] = None) -> None:
+    for fn in _observers:
+        try:
+            fn(endpoint, model, ok, seconds, error)
+        except Exception as e:
+            print(f"[watsonx] observer failed: {e}")
+
+
+def _idempotent(endpoint: str, body: dict) -> bool:
+    if endpoint != "generation":
+        return True
+    return (body.get("parameters") or {}).get("decoding_method", "greedy") == "greedy"
+
+
+def _attempt(lane: _Lane, endpoint: str, model: str, body: dict, timeout: float, prio: int) -> requests.Response:
+    """One governed request: breaker check, admission, send, release + bookkeeping."""
+    lane.breaker.before()
+    lane.acquire(model, prio)
+    t0 = time.monotonic()
+    try:
+        r = _send(endpoint, body, timeout)
+    except CassetteMiss:
+        lane.release(model, ok=False)   # nothing was sent: neither a success nor an overload
+        lane.breaker.abort()
+        raise
+    except (requests.Timeout, requests.ConnectionError) as e:
+        lane.release(model, ok=False, overload=True)
+        lane.breaker.failure()
+        _notify(endpoint, model, False, time.monotonic() - t0, type(e).__name__)
+        raise
+    except Exception as e:
+        lane.release(model, ok=False)
+        lane.breaker.failure()   # e.g. no IAM token: the endpoint is unusable either way
+        _notify(endpoint, model, False, time.monotonic() - t0, type(e).__name__)
+        raise
+    # throttling isn't ill health; other 4xx (unknown model, bad key) are
+    ok = r.status_code < 400 or r.status_code == 429
+    _notify(endpoint, model, ok, time.monotonic() - t0, None if ok else f"HTTP {r.status_code}")
+    if r.status_code == 429:
+        ra = _retry_after(r)
+        lane.release(model, ok=False, overload=True, retry_after=ra if ra is not None else WATSONX_BACKOFF_S)
+        lane.breaker.success()   # throttled, not down: pacing is the governor's job
+    elif r.status_code in RETRY_STATUS:
+        lane.release(model, ok=False, overload=True)
+        lane.breaker.failure()
+    else:
+        lane.release(model, ok=r.ok)
+        lane.breaker.success()   # any non-5xx answer means the service is up
+        if r.ok:
+            lane.record_latency(model, time.monotonic() - t0)
+    return r
+
+
+_hedge_pool = ThreadPoolExecutor(max_workers=64, thread_name_prefix="watsonx-hedge")
+
+
+def _hedged(lane: _Lane, endpoint: str, model: str, body: dict, timeout: float, prio: int) -> requests.Response:
+    """`_attempt`, plus a duplicate once the call outlives the endpoint's hedge percentile."""
+    delay = lane.hedge_delay(model)
+    if delay is None:
+        return _attempt(lane, endpoint, model, body, timeout, prio)
+    primary = _hedge_pool.submit(copy_context().run, _attempt, lane, endpoint, model, body, timeout, prio)
+    try:
+        return primary.result(timeout=delay)
+    except FutureTimeout:
+        pass
+    if lane.hedge_delay(model) is None:   # budget used up meanwhile
+        return primary.result()
+    lane.count("hedges")
+    hedge = _hedge_pool.submit(copy_context().run, _attempt, lane, endpoint, model, body, timeout, prio)
+    pending = {primary, hedge}
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for f in done:
+            if f.exception() is None and f.result().status_code not in RETRY_STATUS:
+                if f is hedge:
+                    lane.count("hedge_wins")
+                return f.result()
+    return primary.result()   # neither succeeded: report the original call's outcome
+
+
+def post(endpoint: str, body: dict, *, timeout: float = 90, retries: int = WATSONX_RETRIES,
+         hedge: Optional[bool] = None) -> dict:
+    """
+    POST `body` to a watsonx text endpoint through the governor and return the
+    JSON response. Raises CircuitOpenError at once while the endpoint's
+    breaker is open, else requests.HTTPError (or the transport error) once
+    retries are exhausted. `hedge` defaults to WATSONX_HEDGE for idempotent calls.
+    """
+    model = body.get("model_id", "")
+    lane = governor.lane(endpoint)
+    prio = PRIORITIES.get(_priority.get(), 0)
+    if hedge is None:
+        hedge = WATSONX_HEDGE and _idempotent(endpoint, body)
+    exchange = _hedged if hedge else _attempt
+    retries = max(1, retries)
+    for attempt in range(retries):
+        last = attempt == retries - 1
+        wait_s = WATSONX_BACKOFF_S * (2 ** attempt) * random.uniform(0.5, 1.0)
+        try:
+            r = exchange(lane, endpoint, model, body, timeout, prio)
+        except (CircuitOpenError, CassetteMiss):
+            raise
+        except (requests.Timeout, requests.ConnectionError):
+            if last:
+                raise
+            time.sleep(wait_s)
+            continue
+        if r.status_code in RETRY_STATUS:
+            if last:
+                r.raise_for_status()
+            if r.status_code != 429:
+                time.sleep(wait_s)   # 429s wait on the paused bucket instead
+            continue
+        r.raise_for_status()
+        return r.json()
+    raise RuntimeError("unreachable")
+
+
+def generated_text(data: dict) -> str:
+    """Text of a /text/generation response."""
+    results = data.get("results") or []
+    if results and isinstance(results, list):
+        return (results[0].get("generated_text") or results[0].get("output_text") or "").strip()
+    return (data.get("generated_text") or "").strip()
+
+
+def stats() -> Dict[str, Any]:
+    return governor.stats()
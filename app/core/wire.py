@@ -0,0 +1,106 @@
+# app/core/wire.py
+"""
+Compact CallReport wire/storage format and fast response encoding.
+
+A CallReport repeats whole Evidence objects in `evidence` and in every
+`evidence_by_claim` list, so the same snippets show up many times on long
+calls. The compact form keeps each distinct evidence item once:
+
+    {
+      "format": "compact/1",
+      "evidence_table": [{"doc_id", "source", "snippet", "metadata"}, ...],
+      "evidence": [[row, score], ...],
+      "evidence_by_claim": {"<claim_id>": [[row, score], ...]},
+      ... every other CallReport field unchanged ...
+    }
+
+Scores stay with the reference because they depend on the claim, so
+`expand_report(compact_report(r)) == r`. `dumps` uses orjson when it is
+installed (falling back to the json module), and `encode_body` applies gzip
+or brotli according to the client's Accept-Encoding header. brotli is used
+only if the `brotli` package is installed.
+"""
+from __future__ import annotations
+import gzip, json
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import orjson
+except ImportError:   # optional: faster encoder
+    orjson = None
+try:
+    import brotli
+except ImportError:   # optional: "br" content-encoding
+    brotli = None
+
+from app.schemas.evidence import Evidence
+from app.schemas.report import CallReport
+from app.core.config import WIRE_COMPRESS_MIN_BYTES, WIRE_GZIP_LEVEL, WIRE_BROTLI_QUALITY
+
+COMPACT_FORMAT = "compact/1"
+COMPACT_MEDIA_TYPE = "application/vnd.claimcheck.compact+json"
+
+
+def compact_report(report: CallReport) -> Dict[str, Any]:
+    out = report.model_dump(exclude={"evidence", "evidence_by_claim"})
+    table: List[Dict[str, Any]] = []
+    rows: Dict[Tuple[str, str], List[int]] = {}   # (doc_id, snippet) -> candidate rows
+
+    def ref(e: Evidence) -> list:
+        cands = rows.setdefault((e.doc_id, e.snippet), [])
+        for row in cands:
+            t = table[row]
+            if t["source"] == e.source and t["metadata"] == e.metadata:
+                return [row, e.score]
+        cands.append(len(table))
+        table.append(e.model_dump(exclude={"score"}))
+        return [len(table) - 1, e.score]
+
+    out["format"] = COMPACT_FORMAT
+    out["evidence_by_claim"] = {cid: [ref(e) for e in evs] for cid, evs in report.evidence_by_claim.items()}
+    out["evidence"] = [ref(e) for e in report.evidence]
+    out["evidence_table"] = table
+    return out
+
+
+def expand_report(data: Dict[str, Any]) -> CallReport:
+    """Inverse of compact_report; plain (non-compact) report dicts pass through."""
+    if data.get("format") != COMPACT_FORMAT:
+        return CallReport.model_validate(data)
+    data = dict(data)
+    table = data.pop("evidence_table")
+    data.pop("format")
+
+    def ev(r: list) -> Dict[str, Any]:
+        return {**table[r[0]], "score": r[1]}
+
+    data["evidence"] = [ev(r) for r in data.get("evidence", [])]
+    data["evidence_by_claim"] = {cid: [ev(r) for r in refs] for cid, refs in data.get("evidence_by_claim", {}).items()}
+    return CallReport.model_validate(data)
+
+
+def dumps(obj: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS, default=str)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+
+
+def _accepts(accept_encoding: Optional[str]) -> List[str]:
+    out = []
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.strip().partition(";")
+        if name and params.replace(" ", "") not in ("q=0", "q=0.0"):
+            out.append(name.lower())
+    return out
+
+
+def encode_body(body: bytes, accept_encoding: Optional[str]) -> Tuple[bytes, Optional[str]]:
+    """Compress `body` for the client: (bytes, Content-Encoding or None)."""
+    if len(body) < WIRE_COMPRESS_MIN_BYTES:
+        return body, None
+    accepted = _accepts(accept_encoding)
+    if brotli is not None and "br" in accepted:
+        return brotli.compress(body, quality=WIRE_BROTLI_QUALITY), "br"
+    if "gzip" in accepted:
+        return gzip.compress(body, compresslevel=WIRE_GZIP_LEVEL), "gzip"
+    return body, None
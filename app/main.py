@@ -1,11 +1,26 @@
 # app/main.py
-import os
-from fastapi import FastAPI
-from fastapi import Body
-from fastapi import UploadFile, File
+import asyncio, json, threading
+from typing import Optional
+from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
+from fastapi import Body, Header, Query, BackgroundTasks
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+from fastapi import UploadFile, File, Form
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.orchestrator import process_call
-from app.core.ibm_sanity import sanity_embeddings, sanity_generation
+from app.core.scheduler import Cancelled
+from app.core import profiler, watsonx
+from app.core.config import HEALTH_PROBE
+from app.core.health import monitor
+from app.core.transport import transport
+from app.core.live import LiveSession
+from app.agents.retriever import rerank_stats, batching_stats, kb_registry
+from app.core.kb_registry import UnknownKBError
+from app.core.kb_store import KBStore, list_tenants
+from app.core.verdict_cache import verdict_cache
+from app.core.report_store import report_store
+from app.core.wire import COMPACT_MEDIA_TYPE, compact_report, dumps, encode_body
+from app.core.reverify import reverify_report, reverify_all
 
 app = FastAPI(title="ClaimCheck")
 
@@ -20,30 +35,331 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+def start_health_monitor():
+    if HEALTH_PROBE:
+        monitor.start()
+
 @app.get("/health")
 def health():
     return {"status": "ok", "service": "ClaimCheck"}
 
 @app.get("/health/ibm")
 def health_ibm():
-    emb = sanity_embeddings()
-    claim = sanity_generation(os.getenv("IBM_CLAIM_MODEL_ID",""), "Say OK")
-    verify = sanity_generation(os.getenv("IBM_VERIFIER_MODEL_ID",""), "Say OK")
-    return {"embeddings": emb, "claim_gen": claim, "verify_gen": verify}
+    """Cached state from the background monitor; never calls watsonx itself."""
+    snap = monitor.snapshot()
+    probes = snap["probes"]
+    # keep the per-probe keys older clients read
+    return {**snap, "embeddings": probes.get("embeddings"), "claim_gen": probes.get("claim_gen"),
+            "verify_gen": probes.get("verify_gen")}
+
+@app.get("/metrics")
+def metrics():
+    return {"watsonx": watsonx.stats(), "rerank": rerank_stats(), "batching": batching_stats(),
+            "verdict_cache": verdict_cache.stats(), "kb": kb_registry.stats(), "transport": transport.stats()}
+
+@app.get("/kbs")
+def kbs():
+    loaded = kb_registry.stats()["tenants"]
+    return [{"kb": name, "version": KBStore.for_tenant(name).current(), "loaded": name in loaded}
+            for name in list_tenants()]
+
+
+def _check_kb(kb: Optional[str]) -> Optional[str]:
+    """Validate the requested KB before any work is done on the call."""
+    try:
+        kb_registry.store(kb)
+    except UnknownKBError:
+        raise HTTPException(status_code=404, detail=f"unknown KB {kb!r}")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return kb
+
+
+def _check_priority(priority: Optional[str]) -> str:
+    """X-Priority header: "interactive" (default, UI traffic) or "batch" (backfill)."""
+    priority = (priority or "interactive").lower()
+    if priority not in watsonx.PRIORITIES:
+        raise HTTPException(status_code=400, detail=f"unknown priority {priority!r}")
+    return priority
+
+
+def _report_format(fmt: Optional[str], accept: Optional[str]) -> str:
+    """?format=full|compact, or Accept: application/vnd.claimcheck.compact+json."""
+    fmt = (fmt or ("compact" if COMPACT_MEDIA_TYPE in (accept or "") else "full")).lower()
+    if fmt not in ("full", "compact"):
+        raise HTTPException(status_code=400, detail=f"unknown report format {fmt!r}")
+    return fmt
+
+
+def _report_response(report, fmt: str, accept_encoding: Optional[str]) -> Response:
+    """Encode a CallReport (compact = evidence deduped into a table, app/core/wire.py); gzip/br per Accept-Encoding."""
+    body = dumps(compact_report(report)) if fmt == "compact" else report.model_dump_json().encode("utf-8")
+    body, encoding = encode_body(body, accept_encoding)
+    headers = {"Vary": "Accept, Accept-Encoding"}
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(body, media_type=COMPACT_MEDIA_TYPE if fmt == "compact" else "application/json",
+                    headers=headers)
+
+
+STREAM_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "sse": "text/event-stream"}
+
+
+def _stream_format(stream: Optional[str], accept: Optional[str]) -> Optional[str]:
+    """?stream=ndjson|sse, or an Accept header asking for one of them; None = plain JSON report."""
+    if stream:
+        stream = stream.lower()
+        if stream not in STREAM_MEDIA_TYPES:
+            raise HTTPException(status_code=400, detail=f"unknown stream format {stream!r}")
+        return stream
+    for fmt, media in STREAM_MEDIA_TYPES.items():
+        if media in (accept or ""):
+            return fmt
+    return None
+
+
+def _profiled(prof, report) -> None:
+    """Link a request profile to the report it produced (app/core/profiler.py)."""
+    if prof is not None:
+        prof.meta.update(report_id=report.report_id, kb_version=report.kb_version,
+                         total_ms=report.timings.get("total_ms"),
+                         critical_path=report.timings.get("critical_path", []))
+
+
+def _stream_call(fmt: str, priority: str, profile_id: Optional[str] = None, **kwargs) -> StreamingResponse:
+    """
+    Run process_call in a worker thread and stream its progress events
+    (segment, claim, evidence, verdict, summary), then {"type": "report"}
+    with the full CallReport, or {"type": "error"} if the call failed.
+    If the client goes away, the next event the call emits raises Cancelled,
+    which stops the call instead of finishing it for nobody.
+    """
+    name = "process-audio" if kwargs.get("audio_path") else "process-transcript"
+    async def _body():
+        loop = asyncio.get_running_loop()
+        events: asyncio.Queue = asyncio.Queue()
+        gone = threading.Event()
+        push = lambda ev: loop.call_soon_threadsafe(events.put_nowait, ev)
+
+        def put(ev):
+            if gone.is_set():
+                raise Cancelled("client disconnected")
+            push(ev)
+
+        def _run():
+            try:
+                with watsonx.priority(priority), profiler.profile(profile_id, name, stream=fmt) as prof:
+                    report = process_call(on_event=put, **kwargs)
+                    _profiled(prof, report)
+                push({"type": "report", "report": report.model_dump()})
+            except Cancelled:
+                print("[main] streamed call cancelled: client disconnected")
+            except Exception as e:
+                print(f"[main] streamed call failed: {e}")
+                push({"type": "error", "detail": f"{type(e).__name__}: {e}"[:300]})
+            finally:
+                push(None)
+
+        worker = loop.run_in_executor(None, _run)
+        try:
+            while (ev := await events.get()) is not None:
+                data = json.dumps(ev, ensure_ascii=False, default=str)
+                yield f"event: {ev['type']}\ndata: {data}\n\n" if fmt == "sse" else data + "\n"
+            await worker
+        finally:
+            gone.set()   # no-op after a normal finish; on disconnect it stops _run
+
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    if profile_id:
+        headers["X-Profile-Id"] = profile_id
+    return StreamingResponse(_body(), media_type=STREAM_MEDIA_TYPES[fmt], headers=headers)
+
+
+def _call_response(name: str, priority: str, profile_id: Optional[str], report_fmt: str,
+                   accept_encoding: Optional[str], **kwargs) -> Response:
+    """Run process_call(**kwargs) to the end and encode its report (blocking; call from a worker thread)."""
+    with watsonx.priority(priority), profiler.profile(profile_id, name, kb=kwargs.get("kb_id") or "") as prof:
+        report = process_call(**kwargs)
+        _profiled(prof, report)
+    resp = _report_response(report, report_fmt, accept_encoding)
+    if profile_id:
+        resp.headers["X-Profile-Id"] = profile_id
+    return resp
 
 
 @app.post("/process-transcript")
-def process_transcript(text: str = Body(..., embed=True)):
+def process_transcript(text: str = Body(..., embed=True), kb: Optional[str] = Body(None, embed=True),
+                       x_priority: Optional[str] = Header(None), stream: Optional[str] = Query(None),
+                       report_format: Optional[str] = Query(None, alias="format"),
+                       accept: Optional[str] = Header(None), accept_encoding: Optional[str] = Header(None),
+                       x_profile: Optional[str] = Header(None)):
     """
     Accepts raw transcript text and returns a CallReport JSON.
-    For now, the orchestrator returns a dummy report (no AI).
+    `kb` selects the tenant knowledge base (default KB if omitted); the
+    X-Priority header ranks its watsonx calls against other traffic.
+    With ?stream=ndjson|sse (or a matching Accept header) partial results
+    are streamed as they are produced instead (see _stream_call), and
+    ?format=compact returns the compact report (see _report_response).
+    `X-Profile: 1` profiles the call; the response's X-Profile-Id header
+    names the stored profile (GET /profiles/{id}).
     """
-    report = process_call(transcript=text)
-    return report
+    kb = _check_kb(kb)
+    priority = _check_priority(x_priority)
+    fmt = _stream_format(stream, accept)
+    profile_id = profiler.wanted(x_profile)
+    if fmt:
+        return _stream_call(fmt, priority, profile_id, transcript=text, kb_id=kb)
+    return _call_response("process-transcript", priority, profile_id, _report_format(report_format, accept),
+                          accept_encoding, transcript=text, kb_id=kb)
 
 @app.post("/process-audio")
-async def process_audio(file: UploadFile = File(...)):
+async def process_audio(file: UploadFile = File(...), kb: Optional[str] = Form(None),
+                        x_priority: Optional[str] = Header(None), stream: Optional[str] = Query(None),
+                        report_format: Optional[str] = Query(None, alias="format"),
+                        accept: Optional[str] = Header(None), accept_encoding: Optional[str] = Header(None),
+                        x_profile: Optional[str] = Header(None)):
+    kb = _check_kb(kb)
+    priority = _check_priority(x_priority)
+    fmt = _stream_format(stream, accept)
+    report_fmt = _report_format(report_format, accept)
+    profile_id = profiler.wanted(x_profile)
     path = f"data/audio/{file.filename}"
+    data = await file.read()
+    await run_in_threadpool(_save_upload, path, data)
+    if fmt:
+        return _stream_call(fmt, priority, profile_id, audio_path=path, kb_id=kb)
+    # ASR plus the whole call graph: keep it off the event loop
+    return await run_in_threadpool(_call_response, "process-audio", priority, profile_id, report_fmt,
+                                   accept_encoding, audio_path=path, kb_id=kb)
+
+
+def _save_upload(path: str, data: bytes) -> None:
     with open(path, "wb") as f:
-        f.write(await file.read())
-    return process_call(audio_path=path)
\ No newline at end of file
+        f.write(data)
+
+
+def _load_report(report_id: str):
+    try:
+        return report_store.load(report_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"unknown report {report_id!r}")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/reports")
+def reports(kb: Optional[str] = None):
+    return report_store.list(kb=kb)
+
+@app.get("/reports/{report_id}")
+def get_report(report_id: str, report_format: Optional[str] = Query(None, alias="format"),
+               accept: Optional[str] = Header(None), accept_encoding: Optional[str] = Header(None)):
+    fmt = _report_format(report_format, accept)
+    report, _ = _load_report(report_id)
+    return _report_response(report, fmt, accept_encoding)
+
+@app.post("/reports/{report_id}/reverify")
+def reverify(report_id: str, force: bool = False, resummarize: bool = False):
+    """Re-check one stored report against its KB's current snapshot; only changed claims hit the verifier."""
+    _load_report(report_id)
+    with watsonx.priority("batch"):
+        try:
+            return reverify_report(report_id, force=force, resummarize=resummarize)
+        except RuntimeError as e:
+            raise HTTPException(status_code=503, detail=str(e))
+
+@app.post("/reports/reverify")
+def reverify_reports(background: BackgroundTasks, kb: Optional[str] = Body(None, embed=True)):
+    """Queue re-verification of every stored report (of `kb`), e.g. right after a KB publish."""
+    ids = report_store.list(kb=kb)
+
+    def _run():
+        with watsonx.priority("background"):
+            reverify_all(kb=kb)
+
+    background.add_task(_run)
+    return {"queued": len(ids)}
+
+
+@app.get("/profiles")
+def profiles():
+    return profiler.list_profiles()
+
+@app.get("/profiles/{profile_id}")
+def get_profile(profile_id: str):
+    """Profile metadata: wall time, sample count, every outbound watsonx call, critical path."""
+    try:
+        return profiler.load(profile_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"unknown profile {profile_id!r}")
+
+@app.get("/profiles/{profile_id}/folded", response_class=PlainTextResponse)
+def get_profile_folded(profile_id: str):
+    """Folded stacks ("a;b;c <count>") for flamegraph.pl / speedscope / inferno."""
+    try:
+        return profiler.load_folded(profile_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"unknown profile {profile_id!r}")
+
+
+@app.websocket("/live")
+async def live_call(ws: WebSocket, kb: Optional[str] = None, sample_rate: int = 16000, encoding: str = "s16le"):
+    """
+    Live call: binary frames carry raw mono PCM (`encoding` s16le or f32le at
+    `sample_rate`); the text frame "stop" (or {"type": "stop"}) ends the call.
+    Segments, claims and verdicts are sent back as JSON as soon as they exist,
+    then {"type": "report"} with the full CallReport. See app/core/live.py.
+    """
+    try:
+        kb = _check_kb(kb)
+    except HTTPException as e:
+        await ws.close(code=1008, reason=str(e.detail))
+        return
+    await ws.accept()
+    loop = asyncio.get_running_loop()
+    events: asyncio.Queue = asyncio.Queue()
+    try:
+        # the constructor may load the KB index: keep it off the event loop
+        session = await run_in_threadpool(LiveSession, lambda ev: loop.call_soon_threadsafe(events.put_nowait, ev),
+                                          kb_id=kb, sample_rate=sample_rate, encoding=encoding)
+    except ValueError as e:
+        await ws.close(code=1003, reason=str(e))
+        return
+
+    async def _send():
+        while (ev := await events.get()) is not None:
+            await ws.send_json(ev)
+
+    sender = asyncio.create_task(_send())
+    try:
+        while True:
+            msg = await ws.receive()
+            if msg["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(msg.get("code", 1000))
+            if msg.get("bytes"):
+                session.feed(msg["bytes"])
+            elif msg.get("text") is not None and _is_stop(msg["text"]):
+                break
+        report = await run_in_threadpool(session.finish)
+        events.put_nowait({"type": "report", "report": report.model_dump()})
+        events.put_nowait(None)
+        await sender
+        await ws.close()
+    except WebSocketDisconnect:
+        session.cancel()
+        sender.cancel()
+    except Exception:
+        session.cancel()
+        sender.cancel()
+        raise
+
+
+def _is_stop(text: str) -> bool:
+    text = text.strip()
+    if text == "stop":
+        return True
+    try:
+        msg = json.loads(text)
+    except ValueError:
+        return False
+    return isinstance(msg, dict) and msg.get("type") == "stop"
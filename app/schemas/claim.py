@@ -7,3 +7,4 @@ class Claim(BaseModel):
     segment_idx: Optional[int] = None
     entities: List[str] = []
     confidence: float = 0.0
+    duplicate_of: Optional[str] = None   # id of the representative claim when collapsed as a near-duplicate
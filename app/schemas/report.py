@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List, Dict
+from typing import List, Dict, Any
 from .claim import Claim
 from .evidence import Evidence
 from .verdict import Verdict
@@ -12,3 +12,7 @@ class CallReport(BaseModel):
 	verdicts: List[Verdict]
 	evidence: List[Evidence]
 	evidence_by_claim: Dict[str, List[Evidence]] = {}
+	timings: Dict[str, Any] = {}   # scheduler node timings + critical path
+	kb_id: str = ""                  # tenant KB the call was checked against
+	kb_version: str = ""             # KB snapshot the claims were verified against
+	report_id: str = ""              # id in the report store (app/core/report_store.py), if saved
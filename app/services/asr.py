@@ -1,4 +1,5 @@
-from typing import List, Dict
+from typing import List, Dict, Iterator, Optional
+import numpy as np
 from faster_whisper import WhisperModel
 import os
 
@@ -13,10 +14,10 @@ _whisper = WhisperModel(
     compute_type=WHISPER_COMPUTE_TYPE
 )
 
-def transcribe(audio_path: str) -> List[Dict]:
+def iter_transcribe(audio_path: str) -> Iterator[Dict]:
     """
-    Transcribe an audio file using faster-whisper and return our standard
-    list of segments: [{start, end, speaker, text}].
+    Lazily yield segments [{start, end, speaker, text}] as faster-whisper
+    decodes them, so downstream stages can start before the whole file is done.
     """
     # beam_size=1 is fastest; raise for a bit more accuracy.
     segments, info = _whisper.transcribe(
@@ -26,14 +27,45 @@ def transcribe(audio_path: str) -> List[Dict]:
         beam_size=1
     )
 
-    out = []
     for seg in segments:
-        out.append({
+        yield {
             "start": float(seg.start),
             "end": float(seg.end),
             "speaker": "A",    # no diarization here; we can add later
             "text": seg.text.strip()
-        })
+        }
+
+def transcribe_array(audio: np.ndarray, offset: float = 0.0, prompt: Optional[str] = None) -> List[Dict]:
+    """
+    Transcribe an in-memory 16 kHz mono float32 buffer (live calls). Segment
+    times are shifted by `offset` seconds so they line up with the whole call;
+    `prompt` (recent transcript) keeps wording consistent across buffers.
+    """
+    segments, info = _whisper.transcribe(
+        audio,
+        language="en",
+        vad_filter=True,
+        beam_size=1,
+        initial_prompt=prompt or None,
+        condition_on_previous_text=False,
+    )
+    return [
+        {
+            "start": offset + float(seg.start),
+            "end": offset + float(seg.end),
+            "speaker": "A",
+            "text": seg.text.strip(),
+        }
+        for seg in segments
+        if seg.text.strip()
+    ]
+
+def transcribe(audio_path: str) -> List[Dict]:
+    """
+    Transcribe an audio file using faster-whisper and return our standard
+    list of segments: [{start, end, speaker, text}].
+    """
+    out = list(iter_transcribe(audio_path))
 
     # If there were no segments (edge case), return a single empty segment
     if not out:
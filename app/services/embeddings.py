@@ -0,0 +1,222 @@
+# app/services/embeddings.py
+from __future__ import annotations
+import abc, threading
+from typing import Dict, List
+
+import numpy as np
+
+from app.core import health, watsonx
+from app.core.config import (
+    WATSONX_BASE_URL,
+    WATSONX_PROJECT,
+    WATSONX_API_KEY,
+    IBM_EMBEDDINGS_MODEL_ID,
+    EMBED_BACKEND,
+    EMBED_LOCAL_BACKEND,
+    EMBED_LOCAL_MODEL,
+    EMBED_ONNX_FILE,
+    EMBED_BATCH_SIZE,
+    EMBED_THREADS,
+)
+
+
+def _normalize(vecs: np.ndarray) -> np.ndarray:
+    vecs = np.asarray(vecs, dtype=np.float32)
+    vecs /= (np.linalg.norm(vecs, axis=1, keepdims=True) + 1e-12)
+    return vecs
+
+
+class EmbeddingBackend(abc.ABC):
+    """
+    Turns texts into L2-normalized float32 vectors (cosine == inner product).
+    `name` + `model_id` identify the vector space; the KB index manifest records
+    them so queries are always embedded by the backend that built the index.
+    """
+    name = "base"
+    model_id = ""
+
+    def __init__(self, batch_size: int = EMBED_BATCH_SIZE):
+        self.batch_size = max(1, batch_size)
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        parts = [self._embed_batch(texts[i:i + self.batch_size])
+                 for i in range(0, len(texts), self.batch_size)]
+        return _normalize(np.vstack(parts))
+
+    @abc.abstractmethod
+    def _embed_batch(self, texts: List[str]) -> np.ndarray:
+        """Raw (unnormalized) vectors for at most `batch_size` texts, one row per text."""
+
+    def describe(self) -> Dict[str, str]:
+        return {"backend": self.name, "model": self.model_id}
+
+
+class IBMEmbeddingBackend(EmbeddingBackend):
+    """watsonx.ai /text/embeddings."""
+    name = "ibm"
+
+    def __init__(self, batch_size: int = EMBED_BATCH_SIZE):
+        super().__init__(batch_size)
+        self.model_id = IBM_EMBEDDINGS_MODEL_ID
+
+    @staticmethod
+    def available() -> bool:
+        # use IBM only if all pieces exist
+        return bool(WATSONX_BASE_URL and WATSONX_PROJECT and WATSONX_API_KEY and IBM_EMBEDDINGS_MODEL_ID)
+
+    def _embed_batch(self, texts: List[str]) -> np.ndarray:
+        payload = {
+            "inputs": texts,                  # NOTE: plural
+            "model_id": self.model_id,
+            "project_id": WATSONX_PROJECT
+        }
+        j = watsonx.post("embeddings", payload, timeout=60)
+
+        # Accept either "data": [{"embedding": [...]}, ...]  OR
+        # "results": [{"embedding": [...]}, ...]
+        items = None
+        if isinstance(j, dict):
+            if "data" in j:
+                items = j["data"]
+            elif "results" in j:
+                items = j["results"]
+
+        if not items or not isinstance(items, list):
+            # Print full response once to help diagnose, then fall back
+            print(f"[embeddings] Unexpected embeddings schema: {j}")
+            raise RuntimeError("Embeddings response missing 'data'/'results'")
+
+        vecs = np.asarray([it.get("embedding") for it in items], dtype=np.float32)
+        if vecs.ndim != 2:
+            print(f"[embeddings] Bad embedding shapes: {vecs.shape}")
+            raise RuntimeError("Embeddings returned with wrong dimensionality")
+        return vecs
+
+
+class SentenceTransformerBackend(EmbeddingBackend):
+    """PyTorch sentence-transformers model (the original local fallback)."""
+    name = "st"
+
+    def __init__(self, model_id: str = EMBED_LOCAL_MODEL, batch_size: int = EMBED_BATCH_SIZE,
+                 threads: int = EMBED_THREADS):
+        super().__init__(batch_size)
+        self.model_id = model_id
+        self.threads = threads
+        self._model = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        with self._lock:
+            if self._model is None:
+                import torch
+                from sentence_transformers import SentenceTransformer
+                if self.threads > 0:
+                    torch.set_num_threads(self.threads)
+                self._model = SentenceTransformer(self.model_id, device="cpu")
+        return self._model
+
+    def _embed_batch(self, texts: List[str]) -> np.ndarray:
+        return self._load().encode(texts, batch_size=self.batch_size, normalize_embeddings=True)
+
+
+class OnnxBackend(EmbeddingBackend):
+    """
+    int8-quantized ONNX export of the same MiniLM model on onnxruntime (CPU).
+    Same vector space as the "st" backend at a fraction of the load time/RSS;
+    pulls the quantized graph + tokenizer from the model's HF repo.
+    """
+    name = "onnx"
+    max_length = 256
+
+    def __init__(self, model_id: str = EMBED_LOCAL_MODEL, onnx_file: str = EMBED_ONNX_FILE,
+                 batch_size: int = EMBED_BATCH_SIZE, threads: int = EMBED_THREADS):
+        super().__init__(batch_size)
+        self.model_id = model_id
+        self.onnx_file = onnx_file
+        self.threads = threads
+        self._session = None
+        self._tokenizer = None
+        self._lock = threading.Lock()
+
+    def _repo(self) -> str:
+        return self.model_id if "/" in self.model_id else f"sentence-transformers/{self.model_id}"
+
+    def _load(self):
+        with self._lock:
+            if self._session is None:
+                import onnxruntime as ort
+                from huggingface_hub import hf_hub_download
+                from tokenizers import Tokenizer
+
+                tok = Tokenizer.from_file(hf_hub_download(self._repo(), "tokenizer.json"))
+                tok.enable_truncation(max_length=self.max_length)
+                tok.enable_padding()
+                opts = ort.SessionOptions()
+                if self.threads > 0:
+                    opts.intra_op_num_threads = self.threads
+                    opts.inter_op_num_threads = 1
+                opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+                self._session = ort.InferenceSession(
+                    hf_hub_download(self._repo(), self.onnx_file), opts,
+                    providers=["CPUExecutionProvider"])
+                self._tokenizer = tok
+        return self._session, self._tokenizer
+
+    def _embed_batch(self, texts: List[str]) -> np.ndarray:
+        session, tok = self._load()
+        enc = tok.encode_batch(texts)
+        ids = np.asarray([e.ids for e in enc], dtype=np.int64)
+        mask = np.asarray([e.attention_mask for e in enc], dtype=np.int64)
+        feeds = {"input_ids": ids, "attention_mask": mask}
+        if any(i.name == "token_type_ids" for i in session.get_inputs()):
+            feeds["token_type_ids"] = np.zeros_like(ids)
+        hidden = session.run(None, feeds)[0]                    # (batch, seq, dim)
+        m = mask[..., None].astype(np.float32)
+        return (hidden * m).sum(axis=1) / np.clip(m.sum(axis=1), 1e-9, None)   # mean pooling
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        # batch similar lengths together so padding stays short, then restore order
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        vecs = super().embed([texts[i] for i in order])
+        out = np.empty_like(vecs)
+        out[order] = vecs
+        return out
+
+
+_BACKENDS = {
+    IBMEmbeddingBackend.name: IBMEmbeddingBackend,
+    SentenceTransformerBackend.name: SentenceTransformerBackend,
+    OnnxBackend.name: OnnxBackend,
+}
+_instances: Dict[str, EmbeddingBackend] = {}
+_instances_lock = threading.Lock()
+
+
+def get_backend(name: str) -> EmbeddingBackend:
+    """Shared backend instance by name ("ibm" | "st" | "onnx")."""
+    if name not in _BACKENDS:
+        raise ValueError(f"Unknown embedding backend: {name!r} (expected one of {sorted(_BACKENDS)})")
+    with _instances_lock:
+        if name not in _instances:
+            _instances[name] = _BACKENDS[name]()
+        return _instances[name]
+
+
+def local_backend() -> EmbeddingBackend:
+    return get_backend(EMBED_LOCAL_BACKEND)
+
+
+def default_backend() -> EmbeddingBackend:
+    """
+    EMBED_BACKEND, or for "auto": watsonx when configured and not known to be
+    down (app/core/health.py), else the local backend.
+    """
+    if EMBED_BACKEND != "auto":
+        return get_backend(EMBED_BACKEND)
+    if IBMEmbeddingBackend.available():
+        if health.usable("embeddings", IBM_EMBEDDINGS_MODEL_ID):
+            return get_backend("ibm")
+        print("[embeddings] watsonx embeddings are down; using the local backend")
+    return local_backend()
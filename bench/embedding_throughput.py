@@ -0,0 +1,73 @@
+# bench/embedding_throughput.py
+"""
+Sentences/sec per embedding backend, batch size and thread count.
+
+    python -m bench.embedding_throughput [--backends st,onnx] [--n 2000]
+                                         [--batch-sizes 16,64] [--threads 1,4]
+
+Inputs are the KB snippets cycled up to --n sentences. Model load time is
+reported separately from steady-state throughput. Add "ibm" to --backends to
+include watsonx (network-bound; --threads is ignored for it).
+"""
+import argparse, json, time
+
+from app.services.embeddings import IBMEmbeddingBackend, OnnxBackend, SentenceTransformerBackend
+
+SNIPPETS = "kb/snippets.jsonl"
+
+
+def _sentences(n: int) -> list[str]:
+    with open(SNIPPETS) as f:
+        base = [json.loads(line)["snippet"] for line in f if line.strip()]
+    return [f"{base[i % len(base)]} ({i})" for i in range(n)]
+
+
+def _make(name: str, batch_size: int, threads: int):
+    if name == "st":
+        return SentenceTransformerBackend(batch_size=batch_size, threads=threads)
+    if name == "onnx":
+        return OnnxBackend(batch_size=batch_size, threads=threads)
+    if name == "ibm":
+        return IBMEmbeddingBackend(batch_size=batch_size)
+    raise SystemExit(f"unknown backend {name!r}")
+
+
+def run(name: str, texts: list[str], batch_size: int, threads: int) -> dict:
+    backend = _make(name, batch_size, threads)
+    t0 = time.perf_counter()
+    backend.embed(texts[:2])                    # load model + warm up
+    load_s = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    vecs = backend.embed(texts)
+    elapsed = time.perf_counter() - t0
+    return {
+        "backend": name, "batch": batch_size, "threads": threads if name != "ibm" else "-",
+        "dim": vecs.shape[1], "load_s": round(load_s, 2),
+        "sent_per_s": round(len(texts) / elapsed, 1),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--backends", default="st,onnx")
+    ap.add_argument("--n", type=int, default=2000)
+    ap.add_argument("--batch-sizes", default="16,64")
+    ap.add_argument("--threads", default="1,4")
+    args = ap.parse_args()
+
+    texts = _sentences(args.n)
+    rows = []
+    for name in [b.strip() for b in args.backends.split(",") if b.strip()]:
+        for bs in [int(x) for x in args.batch_sizes.split(",")]:
+            for th in [int(x) for x in args.threads.split(",")]:
+                rows.append(run(name, texts, bs, th))
+                if name == "ibm":
+                    break
+    cols = list(rows[0].keys())
+    print("  ".join(f"{c:>10}" for c in cols))
+    for r in rows:
+        print("  ".join(f"{str(r[c]):>10}" for c in cols))
+
+
+if __name__ == "__main__":
+    main()
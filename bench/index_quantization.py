@@ -0,0 +1,109 @@
+# bench/index_quantization.py
+"""
+Memory vs recall of the KB index storage options (KB_INDEX_DTYPE).
+
+    python -m bench.index_quantization [--k 5] [--synthetic 200000] [--rescore 4]
+
+Uses the float32 embeddings of the published KB snapshot. Queries are the
+bench/retrieval_queries.jsonl texts (embedded with the snapshot's backend)
+plus noisy copies of snippet vectors. `--synthetic N` pads the KB with N
+perturbed snippet vectors so memory and recall are measured at a realistic
+size. Recall@k is overlap with the exact float32 top-k; "+rescore" re-ranks
+k*factor quantized hits with the float32 vectors, as the retriever does.
+Memory is the index's code bytes, projected to --project vectors.
+"""
+import argparse, json, time
+import numpy as np
+
+from app.agents.retriever import current_kb
+from app.core.kb_store import INDEX_DTYPES, index_bytes, make_index
+
+QUERIES = "bench/retrieval_queries.jsonl"
+
+
+def _normalize(x: np.ndarray) -> np.ndarray:
+    return (x / (np.linalg.norm(x, axis=1, keepdims=True) + 1e-12)).astype("float32")
+
+
+def _kb_vectors(kb) -> np.ndarray:
+    if kb.vectors is not None:
+        return np.asarray(kb.vectors, dtype="float32")
+    return kb.index.reconstruct_n(0, kb.index.ntotal)
+
+
+def _queries(kb, base: np.ndarray, n_noisy: int, rng) -> np.ndarray:
+    qs = []
+    try:
+        with open(QUERIES) as f:
+            texts = [json.loads(line)["query"] for line in f if line.strip()]
+        qs.append(kb.query_backend().embed(texts))
+    except Exception as e:
+        print(f"[bench] skipping text queries: {e}")
+    rows = rng.integers(0, len(base), n_noisy)
+    qs.append(_normalize(base[rows] + rng.normal(0, 0.05, (n_noisy, base.shape[1]))))
+    return np.vstack(qs).astype("float32")
+
+
+def _search(index, vecs, q, k, factor):
+    if not factor:
+        return index.search(q, k)[1]
+    _, cand = index.search(q, k * factor)
+    out = np.empty((len(q), k), dtype="int64")
+    for i, rows in enumerate(cand):
+        rows = rows[rows >= 0]
+        exact = vecs[rows] @ q[i]
+        out[i] = rows[np.argsort(-exact)[:k]]
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--k", type=int, default=5)
+    ap.add_argument("--synthetic", type=int, default=0, help="extra perturbed vectors to add")
+    ap.add_argument("--noise", type=float, default=0.15, help="stddev of synthetic perturbation")
+    ap.add_argument("--queries", type=int, default=500, help="noisy snippet-vector queries")
+    ap.add_argument("--rescore", type=int, default=4, help="shortlist factor for +rescore rows")
+    ap.add_argument("--project", type=int, default=10_000_000, help="vector count for projected memory")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    kb = current_kb(vectors=True)
+    base = _kb_vectors(kb)
+    vecs = base
+    if args.synthetic:
+        rows = rng.integers(0, len(base), args.synthetic)
+        noise = rng.normal(0, args.noise, (args.synthetic, base.shape[1]))
+        vecs = np.vstack([base, _normalize(base[rows] + noise)])
+    q = _queries(kb, base, args.queries, rng)
+    print(f"[bench] KB {kb.version}: {len(vecs)} vectors x {vecs.shape[1]} dims, {len(q)} queries, k={args.k}")
+
+    truth = make_index(vecs, "float32").search(q, args.k)[1]
+    rows = []
+    for dtype in INDEX_DTYPES:
+        index = make_index(vecs, dtype)
+        for factor in ([0] if dtype == "float32" else [0, args.rescore]):
+            _search(index, vecs, q[:1], args.k, factor)  # warm-up
+            t0 = time.perf_counter()
+            found = _search(index, vecs, q, args.k, factor)
+            ms = (time.perf_counter() - t0) * 1000.0 / len(q)
+            recall = np.mean([len(set(f) & set(t)) / args.k for f, t in zip(found, truth)])
+            per_vec = index_bytes(index) / index.ntotal
+            rows.append({
+                "index": dtype + ("+rescore" if factor else ""),
+                "bytes/vec": int(per_vec),
+                "index_MB": round(index_bytes(index) / 2**20, 2),
+                f"GB@{args.project:.0e}": round(per_vec * args.project / 2**30, 2),
+                f"recall@{args.k}": round(float(recall), 4),
+                "ms/query": round(ms, 3),
+            })
+
+    cols = list(rows[0].keys())
+    print("  ".join(f"{c:>16}" for c in cols))
+    for r in rows:
+        print("  ".join(f"{str(r[c]):>16}" for c in cols))
+    print("(+rescore reads the shortlist's float32 rows from the memory-mapped vectors.npy, not RAM-resident)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,412 @@
+# bench/load_test.py
+"""
+Load test for /process-transcript and /process-audio: throughput, latency
+percentiles, error rate and server CPU / RSS per concurrency level (or
+arrival rate), to find where the service saturates.
+
+    python -m bench.load_test [--concurrency 1,2,4,8,16] [--duration 30] [--mix transcript=3,audio=1]
+    python -m bench.load_test --rates 0.5,1,2,4 --concurrency 32          # open loop, Poisson arrivals
+    python -m bench.load_test --url http://host:8000 --server-pid <pid>  # against a running server
+
+In-process (default) the app is served by uvicorn from this process, in a
+scratch directory holding a copy of kb/, with every watsonx and IAM call
+going to bench/watsonx_stub.py (stub options below; --no-stub uses the real
+watsonx from .env). Here the CPU figure includes the load generator itself;
+for clean numbers run the server separately:
+
+    python -m bench.watsonx_stub --port 8099 &
+    WATSONX_BASE_URL=http://127.0.0.1:8099 IBM_IAM_URL=http://127.0.0.1:8099/identity/token \\
+        WATSONX_API_KEY=x WATSONX_PROJECT_ID=x uvicorn app.main:app --port 8000 &
+    python -m bench.load_test --url http://127.0.0.1:8000 --server-pid $!
+
+Closed loop (default): --concurrency clients each send the next request as
+soon as the previous one returns. With --rates, each level is an arrival
+rate in req/s (Poisson), at most max(--concurrency) in flight; latency then
+counts from the scheduled arrival, so queueing in the client is not hidden.
+Requests draw from synthetic transcripts (--sentences per call) and the
+audio files matching --audio (uploaded as load_<slot>_<name> so concurrent
+uploads never share a path on the server). The 64 synthetic transcripts
+repeat, so the cross-call verdict cache gets hits; start the server with
+VERDICT_CACHE=0 to measure cold calls only.
+
+Health probes stay on, as in production. A 200 can still carry the
+verifier's "insufficient" fallback (model down, breaker open, no verdict
+parsed), so each level also reports the share of verdicts that are fallbacks
+("fallback" column): throughput bought with those is not real throughput.
+"""
+import argparse, glob, itertools, json, os, random, shutil, socket, sys, tempfile, threading, time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import requests
+
+from bench import watsonx_stub
+
+try:
+    import psutil
+except ImportError:   # optional: /proc is read directly on Linux
+    psutil = None
+
+TEMPLATES = [
+    "Our global uptime in Q2 was {pct2}%.",
+    "P95 latency averaged {ms} ms in Q2, even in APAC.",
+    "The APAC outage on June 21 lasted {mins} minutes.",
+    "Customer churn fell to {pct}% this quarter.",
+    "Q2 growth was {pct}% quarter over quarter.",
+    "We reached {pct_hi}% AML screening compliance in Q2.",
+    "Relief payments are completed within {days} days of a disaster declaration.",
+    "Default retention for call recordings is {days} days.",
+    "The Gold card has a {pct}% APR and no annual fee.",
+]
+FILLER = [
+    "Thanks for joining today.", "Let me share the latest numbers.", "Does that answer your question?",
+    "I can send the deck after the call.", "Let's move to the next topic.", "Good question.",
+]
+
+
+# verifier fallbacks (app/agents/verifier.py): not a real verdict
+FALLBACK_RATIONALES = ("Verifier offline; defaulting to insufficient.", "No explicit verdict returned;")
+
+
+def synthetic_transcript(rng: random.Random, sentences: int) -> str:
+    out = []
+    for _ in range(sentences):
+        if rng.random() < 0.35:
+            out.append(rng.choice(FILLER))
+        else:
+            out.append(rng.choice(TEMPLATES).format(
+                pct=rng.randint(1, 40), pct_hi=rng.choice([92, 97, 100]), pct2=rng.choice(["99.982", "99.99", "99.9"]),
+                ms=rng.choice([198, 200, 250]), mins=rng.choice([45, 60, 90]), days=rng.choice([30, 45, 90])))
+    return " ".join(out)
+
+
+# -------- Server resources --------
+
+class _Proc:
+    """CPU seconds and RSS of one process, via psutil or /proc."""
+
+    def __init__(self, pid: int):
+        self.pid = pid
+        self._p = psutil.Process(pid) if psutil else None
+        self._tick = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+    def read(self) -> Optional[Tuple[float, float]]:
+        try:
+            if self._p is not None:
+                t = self._p.cpu_times()
+                return t.user + t.system, float(self._p.memory_info().rss)
+            with open(f"/proc/{self.pid}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+            cpu = (int(fields[11]) + int(fields[12])) / self._tick
+            with open(f"/proc/{self.pid}/status") as f:
+                rss = next(int(line.split()[1]) * 1024 for line in f if line.startswith("VmRSS:"))
+            return cpu, float(rss)
+        except Exception:
+            return None
+
+
+class _Resources:
+    """Samples a process every `interval` seconds while a level runs."""
+
+    def __init__(self, pid: Optional[int], interval: float = 0.5):
+        self.proc = _Proc(pid) if pid else None
+        self.interval = interval
+        self._stop = threading.Event()
+        self._rss: List[float] = []
+
+    def __enter__(self):
+        self._start = self.proc.read() if self.proc else None
+        self._t0 = time.perf_counter()
+        self._stop.clear()
+        self._rss = []
+        if self._start:
+            self._thread = threading.Thread(target=self._run, name="load-resources", daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            r = self.proc.read()
+            if r:
+                self._rss.append(r[1])
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        end = self.proc.read() if self._start else None
+        self.result: Dict[str, Any] = {"cpu_pct": None, "rss_mb_peak": None, "rss_mb_end": None}
+        if self._start and end:
+            wall = time.perf_counter() - self._t0
+            rss = self._rss + [end[1]]
+            self.result = {"cpu_pct": round(100.0 * (end[0] - self._start[0]) / wall, 1),
+                           "rss_mb_peak": round(max(rss) / 2**20, 1), "rss_mb_end": round(end[1] / 2**20, 1)}
+
+
+# -------- Target --------
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_inprocess(args) -> Tuple[str, Callable[[], None]]:
+    """Serve app.main from this process in a scratch dir, with watsonx pointed at the stub. Returns (url, cleanup)."""
+    repo = os.getcwd()
+    workdir = tempfile.mkdtemp(prefix="claimcheck-load-")
+    os.makedirs(os.path.join(workdir, "kb"))
+    shutil.copy(os.path.join(repo, "kb", "snippets.jsonl"), os.path.join(workdir, "kb", "snippets.jsonl"))
+    if os.path.isdir(os.path.join(repo, "kb", "tenants")):
+        shutil.copytree(os.path.join(repo, "kb", "tenants"), os.path.join(workdir, "kb", "tenants"),
+                        ignore=shutil.ignore_patterns("index"))
+    os.makedirs(os.path.join(workdir, "data", "audio"))
+
+    stub = None
+    if not args.no_stub:
+        stub, _ = watsonx_stub.serve(0, **watsonx_stub.stub_options(args))
+        base = f"http://127.0.0.1:{stub.server_port}"
+        os.environ.update(WATSONX_BASE_URL=base, IBM_IAM_URL=f"{base}/identity/token")
+        for k, v in {"WATSONX_API_KEY": "stub", "WATSONX_PROJECT_ID": "stub", "IBM_API_VERSION": "2023-05-29",
+                     "IBM_EMBEDDINGS_MODEL_ID": "stub/embed", "IBM_RERANK_MODEL_ID": "stub/rerank",
+                     "IBM_CLAIM_MODEL_ID": "stub/claims", "IBM_VERIFIER_MODEL_ID": "stub/verify",
+                     "IBM_SUMMARY_MODEL_ID": "stub/summary"}.items():
+            os.environ.setdefault(k, v)
+        print(f"[load] watsonx stub on {base}")
+
+    sys.path.insert(0, repo)
+    os.chdir(workdir)   # kb/index, data/reports and uploads go to the scratch dir
+    import uvicorn
+    from app.main import app
+
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, name="load-uvicorn", daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    print(f"[load] app served in-process on :{port} (workdir {workdir})")
+
+    def cleanup():
+        server.should_exit = True
+        if stub is not None:
+            stub.shutdown()
+        os.chdir(repo)
+        if not args.keep_workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    return f"http://127.0.0.1:{port}", cleanup
+
+
+class Workload:
+    """Builds requests according to --mix; each thread keeps its own session and upload slot."""
+
+    def __init__(self, url: str, args, rng: random.Random):
+        self.url = url.rstrip("/")
+        self.kb = args.kb
+        self.timeout = args.timeout
+        self.headers = {"X-Priority": args.priority} if args.priority else {}
+        weights = {k: float(v) for k, _, v in (p.partition("=") for p in args.mix.split(",") if p)}
+        self.audio = []
+        for path in sorted(glob.glob(args.audio)):
+            with open(path, "rb") as f:
+                self.audio.append((os.path.basename(path), f.read()))
+        if weights.get("audio") and not self.audio:
+            print(f"[load] no audio files match {args.audio!r}; sending transcripts only")
+            weights.pop("audio")
+        self.kinds = [k for k in ("transcript", "audio") if weights.get(k)]
+        self.weights = [weights[k] for k in self.kinds]
+        self.transcripts = [synthetic_transcript(rng, args.sentences) for _ in range(64)]
+        self._rng = rng
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._slots = itertools.count()
+
+    def _thread(self):
+        if not hasattr(self._local, "session"):
+            self._local.session = requests.Session()
+            self._local.slot = next(self._slots)
+        return self._local
+
+    def pick(self) -> Tuple[str, Any]:
+        with self._lock:
+            kind = self._rng.choices(self.kinds, self.weights)[0]
+            item = self._rng.choice(self.transcripts if kind == "transcript" else self.audio)
+        return kind, item
+
+    def send(self, kind: str, item: Any) -> Tuple[str, int, int]:
+        """One request; returns ("ok", "HTTP <code>" or the exception name, verdicts, fallback verdicts)."""
+        t = self._thread()
+        try:
+            if kind == "transcript":
+                r = t.session.post(f"{self.url}/process-transcript", json={"text": item, "kb": self.kb},
+                                   headers=self.headers, timeout=self.timeout)
+            else:
+                name, data = item
+                r = t.session.post(f"{self.url}/process-audio", files={"file": (f"load_{t.slot}_{name}", data)},
+                                   data={"kb": self.kb} if self.kb else None, headers=self.headers,
+                                   timeout=self.timeout)
+            if not r.ok:
+                return f"HTTP {r.status_code}", 0, 0
+            verdicts = r.json().get("verdicts") or []
+            fallback = sum(1 for v in verdicts if (v.get("rationale") or "").startswith(FALLBACK_RATIONALES))
+            return "ok", len(verdicts), fallback
+        except (requests.RequestException, ValueError) as e:
+            return type(e).__name__, 0, 0
+
+
+# -------- Levels --------
+
+Result = Tuple[str, float, str, int, int]   # kind, latency s, outcome, verdicts, fallback verdicts
+
+
+def run_closed(work: Workload, concurrency: int, duration: float) -> List[Result]:
+    deadline = time.perf_counter() + duration
+    results: List[Result] = []
+    lock = threading.Lock()
+
+    def client():
+        while time.perf_counter() < deadline:
+            kind, item = work.pick()
+            t0 = time.perf_counter()
+            outcome = work.send(kind, item)
+            with lock:
+                results.append((kind, time.perf_counter() - t0, *outcome))
+
+    threads = [threading.Thread(target=client, name=f"load-client-{i}", daemon=True) for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+def run_open(work: Workload, rate: float, max_inflight: int, duration: float,
+             rng: random.Random) -> List[Result]:
+    results: List[Result] = []
+    lock = threading.Lock()
+
+    def one(kind, item, scheduled):
+        outcome = work.send(kind, item)
+        with lock:
+            results.append((kind, time.perf_counter() - scheduled, *outcome))
+
+    with ThreadPoolExecutor(max_workers=max_inflight, thread_name_prefix="load-client") as pool:
+        t0 = time.perf_counter()
+        at = t0
+        while True:
+            at += rng.expovariate(rate)
+            if at - t0 >= duration:
+                break
+            time.sleep(max(0.0, at - time.perf_counter()))
+            pool.submit(one, *work.pick(), at)
+    return results
+
+
+def summarize(level: Dict[str, Any], results: List[Result], wall: float,
+              resources: Dict[str, Any]) -> Dict[str, Any]:
+    lat = np.asarray([r[1] for r in results]) * 1000.0
+    errors: Dict[str, int] = {}
+    for _, _, outcome, _, _ in results:
+        if outcome != "ok":
+            errors[outcome] = errors.get(outcome, 0) + 1
+    n = len(results)
+    ok = n - sum(errors.values())
+    pct = (lambda q: round(float(np.percentile(lat, q)), 1)) if n else (lambda q: None)
+    verdicts, fallback = sum(r[3] for r in results), sum(r[4] for r in results)
+    return {
+        **level, "requests": n, "ok": ok, "error_rate": round(1 - ok / n, 4) if n else 0.0, "errors": errors,
+        "rps": round(ok / wall, 2), "p50_ms": pct(50), "p90_ms": pct(90), "p95_ms": pct(95), "p99_ms": pct(99),
+        "max_ms": round(float(lat.max()), 1) if n else None,
+        "verdicts": verdicts, "fallback": round(fallback / verdicts, 4) if verdicts else 0.0,
+        "by_endpoint": {k: sum(1 for r in results if r[0] == k) for k in {r[0] for r in results}},
+        **resources,
+    }
+
+
+def saturation(rows: List[Dict[str, Any]], gain: float = 1.1) -> Optional[Dict[str, Any]]:
+    """Last level before throughput stops growing by at least `gain`x (None if it never stops)."""
+    for prev, row in zip(rows, rows[1:]):
+        if row["rps"] < prev["rps"] * gain:
+            return prev
+    return None
+
+
+COLUMNS = ["level", "requests", "rps", "error_rate", "fallback", "p50_ms", "p95_ms", "p99_ms", "max_ms", "cpu_pct",
+           "rss_mb_peak"]
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--url", default=None, help="running server to test (default: serve the app in-process)")
+    ap.add_argument("--server-pid", type=int, default=None, help="with --url: process to read CPU/RSS from")
+    ap.add_argument("--concurrency", default="1,2,4,8,16", help="closed-loop clients per level")
+    ap.add_argument("--rates", default=None, help="open loop: arrival rates (req/s) per level")
+    ap.add_argument("--duration", type=float, default=30.0, help="seconds per level")
+    ap.add_argument("--warmup", type=int, default=2, help="untimed requests first (model loads, KB index build)")
+    ap.add_argument("--mix", default="transcript=3,audio=1", help="relative weights of the two endpoints")
+    ap.add_argument("--audio", default="data/audio/*.wav", help="glob of audio files to upload")
+    ap.add_argument("--sentences", type=int, default=12, help="sentences per synthetic transcript")
+    ap.add_argument("--kb", default=None)
+    ap.add_argument("--priority", default=None, help="X-Priority header to send")
+    ap.add_argument("--timeout", type=float, default=300.0)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", default=None, help="also write the rows as JSON lines here")
+    ap.add_argument("--no-stub", action="store_true", help="in-process: use the real watsonx from .env")
+    ap.add_argument("--stub-port", type=int, default=None, help="with --url: also serve the watsonx stub on this port")
+    ap.add_argument("--keep-workdir", action="store_true", help="in-process: keep the scratch dir")
+    watsonx_stub.add_arguments(ap)
+    args = ap.parse_args()
+
+    rng = random.Random(args.seed)
+    out_path = os.path.abspath(args.out) if args.out else None
+    audio_glob = args.audio = os.path.abspath(args.audio)
+    cleanup = lambda: None
+    if args.url:
+        url, pid = args.url, args.server_pid
+        if args.stub_port is not None:
+            stub, _ = watsonx_stub.serve(args.stub_port, **watsonx_stub.stub_options(args))
+            print(f"[load] watsonx stub on http://127.0.0.1:{stub.server_port}")
+    else:
+        url, cleanup = start_inprocess(args)
+        pid = os.getpid()
+    work = Workload(url, args, rng)
+    print(f"[load] target {url}, mix {dict(zip(work.kinds, work.weights))}, audio files: {len(work.audio)} ({audio_glob})")
+
+    concurrency = [int(x) for x in args.concurrency.split(",")]
+    levels = ([{"level": f"{r}/s", "rate": float(r), "max_inflight": max(concurrency)} for r in args.rates.split(",")]
+              if args.rates else [{"level": f"c={c}", "concurrency": c} for c in concurrency])
+    rows = []
+    monitor = _Resources(pid)
+    try:
+        for _ in range(args.warmup):
+            print(f"[load] warmup: {work.send(*work.pick())[0]}")
+        print("  ".join(f"{c:>12}" for c in COLUMNS))
+        for level in levels:
+            with monitor:
+                t0 = time.perf_counter()
+                if "rate" in level:
+                    results = run_open(work, level["rate"], level["max_inflight"], args.duration, rng)
+                else:
+                    results = run_closed(work, level["concurrency"], args.duration)
+                wall = time.perf_counter() - t0
+            row = summarize(level, results, wall, monitor.result)
+            rows.append(row)
+            print("  ".join(f"{str(row.get(c)):>12}" for c in COLUMNS))
+            if row["errors"]:
+                print(f"{'':>12}  errors: {row['errors']}")
+            if out_path:
+                with open(out_path, "a") as f:
+                    f.write(json.dumps(row) + "\n")
+    finally:
+        cleanup()
+
+    knee = saturation(rows)
+    if knee:
+        print(f"[load] saturates at {knee['level']}: {knee['rps']} req/s, p95 {knee['p95_ms']} ms, "
+              f"fallback verdicts {knee['fallback']:.1%}")
+    elif rows:
+        best = max(rows, key=lambda r: r["rps"])
+        print(f"[load] no saturation up to {rows[-1]['level']} (peak {best['rps']} req/s at {best['level']})")
+
+
+if __name__ == "__main__":
+    main()
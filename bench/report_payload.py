@@ -0,0 +1,95 @@
+# bench/report_payload.py
+"""
+Payload size and serialization time: pydantic CallReport JSON vs the compact
+wire format (app/core/wire.py), raw and gzip/brotli-compressed.
+
+    python -m bench.report_payload [--claims 50,200,1000] [--docs 300] [--k 5] [--repeat 20]
+
+Builds synthetic reports: --claims claims, each with --k evidence items drawn
+from a pool of --docs snippets (kb/snippets.jsonl, cycled with suffixes), so
+evidence overlaps across claims the way it does on long calls. Times are per
+report (mean over --repeat), including model_dump / compaction.
+"""
+import argparse, gzip, json, random, time
+
+from app.schemas.claim import Claim
+from app.schemas.evidence import Evidence
+from app.schemas.report import CallReport
+from app.schemas.verdict import Verdict
+from app.core.orchestrator import _flatten_evidence
+from app.core.wire import brotli, orjson, compact_report, expand_report, dumps
+
+SNIPPETS = "kb/snippets.jsonl"
+
+
+def _pool(n: int) -> list:
+    with open(SNIPPETS) as f:
+        base = [json.loads(line) for line in f if line.strip()]
+    out = []
+    for i in range(n):
+        d = base[i % len(base)]
+        out.append({"doc_id": f"{d['doc_id']}_{i}", "source": d.get("source", ""),
+                    "snippet": f"{d['snippet']} ({i})", "metadata": d.get("metadata", {})})
+    return out
+
+
+def _report(n_claims: int, pool: list, k: int, rng: random.Random) -> CallReport:
+    claims, verdicts, evmap = [], [], {}
+    for i in range(n_claims):
+        cid = f"c{i}"
+        claims.append(Claim(id=cid, text=f"Q2 growth was {i % 40}% in region {i % 7}", confidence=0.7))
+        evmap[cid] = [Evidence(**d, score=round(rng.random(), 4)) for d in rng.sample(pool, k)]
+        verdicts.append(Verdict(claim_id=cid, label=rng.choice(["supported", "refuted", "insufficient"]),
+                                confidence=0.8, best_evidence_id=evmap[cid][0].doc_id,
+                                rationale="Evidence states a different figure.", citation_ids=[evmap[cid][0].doc_id]))
+    table = [{"claim": c.text, "status": v.label.capitalize(), "evidence_source": v.best_evidence_id}
+             for c, v in zip(claims, verdicts)]
+    return CallReport(call_summary="Summary. " * 40, claim_table=table, action_items=["Check Q2 growth."],
+                      claims=claims, verdicts=verdicts, evidence=_flatten_evidence(evmap), evidence_by_claim=evmap)
+
+
+def _time(fn, repeat: int):
+    fn()
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        out = fn()
+    return out, (time.perf_counter() - t0) * 1000.0 / repeat
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--claims", default="50,200,1000")
+    ap.add_argument("--docs", type=int, default=300, help="distinct evidence snippets to draw from")
+    ap.add_argument("--k", type=int, default=5, help="evidence items per claim")
+    ap.add_argument("--repeat", type=int, default=20)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    rng = random.Random(args.seed)
+    pool = _pool(args.docs)
+    encoders = [
+        ("pydantic json", lambda r: r.model_dump_json().encode("utf-8")),
+        ("full + dumps", lambda r: dumps(r.model_dump())),
+        ("compact + json", lambda r: json.dumps(compact_report(r), separators=(",", ":")).encode("utf-8")),
+    ]
+    if orjson is not None:
+        encoders.append(("compact + orjson", lambda r: dumps(compact_report(r))))
+    print(f"[bench] orjson={'yes' if orjson else 'no'} brotli={'yes' if brotli else 'no'}")
+
+    cols = ["claims", "encoder", "KB", "ms", "gzip_KB", "gzip_ms"] + (["br_KB", "br_ms"] if brotli else [])
+    print("  ".join(f"{c:>16}" for c in cols))
+    for n in [int(x) for x in args.claims.split(",")]:
+        report = _report(n, pool, args.k, rng)
+        assert expand_report(compact_report(report)) == report
+        for name, enc in encoders:
+            body, ms = _time(lambda: enc(report), args.repeat)
+            gz, gz_ms = _time(lambda: gzip.compress(body, compresslevel=6), args.repeat)
+            row = [n, name, round(len(body) / 1024, 1), round(ms, 2), round(len(gz) / 1024, 1), round(gz_ms, 2)]
+            if brotli:
+                br, br_ms = _time(lambda: brotli.compress(body, quality=5), args.repeat)
+                row += [round(len(br) / 1024, 1), round(br_ms, 2)]
+            print("  ".join(f"{str(v):>16}" for v in row))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+# bench/retrieval_modes.py
+"""
+Compare retrieval quality and latency of the vector, lexical and hybrid modes.
+
+    python -m bench.retrieval_modes [--k 5] [--modes vector,lexical,hybrid]
+
+Quality is measured against bench/retrieval_queries.jsonl (query -> relevant
+doc_ids from kb/snippets.jsonl): recall@k and MRR. Latency is per `_search`
+call after one warm-up query per mode (index + model loading excluded).
+"""
+import argparse, json, time
+import numpy as np
+
+from app.agents.retriever import _search
+
+QUERIES = "bench/retrieval_queries.jsonl"
+
+
+def _load_queries(path: str) -> list[dict]:
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def run_mode(mode: str, queries: list[dict], k: int) -> dict:
+    _search(queries[0]["query"], k=k, mode=mode)  # warm-up
+    latencies, recalls, rr = [], [], []
+    for q in queries:
+        t0 = time.perf_counter()
+        hits = _search(q["query"], k=k, mode=mode)
+        latencies.append((time.perf_counter() - t0) * 1000.0)
+        ids = [h["doc_id"] for h in hits[:k]]
+        relevant = set(q["relevant"])
+        recalls.append(len(relevant & set(ids)) / len(relevant))
+        rank = next((i for i, d in enumerate(ids, 1) if d in relevant), None)
+        rr.append(1.0 / rank if rank else 0.0)
+    lat = np.asarray(latencies)
+    return {
+        "mode": mode,
+        f"recall@{k}": round(float(np.mean(recalls)), 3),
+        "mrr": round(float(np.mean(rr)), 3),
+        "p50_ms": round(float(np.percentile(lat, 50)), 3),
+        "p95_ms": round(float(np.percentile(lat, 95)), 3),
+        "mean_ms": round(float(lat.mean()), 3),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--k", type=int, default=5)
+    ap.add_argument("--modes", default="vector,lexical,hybrid")
+    ap.add_argument("--queries", default=QUERIES)
+    args = ap.parse_args()
+
+    queries = _load_queries(args.queries)
+    rows = [run_mode(m.strip(), queries, args.k) for m in args.modes.split(",") if m.strip()]
+    cols = list(rows[0].keys())
+    print("  ".join(f"{c:>10}" for c in cols))
+    for r in rows:
+        print("  ".join(f"{str(r[c]):>10}" for c in cols))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+# bench/watsonx_stub.py
+"""
+Local stand-in for IBM IAM + the watsonx.ai text endpoints, for load tests.
+
+    python -m bench.watsonx_stub [--port 8099] [--latency generation=800,embeddings=60,rerank=120]
+                                 [--jitter 0.3] [--max-inflight 0] [--error-rate 0]
+
+Point the service at it with
+    WATSONX_BASE_URL=http://127.0.0.1:8099 IBM_IAM_URL=http://127.0.0.1:8099/identity/token
+(plus any non-empty WATSONX_API_KEY / WATSONX_PROJECT_ID / IBM_*_MODEL_ID).
+
+Responses are cheap but shaped like the real ones, so every agent takes its
+normal code path:
+  embeddings  hashed bag-of-words vectors (--dim), so retrieval still ranks sensibly
+  rerank      token-overlap relevance
+  generation  claim extraction returns the transcript's sentences with numbers,
+              verification labels a claim "supported" when one of its numbers is
+              in the cited evidence, summaries echo the first sentences
+Each request sleeps a latency drawn around the endpoint's mean (--latency, ms;
+lognormal with sigma --jitter). With --max-inflight N, requests beyond N in
+flight get 429 + Retry-After like a rate-limited project. --error-rate adds
+random 503s.
+"""
+from __future__ import annotations
+import argparse, hashlib, json, math, random, re, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Tuple
+from urllib.parse import urlparse
+
+import numpy as np
+
+_WORD = re.compile(r"[a-z0-9]+(?:\.[0-9]+)?")
+_NUMBER = re.compile(r"\d+(?:\.\d+)?")
+
+
+def _tokens(text: str) -> List[str]:
+    return _WORD.findall(text.lower())
+
+
+def embed(text: str, dim: int) -> List[float]:
+    v = np.zeros(dim, dtype=np.float32)
+    for tok in _tokens(text):
+        h = int.from_bytes(hashlib.blake2b(tok.encode("utf-8"), digest_size=8).digest(), "little")
+        v[h % dim] += 1.0 if (h >> 32) & 1 else -1.0
+    n = float(np.linalg.norm(v))
+    return (v / n if n else v).round(5).tolist()
+
+
+def _overlap(query: str, text: str) -> float:
+    q, t = set(_tokens(query)), set(_tokens(text))
+    return round(len(q & t) / (len(q) or 1), 4)
+
+
+def _after(prompt: str, marker: str) -> str:
+    i = prompt.rfind(marker)
+    return prompt[i + len(marker):] if i >= 0 else ""
+
+
+def _json_line(prompt: str, marker: str) -> Any:
+    try:
+        return json.loads(_after(prompt, marker).strip().split("\n", 1)[0])
+    except (ValueError, IndexError):
+        return None
+
+
+def _sentences(text: str) -> List[str]:
+    return [s.strip() for s in re.split(r"(?<=[.!?])\s+", text) if s.strip()]
+
+
+def generate(prompt: str) -> str:
+    """Text a model might answer to one of the service's prompts."""
+    if prompt.startswith("You extract factual claims"):
+        transcript = _after(prompt, "Input:").rsplit("Output:", 1)[0]
+        claims = [{"text": s, "speaker": None, "start": 0.0, "end": 0.0, "confidence": 0.7}
+                  for s in _sentences(transcript) if _NUMBER.search(s)]
+        return json.dumps({"claims": claims})
+    if prompt.startswith("You are a precise fact verifier"):
+        claims = _json_line(prompt, "Claims (JSON):\n") or []
+        catalog: Dict[str, str] = _json_line(prompt, "Evidence catalog (doc_id -> snippet) as JSON:\n") or {}
+        verdicts = []
+        for c in claims:
+            numbers = set(_NUMBER.findall(c.get("text", "")))
+            best = max(catalog, key=lambda d: _overlap(c.get("text", ""), catalog[d]), default=None)
+            hit = best is not None and bool(numbers & set(_NUMBER.findall(catalog[best])))
+            label = "supported" if hit else ("refuted" if best and numbers else "insufficient")
+            verdicts.append({"claim_id": c.get("id"), "label": label, "confidence": 0.8 if hit else 0.6,
+                             "citation_ids": [best] if best else [], "rationale": "Compared figures with the evidence."})
+        return json.dumps({"verdicts": verdicts})
+    if prompt.startswith("You summarize one part"):
+        text = _after(prompt, "Transcript part:\n").split("Output JSON only", 1)[0]
+        return json.dumps({"summary": " ".join(_sentences(text)[:2])[:400], "action_items": ["Follow up on the figures."]})
+    if prompt.startswith("You are a precise meeting summarizer"):
+        return json.dumps({"call_summary": "The call covered the stated metrics; see the claim table for how each was verified.",
+                           "action_items": ["Send corrected figures to the customer."]})
+    return "ok"
+
+
+class Stub:
+    def __init__(self, latency_ms: Dict[str, float], jitter: float = 0.3, max_inflight: int = 0,
+                 error_rate: float = 0.0, dim: int = 384, seed: int = 0):
+        self.latency_ms = latency_ms
+        self.jitter = jitter
+        self.max_inflight = max_inflight
+        self.error_rate = error_rate
+        self.dim = dim
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.inflight = 0
+        self.counts: Dict[str, int] = {}
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self.counts[key] = self.counts.get(key, 0) + 1
+
+    def _delay(self, endpoint: str) -> float:
+        mean = self.latency_ms.get(endpoint, 50.0) / 1000.0
+        if mean <= 0:
+            return 0.0
+        with self._lock:
+            z = self._rng.gauss(0.0, 1.0)
+        # lognormal with the requested mean
+        return mean * math.exp(self.jitter * z - self.jitter ** 2 / 2)
+
+    def handle(self, path: str, body: Dict[str, Any]) -> Tuple[int, Dict[str, Any], Dict[str, str]]:
+        if path.endswith("/identity/token"):
+            self._count("token")
+            return 200, {"access_token": "stub-token", "token_type": "Bearer", "expires_in": 3600}, {}
+        endpoint = path.rstrip("/").rsplit("/", 1)[-1]
+        if endpoint not in ("generation", "embeddings", "rerank"):
+            return 404, {"errors": [{"message": f"unknown path {path}"}]}, {}
+        with self._lock:
+            if self.max_inflight and self.inflight >= self.max_inflight:
+                self.counts["429"] = self.counts.get("429", 0) + 1
+                return 429, {"errors": [{"code": "too_many_requests"}]}, {"Retry-After": "1"}
+            self.inflight += 1
+            fail = self._rng.random() < self.error_rate
+        try:
+            time.sleep(self._delay(endpoint))
+            if fail:
+                self._count("503")
+                return 503, {"errors": [{"code": "service_unavailable"}]}, {}
+            self._count(endpoint)
+            return 200, self._respond(endpoint, body), {}
+        finally:
+            with self._lock:
+                self.inflight -= 1
+
+    def _respond(self, endpoint: str, body: Dict[str, Any]) -> Dict[str, Any]:
+        model = body.get("model_id", "")
+        if endpoint == "embeddings":
+            return {"model_id": model, "results": [{"embedding": embed(t, self.dim)} for t in body.get("inputs", [])],
+                    "input_token_count": sum(len(_tokens(t)) for t in body.get("inputs", []))}
+        if endpoint == "rerank":
+            inp = body.get("input") or {}
+            query = inp.get("query", body.get("query", ""))
+            passages = inp.get("passages") or [{"id": str(i), "text": p.get("text", "")}
+                                               for i, p in enumerate(body.get("inputs", []))]
+            scored = sorted(({"id": p.get("id"), "index": i, "relevance": _overlap(query, p.get("text", "")),
+                              "score": _overlap(query, p.get("text", ""))} for i, p in enumerate(passages)),
+                            key=lambda r: -r["relevance"])
+            return {"model_id": model, "results": scored[:body.get("top_n") or len(scored)]}
+        text = generate(body.get("input", ""))
+        return {"model_id": model, "results": [{"generated_text": text, "generated_token_count": len(text) // 4,
+                                                 "stop_reason": "eos_token"}]}
+
+
+def _handler(stub: Stub):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            raw = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            try:
+                body = json.loads(raw) if raw and "json" in (self.headers.get("Content-Type") or "") else {}
+            except ValueError:
+                body = {}
+            status, out, headers = stub.handle(urlparse(self.path).path, body)
+            data = json.dumps(out).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for k, v in headers.items():
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):   # one line per request would swamp the load test output
+            pass
+
+    return Handler
+
+
+def serve(port: int = 0, **kwargs) -> Tuple[ThreadingHTTPServer, Stub]:
+    """Start the stub on 127.0.0.1:<port> (0 = any free port) in a daemon thread."""
+    stub = Stub(**kwargs)
+    server = ThreadingHTTPServer(("127.0.0.1", port), _handler(stub))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="watsonx-stub", daemon=True).start()
+    return server, stub
+
+
+def parse_latency(spec: str) -> Dict[str, float]:
+    out = {}
+    for part in spec.split(","):
+        if part.strip():
+            name, _, ms = part.partition("=")
+            out[name.strip()] = float(ms)
+    return out
+
+
+def add_arguments(ap: argparse.ArgumentParser) -> None:
+    ap.add_argument("--latency", default="generation=800,embeddings=60,rerank=120",
+                    help="mean latency per endpoint in ms")
+    ap.add_argument("--jitter", type=float, default=0.3, help="lognormal sigma of the latency")
+    ap.add_argument("--max-inflight", type=int, default=0, help="answer 429 beyond this many in-flight requests (0 = off)")
+    ap.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 503")
+    ap.add_argument("--dim", type=int, default=384, help="embedding dimension")
+
+
+def stub_options(args: argparse.Namespace) -> Dict[str, Any]:
+    return {"latency_ms": parse_latency(args.latency), "jitter": args.jitter, "max_inflight": args.max_inflight,
+            "error_rate": args.error_rate, "dim": args.dim}
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--port", type=int, default=8099)
+    add_arguments(ap)
+    args = ap.parse_args()
+    server, stub = serve(args.port, **stub_options(args))
+    print(f"[stub] watsonx stub on http://127.0.0.1:{server.server_port} "
+          f"(IAM: http://127.0.0.1:{server.server_port}/identity/token)")
+    try:
+        while True:
+            time.sleep(10)
+            print(f"[stub] {stub.counts}")
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
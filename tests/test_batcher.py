@@ -0,0 +1,77 @@
+# tests/test_batcher.py
+"""MicroBatcher coalescing, error isolation and re-collection in app/core/batcher.py."""
+import threading, time
+
+import pytest
+
+from app.core import batcher
+
+
+def _submit_all(b, requests):
+    out, threads = {}, []
+
+    def run(name, items):
+        try:
+            out[name] = b.submit("k", items)
+        except Exception as e:
+            out[name] = e
+
+    for name, items in requests.items():
+        t = threading.Thread(target=run, args=(name, items))
+        t.start()
+        threads.append(t)
+    for t in threads:
+        t.join(5)
+    return out
+
+
+def test_concurrent_calls_share_one_batch():
+    calls = []
+
+    def fn(key, items):
+        calls.append(list(items))
+        return [x * 10 for x in items]
+
+    b = batcher.MicroBatcher(fn, name="t", window_ms=100, max_delay_ms=2000)
+    out = _submit_all(b, {"a": [1, 2], "b": [3], "c": [4, 5]})
+    assert out == {"a": [10, 20], "b": [30], "c": [40, 50]}
+    assert len(calls) == 1 and sorted(calls[0]) == [1, 2, 3, 4, 5]
+
+
+def test_bad_input_only_fails_its_own_caller():
+    def fn(key, items):
+        if "bad" in items:
+            raise ValueError("input too long")
+        return [x.upper() for x in items]
+
+    b = batcher.MicroBatcher(fn, name="t", window_ms=100, max_delay_ms=2000)
+    out = _submit_all(b, {"a": ["x"], "b": ["bad", "y"], "c": ["z"]})
+    assert out["a"] == ["X"] and out["c"] == ["Z"]
+    assert isinstance(out["b"], ValueError)
+    assert b.stats()["split_retries"] == 1
+
+
+def test_single_request_error_is_raised():
+    def fn(key, items):
+        raise ValueError("down")
+
+    b = batcher.MicroBatcher(fn, name="t", window_ms=5, max_delay_ms=2000)
+    with pytest.raises(ValueError):
+        b.submit("k", [1])
+
+
+def test_new_head_waits_its_own_window():
+    b = batcher.MicroBatcher(lambda key, items: items, name="t", window_ms=200, max_delay_ms=2000)
+    first, second = batcher._Pending("k", [1]), batcher._Pending("k", [2])
+    b._queue.extend([first, second])
+    out = []
+    t0 = time.monotonic()
+    collector = threading.Thread(target=lambda: out.append(b._collect()))
+    collector.start()
+    time.sleep(0.05)
+    with b._cond:                      # the head bypasses while the collector waits on it
+        b._queue.remove(first)
+        b._cond.notify_all()
+    collector.join(5)
+    assert out == [[second]]
+    assert time.monotonic() - t0 >= 0.15
@@ -0,0 +1,41 @@
+# tests/test_dedupe.py
+"""Number normalization and near-duplicate clustering in app/agents/dedupe.py."""
+import numpy as np
+import pytest
+
+from app.agents import dedupe
+from app.schemas.claim import Claim
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Q2 growth was 12.0%", {"2", "12"}),
+    ("growth was twelve percent", {"12"}),
+    ("forty-two customers", {"42"}),
+    ("one hundred and five sites", {"105"}),
+    ("in twenty twelve", {"20", "12"}),
+    ("three and a half percent", {"3.5"}),
+    ("3 and a half percent", {"3.5"}),
+    ("twelve and three quarters", {"12.75"}),
+])
+def test_claim_numbers(text, expected):
+    assert dedupe.claim_numbers(text) == frozenset(expected)
+
+
+def test_fractions_keep_figures_apart():
+    assert dedupe.claim_numbers("three and a half percent") == dedupe.claim_numbers("3.5 percent")
+    assert dedupe.claim_numbers("three and a half percent") != dedupe.claim_numbers("three percent")
+    assert dedupe.claim_numbers("half a percent") != dedupe.claim_numbers("a percent")
+
+
+def test_deduper_needs_same_numbers(monkeypatch):
+    # every claim embeds to the same vector: only the numbers can keep them apart
+    monkeypatch.setattr(dedupe, "embed_queries", lambda texts, kb=None: np.ones((len(texts), 4)) / 2.0)
+    claims = [Claim(id="c0", text="Churn was three percent"),
+              Claim(id="c1", text="Churn came in at 3%"),
+              Claim(id="c2", text="Churn was three and a half percent")]
+    deduper = dedupe.ClaimDeduper(threshold=0.9)
+    reps = deduper.add(claims)
+    assert [c.id for c in reps] == ["c0", "c2"]
+    assert claims[1].duplicate_of == "c0"
+    assert claims[2].duplicate_of is None
+    assert deduper.members == {"c0": ["c1"]}
@@ -0,0 +1,45 @@
+# tests/test_health.py
+"""When app/core/health.py reports a model as down, and when it lets traffic back."""
+import time
+
+import pytest
+
+from app.core import health, watsonx
+
+
+@pytest.fixture
+def breaker(monkeypatch):
+    g = watsonx.Governor("generation=1000")
+    monkeypatch.setattr(watsonx, "governor", g)
+    b = g.lane("generation").breaker
+    b.cooldown = 0.1
+    return b
+
+
+def test_failures_in_a_row_mark_down_for_one_cooldown(breaker):
+    monitor = health.HealthMonitor()
+    for _ in range(health.HEALTH_DOWN_FAILURES):
+        monitor.observe("generation", "m", False, 0.1, "HTTP 503")
+    assert monitor.model_stats("generation", "m")["state"] == "down"
+    time.sleep(0.15)
+    # the error rate is still high, but nothing has failed for a cooldown: let calls try again
+    assert monitor.model_stats("generation", "m")["state"] == "degraded"
+    assert monitor.usable("generation", "m")
+
+
+def test_one_success_clears_down(breaker):
+    monitor = health.HealthMonitor()
+    for _ in range(5):
+        monitor.observe("generation", "m", False, 0.1, "HTTP 503")
+    monitor.observe("generation", "m", True, 0.1)
+    stats = monitor.model_stats("generation", "m")
+    assert stats["state"] == "degraded" and stats["error_rate"] > 0.5
+
+
+def test_open_breaker_is_down_until_its_cooldown(breaker):
+    monitor = health.HealthMonitor()
+    for _ in range(breaker.failures):
+        breaker.failure()
+    assert not monitor.usable("generation", "m")
+    time.sleep(0.15)
+    assert monitor.usable("generation", "m")
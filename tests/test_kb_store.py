@@ -0,0 +1,67 @@
+# tests/test_kb_store.py
+"""Snapshot build / publish / prune in app/core/kb_store.py, with a fake embedding backend."""
+import json, os
+
+import numpy as np
+import pytest
+
+from app.core import kb_store
+from app.services.embeddings import EmbeddingBackend
+
+
+class _FakeBackend(EmbeddingBackend):
+    name = "fake"
+    model_id = "fake-4"
+
+    def _embed_batch(self, texts):
+        return np.asarray([[len(t), 1.0, t.count("e"), 0.5] for t in texts], dtype="float32")
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(kb_store, "default_backend", lambda: _FakeBackend())
+    snippets = tmp_path / "snippets.jsonl"
+    _write_snippets(snippets, ["uptime was 99.9%", "churn fell to 2%"])
+    return kb_store.KBStore(str(tmp_path / "index"), str(snippets))
+
+
+def _write_snippets(path, texts):
+    with open(path, "w") as f:
+        for i, t in enumerate(texts):
+            f.write(json.dumps({"doc_id": f"d{i}", "source": f"Doc {i}", "snippet": t}) + "\n")
+
+
+def test_build_publishes_and_reuses_unchanged(store):
+    m = store.build()
+    assert store.current() == m["version"]
+    index, docs, _, manifest = store.load(m["version"])
+    assert index.ntotal == 2 and len(docs) == 2
+    assert manifest["backend"] == "fake" and manifest["dim"] == 4
+    assert not any(n.startswith(".tmp-") for n in os.listdir(store.snapshots_dir))
+
+    again = store.build()
+    assert again["version"] == m["version"]
+    assert len(store.list()) == 1
+
+
+def test_publish_rolls_back_and_rejects_unknown(store):
+    first = store.build()["version"]
+    _write_snippets(store.snippets, ["uptime was 99.9%", "churn fell to 3%"])
+    second = store.build()["version"]
+    assert second != first and store.current() == second
+    store.publish(first)
+    assert store.current() == first
+    with pytest.raises(FileNotFoundError):
+        store.publish("no-such-version")
+    assert store.current() == first
+
+
+def test_prune_keeps_current_and_newest(store, monkeypatch):
+    monkeypatch.setattr(kb_store, "KB_SNAPSHOT_RETENTION_DAYS", 0)
+    monkeypatch.setattr(kb_store, "KB_SNAPSHOT_MIN_KEEP", 1)
+    versions = []
+    for n in range(3):
+        _write_snippets(store.snippets, [f"churn fell to {n}%"])
+        versions.append(store.build(publish=False)["version"])
+    store.publish(versions[0])            # publishing prunes: keeps CURRENT and the newest
+    assert {m["version"] for m in store.list()} == {versions[0], versions[2]}
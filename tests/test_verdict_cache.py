@@ -0,0 +1,64 @@
+# tests/test_verdict_cache.py
+"""Version handling and number matching in app/core/verdict_cache.py."""
+import numpy as np
+
+from app.core.config import KB_DEFAULT_TENANT
+from app.core.verdict_cache import VerdictCache
+from app.schemas.verdict import Verdict
+
+
+def _vec(*xs) -> np.ndarray:
+    v = np.asarray(xs, dtype="float32")
+    return v / np.linalg.norm(v)
+
+
+def _verdict(label: str = "supported") -> Verdict:
+    return Verdict(claim_id="c", label=label, confidence=0.9, best_evidence_id="d", rationale="")
+
+
+def test_hit_needs_same_numbers():
+    cache = VerdictCache(threshold=0.9)
+    cache.put(_vec(1, 0, 0), frozenset({"2"}), "v1", "churn 2%", _verdict(), [])
+    assert cache.lookup(_vec(1, 0, 0), frozenset({"2"}), "v1") is not None
+    assert cache.lookup(_vec(1, 0, 0), frozenset({"4"}), "v1") is None
+    assert cache.lookup(_vec(0, 1, 0), frozenset({"2"}), "v1") is None
+
+
+def test_interleaved_versions_keep_each_others_entries():
+    cache = VerdictCache(threshold=0.9)
+    nums = frozenset({"2"})
+    cache.put(_vec(1, 0, 0), nums, "v1", "churn 2%", _verdict("supported"), [])
+    # v2 is published while a call pinned to v1 is still running
+    cache.put(_vec(1, 0, 0), nums, "v2", "churn 2%", _verdict("refuted"), [])
+    for _ in range(3):
+        old = cache.lookup(_vec(1, 0, 0), nums, "v1")
+        new = cache.lookup(_vec(1, 0, 0), nums, "v2")
+        assert old is not None and old[0].label == "supported"
+        assert new is not None and new[0].label == "refuted"
+    stats = cache.stats()
+    assert stats["invalidations"] == 0
+    assert stats["kb_versions"] == {KB_DEFAULT_TENANT: ["v1", "v2"]}
+
+
+def test_only_a_newer_version_drops_the_oldest():
+    cache = VerdictCache(threshold=0.9, kb_versions=2)
+    nums = frozenset({"2"})
+    for version in ("v1", "v2"):
+        cache.put(_vec(1, 0, 0), nums, version, "churn 2%", _verdict(), [])
+    cache.lookup(_vec(1, 0, 0), nums, "v3")           # v3 published: v1 goes
+    assert cache.lookup(_vec(1, 0, 0), nums, "v2") is not None
+    assert cache.stats()["invalidations"] == 1
+    cache.put(_vec(1, 0, 0), nums, "v3", "churn 2%", _verdict(), [])
+    assert cache.lookup(_vec(1, 0, 0), nums, "v3") is not None
+
+
+def test_versions_are_per_kb():
+    cache = VerdictCache(threshold=0.9, kb_versions=1)
+    nums = frozenset({"2"})
+    cache.put(_vec(1, 0, 0), nums, "a1", "churn 2%", _verdict(), [], kb="a")
+    cache.put(_vec(1, 0, 0), nums, "b1", "churn 2%", _verdict(), [], kb="b")
+    assert cache.lookup(_vec(1, 0, 0), nums, "a1", kb="a") is not None
+    assert cache.lookup(_vec(1, 0, 0), nums, "a1", kb="c") is None
+    cache.invalidate("a")
+    assert cache.lookup(_vec(1, 0, 0), nums, "a1", kb="a") is None
+    assert cache.lookup(_vec(1, 0, 0), nums, "b1", kb="b") is not None
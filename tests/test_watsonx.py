@@ -0,0 +1,149 @@
+# tests/test_watsonx.py
+"""Governor primitives in app/core/watsonx.py, driven through a fake `_send`."""
+import threading, time
+
+import pytest
+import requests
+
+from app.core import watsonx
+
+
+def _response(status: int, retry_after: str = None) -> requests.Response:
+    r = requests.Response()
+    r.status_code = status
+    r._content = b'{"results": [{"generated_text": "ok"}]}'
+    if retry_after is not None:
+        r.headers["Retry-After"] = retry_after
+    return r
+
+
+@pytest.fixture
+def governor(monkeypatch):
+    """A fresh governor with generous rate limits, so only the test's settings apply."""
+    g = watsonx.Governor("generation=1000")
+    monkeypatch.setattr(watsonx, "governor", g)
+    return g
+
+
+def test_priority_order_under_contention(monkeypatch, governor):
+    monkeypatch.setattr(watsonx, "WATSONX_CONCURRENCY_INITIAL", 1)
+    monkeypatch.setattr(watsonx, "WATSONX_CONCURRENCY_MAX", 1)
+    hold = threading.Event()
+    order = []
+
+    def fake_send(endpoint, body, timeout):
+        if body["input"] == "hold":
+            hold.wait(5)
+        order.append(body["input"])
+        return _response(200)
+
+    monkeypatch.setattr(watsonx, "_send", fake_send)
+
+    def call(name, prio):
+        with watsonx.priority(prio):
+            watsonx.post("generation", {"model_id": "m", "input": name}, hedge=False)
+
+    first = threading.Thread(target=call, args=("hold", "interactive"))
+    first.start()
+    while governor.lane("generation").inflight < 1:
+        time.sleep(0.005)
+    # queue in the opposite order of their priority
+    threads = []
+    for prio in ("background", "batch", "interactive"):
+        t = threading.Thread(target=call, args=(prio, prio))
+        t.start()
+        threads.append(t)
+        while len(governor.lane("generation")._waiters) < len(threads):
+            time.sleep(0.005)
+    hold.set()
+    for t in [first] + threads:
+        t.join(5)
+    assert order == ["hold", "interactive", "batch", "background"]
+
+
+def test_aimd_halves_once_per_cooldown(monkeypatch, governor):
+    monkeypatch.setattr(watsonx, "WATSONX_CONCURRENCY_INITIAL", 8)
+    monkeypatch.setattr(watsonx, "WATSONX_CONCURRENCY_MIN", 1)
+    monkeypatch.setattr(watsonx, "WATSONX_AIMD_COOLDOWN_S", 60.0)
+    monkeypatch.setattr(watsonx, "_send", lambda endpoint, body, timeout: _response(503))
+    lane = governor.lane("generation")
+    lane.breaker.failures = 100
+
+    def attempt():
+        return watsonx._attempt(lane, "generation", "m", {"model_id": "m"}, 1.0, 0)
+
+    assert attempt().status_code == 503
+    assert lane.limit == 4.0
+    attempt()
+    assert lane.limit == 4.0            # still inside the cooldown
+    assert lane.counts["decreases"] == 1
+
+    lane._last_decrease -= 60.0
+    attempt()
+    assert lane.limit == 2.0
+    assert lane.inflight == 0
+
+    monkeypatch.setattr(watsonx, "_send", lambda endpoint, body, timeout: _response(200))
+    attempt()
+    assert lane.limit == 2.5            # additive increase: +1/limit per success
+
+
+def test_429_pauses_the_bucket(monkeypatch, governor):
+    monkeypatch.setattr(watsonx, "_send", lambda endpoint, body, timeout: _response(429, retry_after="0.3"))
+    lane = governor.lane("generation")
+    watsonx._attempt(lane, "generation", "m", {"model_id": "m"}, 1.0, 0)
+    assert lane.counts["throttled"] == 1
+    assert lane.breaker.state == "closed"   # throttling is not ill health
+    assert lane._bucket("m").delay(time.monotonic()) > 0.2
+    assert lane._bucket("other").delay(time.monotonic()) == 0.0
+
+    monkeypatch.setattr(watsonx, "_send", lambda endpoint, body, timeout: _response(200))
+    t0 = time.monotonic()
+    watsonx._attempt(lane, "generation", "m", {"model_id": "m"}, 1.0, 0)
+    assert time.monotonic() - t0 >= 0.25
+
+
+def test_breaker_open_half_open_closed():
+    breaker = watsonx.CircuitBreaker("generation", failures=2, cooldown=0.1)
+    breaker.before()
+    breaker.failure()
+    assert breaker.state == "closed"
+    breaker.failure()
+    assert breaker.state == "open" and breaker.is_open()
+    with pytest.raises(watsonx.CircuitOpenError):
+        breaker.before()
+
+    time.sleep(0.15)
+    assert not breaker.is_open()        # cooled down: the next call may probe
+    breaker.before()                    # the probe
+    assert breaker.state == "half_open"
+    with pytest.raises(watsonx.CircuitOpenError):
+        breaker.before()                # only one probe at a time
+    breaker.failure()
+    assert breaker.state == "open"      # failed probe reopens at once
+
+    time.sleep(0.15)
+    breaker.before()
+    breaker.success()
+    assert breaker.state == "closed"
+    breaker.before()
+    assert breaker.stats()["opened"] == 2
+
+
+def test_open_breaker_skips_send(monkeypatch, governor):
+    calls = []
+
+    def fake_send(endpoint, body, timeout):
+        calls.append(endpoint)
+        raise requests.ConnectionError("down")
+
+    monkeypatch.setattr(watsonx, "_send", fake_send)
+    monkeypatch.setattr(watsonx, "WATSONX_BACKOFF_S", 0.0)
+    lane = governor.lane("generation")
+    lane.breaker.failures = 2
+    with pytest.raises(requests.ConnectionError):
+        watsonx.post("generation", {"model_id": "m"}, retries=2, hedge=False)
+    assert lane.breaker.state == "open"
+    with pytest.raises(watsonx.CircuitOpenError):
+        watsonx.post("generation", {"model_id": "m"}, retries=2, hedge=False)
+    assert len(calls) == 2
@@ -0,0 +1,76 @@
+# tests/test_wire.py
+"""Compact report round-trip and response encoding in app/core/wire.py."""
+import gzip
+import json
+
+from app.core import wire
+from app.schemas.claim import Claim
+from app.schemas.evidence import Evidence
+from app.schemas.report import CallReport
+from app.schemas.verdict import Verdict
+
+
+def _ev(doc_id, score, snippet="Global uptime in Q2 was 99.98%.", source="sla.md", **metadata):
+    return Evidence(doc_id=doc_id, source=source, snippet=snippet, score=score, metadata=metadata)
+
+
+def _report():
+    shared = _ev("d1", 0.91)
+    by_claim = {
+        "c0": [shared, _ev("d2", 0.40, snippet="P95 latency was 198 ms.")],
+        # same snippet, different score per claim
+        "c1": [_ev("d1", 0.55), _ev("d2", 0.12, snippet="P95 latency was 198 ms.")],
+        # same doc_id and snippet, but a different source / metadata is a different row
+        "c2": [_ev("d1", 0.91, source="sla-v2.md"), _ev("d1", 0.91, region="apac")],
+        "c3": [],
+    }
+    flat = [e for evs in by_claim.values() for e in evs]
+    return CallReport(
+        call_summary="Uptime and latency review.",
+        claim_table=[{"claim": "Q2 uptime was 99.98%", "label": "supported"}],
+        action_items=["Send the deck"],
+        claims=[Claim(id="c0", text="Q2 uptime was 99.98%"), Claim(id="c1", text="Uptime was 99.98 percent"),
+                Claim(id="c2", text="APAC uptime"), Claim(id="c3", text="Churn fell", duplicate_of="c0")],
+        verdicts=[Verdict(claim_id="c0", label="supported", confidence=0.9, best_evidence_id="d1",
+                          rationale="matches", citation_ids=["d1"])],
+        evidence=flat, evidence_by_claim=by_claim,
+        timings={"critical_path": ["extract", "verify"]}, kb_id="acme", kb_version="v1", report_id="r1",
+    )
+
+
+def test_round_trip():
+    report = _report()
+    compact = wire.compact_report(report)
+    assert compact["format"] == wire.COMPACT_FORMAT
+    assert wire.expand_report(compact) == report
+
+
+def test_round_trip_through_json():
+    report = _report()
+    data = json.loads(wire.dumps(wire.compact_report(report)))
+    assert wire.expand_report(data) == report
+
+
+def test_evidence_stored_once():
+    compact = wire.compact_report(_report())
+    # d1 (sla.md), d2, d1 (sla-v2.md), d1 (region=apac)
+    assert len(compact["evidence_table"]) == 4
+    assert all("score" not in row for row in compact["evidence_table"])
+    assert compact["evidence_by_claim"]["c0"][0] == [0, 0.91]
+    assert compact["evidence_by_claim"]["c1"][0] == [0, 0.55]
+    assert compact["evidence_by_claim"]["c3"] == []
+
+
+def test_plain_report_passes_through():
+    report = _report()
+    assert wire.expand_report(report.model_dump()) == report
+
+
+def test_encode_body(monkeypatch):
+    monkeypatch.setattr(wire, "WIRE_COMPRESS_MIN_BYTES", 100)
+    body = wire.dumps(wire.compact_report(_report())) * 4
+    assert wire.encode_body(b"{}", "gzip") == (b"{}", None)
+    assert wire.encode_body(body, None) == (body, None)
+    assert wire.encode_body(body, "gzip;q=0, identity") == (body, None)
+    out, enc = wire.encode_body(body, "deflate, gzip")
+    assert enc == "gzip" and gzip.decompress(out) == body
@@ -1,5 +1,5 @@
 import axios from 'axios'
-import type { CallReport } from '@/lib/types'
+import type { CallEvent, CallReport } from '@/lib/types'
 
 const baseURL = import.meta.env.VITE_API_BASE ?? 'http://127.0.0.1:8000'
 
@@ -25,16 +25,59 @@ export async function rebuildKb(): Promise<{ ok: boolean }> {
   return data
 }
 
-export async function processAudio(file: File): Promise<CallReport> {
+export async function processAudio(file: File, kb?: string): Promise<CallReport> {
   const form = new FormData()
   form.append('file', file)
+  if (kb) form.append('kb', kb)
   const { data } = await api.post('/process-audio', form, {
     headers: { 'Content-Type': 'multipart/form-data' },
   })
   return data
 }
 
-export async function processTranscript(text: string): Promise<CallReport> {
-  const { data } = await api.post('/process-transcript', { text })
+export async function processTranscript(text: string, kb?: string): Promise<CallReport> {
+  const { data } = await api.post('/process-transcript', kb ? { text, kb } : { text })
   return data
-} 
\ No newline at end of file
+} 
+
+// Streaming variants: onEvent gets each partial result as the server produces it;
+// the promise resolves with the final report.
+async function streamCall(path: string, init: RequestInit, onEvent: (ev: CallEvent) => void): Promise<CallReport> {
+  const res = await fetch(`${baseURL}${path}?stream=ndjson`, init)
+  if (!res.ok || !res.body) throw new Error(`${path}: HTTP ${res.status}`)
+  const reader = res.body.getReader()
+  const decoder = new TextDecoder()
+  let buf = ''
+  let report: CallReport | undefined
+  for (;;) {
+    const { done, value } = await reader.read()
+    buf += decoder.decode(value ?? new Uint8Array(), { stream: !done })
+    const lines = buf.split('\n')
+    buf = lines.pop() ?? ''
+    for (const line of lines) {
+      if (!line.trim()) continue
+      const ev = JSON.parse(line) as CallEvent
+      onEvent(ev)
+      if (ev.type === 'report') report = ev.report
+      if (ev.type === 'error') throw new Error(ev.detail)
+    }
+    if (done) break
+  }
+  if (!report) throw new Error(`${path}: stream ended without a report`)
+  return report
+}
+
+export function processTranscriptStream(text: string, onEvent: (ev: CallEvent) => void, kb?: string): Promise<CallReport> {
+  return streamCall('/process-transcript', {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify(kb ? { text, kb } : { text }),
+  }, onEvent)
+}
+
+export function processAudioStream(file: File, onEvent: (ev: CallEvent) => void, kb?: string): Promise<CallReport> {
+  const form = new FormData()
+  form.append('file', file)
+  if (kb) form.append('kb', kb)
+  return streamCall('/process-audio', { method: 'POST', body: form }, onEvent)
+}
@@ -36,6 +36,23 @@ export type CallReport = {
   evidence_by_claim?: Record<string, Evidence[]>
 }
 
+export type Segment = {
+  start: number
+  end: number
+  speaker?: string
+  text: string
+}
+
+// Progress events of /process-transcript and /process-audio with ?stream=ndjson
+export type CallEvent =
+  | { type: 'segment'; segment: Segment }
+  | { type: 'claim'; claim: Claim & { duplicate_of?: string | null } }
+  | { type: 'evidence'; claim_id: string; evidence: Evidence[] }
+  | { type: 'verdict'; verdict: Verdict; cached: boolean }
+  | { type: 'summary'; call_summary: string; action_items: string[]; claim_table: CallReport['claim_table'] }
+  | { type: 'report'; report: CallReport }
+  | { type: 'error'; detail: string }
+
 export type InputKind = 'audio' | 'transcript' | 'sample'
 
 export type RunRecord = {